@@ -0,0 +1,44 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import io
+import zlib
+
+from django.conf import settings
+from django.core.exceptions import RequestDataTooBig
+from django.http import HttpResponseBadRequest
+
+
+class GzipRequestMiddleware:
+    """
+    Decompress request bodies sent with a gzip Content-Encoding,
+    as the bot does when publishing issues in bulk
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.META.get("HTTP_CONTENT_ENCODING") == "gzip":
+            max_size = settings.DATA_UPLOAD_MAX_MEMORY_SIZE
+            decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            try:
+                # Do not decompress more than the allowed size
+                body = decompressor.decompress(
+                    request.body, max_size + 1 if max_size is not None else 0
+                )
+            except zlib.error:
+                return HttpResponseBadRequest("Invalid gzip request body")
+            if max_size is not None and len(body) > max_size:
+                raise RequestDataTooBig(
+                    "Request body exceeded settings.DATA_UPLOAD_MAX_MEMORY_SIZE."
+                )
+
+            # Replace the body, so that it's parsed as a plain request
+            request._body = body
+            request._stream = io.BytesIO(body)
+            request.META["CONTENT_LENGTH"] = str(len(body))
+            del request.META["HTTP_CONTENT_ENCODING"]
+
+        return self.get_response(request)
@@ -40,6 +40,8 @@ env = environ.Env(
     SECRET_KEY=(str, "t!+s!@x5p!85x19q83jufr#95_z0fv7$!u5z*c&gi!%hr3^w+s"),
     # https://django-environ.readthedocs.io/en/latest/types.html#environ-env-db-url
     DATABASE_URL=(str, f"sqlite:////{ROOT_DIR}/db.sqlite3"),
+    # https://django-environ.readthedocs.io/en/latest/types.html#environ-env-cache-url
+    CACHE_URL=(str, "dbcache://code_review_cache"),
     ALLOWED_HOSTS=(list[str], ["*"]),
     CSRF_TRUSTED_ORIGINS=(
         list[str],
@@ -84,8 +86,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "django.middleware.gzip.GZipMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "corsheaders.middleware.CorsMiddleware",
+    "code_review_backend.app.middleware.GzipRequestMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -121,6 +125,10 @@ DATABASES = {"default": env.db()}
 if DATABASES["default"]["ENGINE"] == "django.db.backends.sqlite3":
     logger.warning("Running application with SQLite backend. Data may be lost.")
 
+# Cache shared by all the web processes, stored in the database by default
+# so that no external service is required. Its table is created by the migrations
+CACHES = {"default": env.cache()}
+
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
 
@@ -156,7 +164,7 @@ REST_FRAMEWORK = {
     ],
     # Setup pagination
     "PAGE_SIZE": 50,
-    "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.LimitOffsetPagination",
+    "DEFAULT_PAGINATION_CLASS": "code_review_backend.issues.pagination.EstimatedCountPagination",
 }
 
 # Internal Ips where django debug toolbar is enabled
@@ -220,7 +228,7 @@ if DYNO:
     logger.info("Setting up Heroku environment")
 
     # Insert Whitenoise Middleware after the security and cors ones
-    MIDDLEWARE.insert(2, "whitenoise.middleware.WhiteNoiseMiddleware")
+    MIDDLEWARE.insert(3, "whitenoise.middleware.WhiteNoiseMiddleware")
 
     # Cors closed on heroku
     CORS_ORIGIN_ALLOW_ALL = False
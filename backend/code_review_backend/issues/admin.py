@@ -3,8 +3,29 @@
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
 from django.contrib import admin
+from django.contrib.admin.views.main import PAGE_VAR
 
 from code_review_backend.issues.models import Diff, Issue, Repository, Revision
+from code_review_backend.issues.pagination import EstimatedCountPaginator
+
+
+class EstimatedCountAdmin(admin.ModelAdmin):
+    """
+    Admin of a large table, where rows are not counted exactly
+    """
+
+    paginator = EstimatedCountPaginator
+    # Do not count all the rows of the table along with the filtered ones
+    show_full_result_count = False
+
+    def get_paginator(self, request, queryset, per_page, *args, **kwargs):
+        paginator = super().get_paginator(request, queryset, per_page, *args, **kwargs)
+        # The count must reach the requested page
+        try:
+            paginator.offset = max(int(request.GET.get(PAGE_VAR, 1)) - 1, 0) * per_page
+        except ValueError:
+            pass
+        return paginator
 
 
 class RepositoryAdmin(admin.ModelAdmin):
@@ -17,7 +38,7 @@ class DiffInline(admin.TabularInline):
     readonly_fields = ("id", "repository", "mercurial_hash", "phid", "review_task_id")
 
 
-class RevisionAdmin(admin.ModelAdmin):
+class RevisionAdmin(EstimatedCountAdmin):
     list_display = (
         "id",
         "phabricator_id",
@@ -30,8 +51,8 @@ class RevisionAdmin(admin.ModelAdmin):
     inlines = (DiffInline,)
 
 
-class IssueAdmin(admin.ModelAdmin):
-    list_filter = ("analyzer",)
+class IssueAdmin(EstimatedCountAdmin):
+    list_filter = ("check_ref__analyzer",)
     list_display = (
         "id",
         "path",
@@ -40,7 +61,9 @@ class IssueAdmin(admin.ModelAdmin):
         "analyzer_check",
         "created",
     )
-    search_fields = ("line", "analyzer", "path")
+    # The displayed values are stored in dictionary tables
+    list_select_related = ("path_ref", "check_ref")
+    search_fields = ("line", "check_ref__analyzer", "path_ref__value")
     ordering = ("-created",)
 
 
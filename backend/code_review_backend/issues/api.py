@@ -5,25 +5,33 @@
 from collections import defaultdict
 from datetime import date, datetime, timedelta
 
-from django.conf import settings
-from django.db.models import BooleanField, Count, ExpressionWrapper, Prefetch, Q
-from django.db.models.functions import TruncDate
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Prefetch, Q, Sum, Value
+from django.db.models.functions import NullIf
 from django.shortcuts import get_object_or_404
 from django.urls import path
-from django.utils.decorators import method_decorator
+from django.utils.cache import patch_response_headers
 from django.views.decorators.cache import cache_page
 from rest_framework import generics, mixins, routers, status, viewsets
 from rest_framework.exceptions import APIException, ValidationError
 from rest_framework.response import Response
 
+from code_review_backend.issues.cache import bump_issues_version, get_issues_version
 from code_review_backend.issues.models import (
     LEVEL_ERROR,
+    CheckDailyStats,
     Diff,
     Issue,
     IssueLink,
     Repository,
     Revision,
 )
+from code_review_backend.issues.pagination import (
+    IssuesPagination,
+    KeysetPagination,
+    RecentIssuesPagination,
+)
+from code_review_backend.issues.search import search_diffs, search_issues
 from code_review_backend.issues.serializers import (
     DiffFullSerializer,
     DiffSerializer,
@@ -32,18 +40,50 @@ from code_review_backend.issues.serializers import (
     IssueCheckSerializer,
     IssueCheckStatsSerializer,
     IssueHashSerializer,
+    IssueLookupSerializer,
+    IssueSearchSerializer,
     IssueSerializer,
     RepositorySerializer,
     RevisionSerializer,
 )
+from code_review_backend.issues.validation import validate_issues_bulk
+
+
+def parse_date_param(params, name):
+    """Parse an optional date from the query parameters"""
+    value = params.get(name)
+    if value is None:
+        return None
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        raise APIException(detail=f"invalid {name} date - should be YYYY-MM-DD")
 
 
 class CachedView:
-    """Helper to bring DRF caching to GET methods"""
+    """
+    Helper to bring DRF caching to GET methods
+    Responses are kept until the issues data changes, as the version
+    of that data is part of their cache keys
+    Clients can not know when that version changes, so they only keep
+    the responses for a short time
+    """
+
+    cache_timeout = 24 * 3600
+    client_cache_timeout = 60
 
-    @method_decorator(cache_page(1800))
-    def get(self, *args, **kwargs):
-        return super().get(*args, **kwargs)
+    def get(self, request, *args, **kwargs):
+        key_prefix = f"issues:{get_issues_version()}"
+        view = cache_page(self.cache_timeout, key_prefix=key_prefix)(super().get)
+        response = view(request, *args, **kwargs)
+        # The expiration headers for the server cache are set once rendered
+        response.add_post_render_callback(self.patch_client_headers)
+        return response
+
+    def patch_client_headers(self, response):
+        """Replace the expiration headers of the responses cached on the server"""
+        if response.headers.pop("Expires", None) is not None:
+            patch_response_headers(response, cache_timeout=self.client_cache_timeout)
 
 
 class CreateListRetrieveViewSet(
@@ -115,40 +155,20 @@ class DiffViewSet(viewsets.ReadOnlyModelViewSet):
     """
 
     serializer_class = DiffFullSerializer
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         diffs = (
             Diff.objects
             # Because of the perf. hit filter issues that are not older than today - 3 months.
             .filter(created__gte=date.today() - timedelta(days=90))
+            # Issues counters are stored on the diffs, no need to aggregate their links
             .prefetch_related(
-                Prefetch(
-                    "issue_links",
-                    queryset=IssueLink.objects.select_related("issue"),
-                ),
                 "revision",
                 "revision__base_repository",
                 "revision__head_repository",
                 "repository",
             )
-            .annotate(nb_issues=Count("issue_links"))
-            .annotate(
-                nb_errors=Count(
-                    "issue_links", filter=Q(issue_links__issue__level=LEVEL_ERROR)
-                )
-            )
-            .annotate(
-                nb_warnings=Count(
-                    "issue_links", filter=Q(issue_links__issue__level="warning")
-                )
-            )
-            .annotate(
-                nb_issues_publishable=Count(
-                    "issue_links",
-                    filter=Q(issue_links__in_patch=True)
-                    | Q(issue_links__issue__level=LEVEL_ERROR),
-                )
-            )
             .order_by("-id")
         )
 
@@ -164,13 +184,7 @@ class DiffViewSet(viewsets.ReadOnlyModelViewSet):
         # Filter by text search query
         query = self.request.query_params.get("search")
         if query is not None:
-            search_query = (
-                Q(id__icontains=query)
-                | Q(revision__phabricator_id__icontains=query)
-                | Q(revision__bugzilla_id__icontains=query)
-                | Q(revision__title__icontains=query)
-            )
-            diffs = diffs.filter(search_query)
+            diffs = search_diffs(diffs, query)
 
         # Filter by issues types
         issues = self.request.query_params.get("issues")
@@ -197,6 +211,7 @@ class IssueViewSet(
     """
 
     serializer_class = IssueSerializer
+    pagination_class = IssuesPagination
 
     def get_queryset(self):
         # Required to generate the OpenAPI documentation
@@ -204,7 +219,8 @@ class IssueViewSet(
             return Issue.objects.none()
         diff = get_object_or_404(Diff, id=self.kwargs["diff_id"])
         return (
-            Issue.objects.filter(issue_links__diff=diff)
+            Issue.objects.with_values()
+            .filter(issue_links__diff=diff)
             .annotate(publishable=Q(issue_links__in_patch=True) & Q(level=LEVEL_ERROR))
             .values(
                 "id",
@@ -220,13 +236,71 @@ class IssueViewSet(
                 "publishable",
                 "issue_links__in_patch",
                 "issue_links__new_for_revision",
+                # Used as the pagination key
+                "created",
             )
+            .order_by("created", "id")
         )
 
+    def perform_update(self, serializer):
+        """
+        Save the issue and its link to the diff, as the serializer can't save
+        the values of the queryset, then update the counters of the diffs
+        and the daily statistics of its check where the change counts
+        """
+        issue = Issue.objects.get(id=serializer.instance["id"])
+        level = issue.level
+        link_attrs = {}
+        for name, value in serializer.validated_data.items():
+            if name.startswith("issue_links__"):
+                link_attrs[name.removeprefix("issue_links__")] = value
+            else:
+                setattr(issue, name, value)
+
+        # The level of the issue counts on all the links where it is found,
+        # while the attributes of a link only count on its diff
+        links = IssueLink.objects.filter(issue_id=issue.id)
+        if issue.level == level:
+            links = links.filter(diff_id=self.kwargs["diff_id"])
+
+        with transaction.atomic():
+            previous_stats = CheckDailyStats.objects.count_links(links)
+            issue.save()
+            if link_attrs:
+                IssueLink.objects.filter(
+                    issue=issue, diff_id=self.kwargs["diff_id"]
+                ).update(**link_attrs)
+            Diff.objects.filter(id__in=links.values("diff_id")).update_issues_counters()
+            CheckDailyStats.objects.update_links(links, previous_stats)
+        bump_issues_version()
+
+        serializer.instance = self.get_object()
+
+    def perform_destroy(self, instance):
+        """
+        Delete the issue, then update the counters of the diffs where it was found
+        and the daily statistics of its check
+        """
+        issue = Issue.objects.get(id=instance["id"])
+        links = IssueLink.objects.filter(issue_id=issue.id)
+        diff_ids = list(
+            links.filter(diff__isnull=False).values_list("diff_id", flat=True)
+        )
+        with transaction.atomic():
+            previous_stats = CheckDailyStats.objects.count_links(links)
+            issue.delete()
+            Diff.objects.filter(id__in=diff_ids).update_issues_counters()
+            CheckDailyStats.objects.update_links(links, previous_stats)
+        bump_issues_version()
+
 
 class IssueBulkCreate(generics.CreateAPIView):
     """
     Create multiple issues at once, linked to a mandatory revision and an optional diff.
+
+    With a diff, `new_for_revision` is detected for the issues where it is
+    omitted or null, by comparing them with the issues of the previous diffs.
+    Without a diff, it is stored as sent.
     """
 
     serializer_class = IssueBulkSerializer
@@ -240,6 +314,42 @@ class IssueBulkCreate(generics.CreateAPIView):
         context["revision"] = revision
         return context
 
+    def get_output_fields(self, serializer):
+        """
+        List the issues fields requested through the `fields` query parameter,
+        to only output those instead of the full issues
+        """
+        fields = self.request.query_params.get("fields")
+        if not fields:
+            return None
+        fields = [name.strip() for name in fields.split(",") if name.strip()]
+        unknown = [
+            name
+            for name in fields
+            if name not in serializer.fields["issues"].child.fields
+        ]
+        if unknown:
+            raise ValidationError(
+                {"fields": [f"Unknown issue fields: {', '.join(unknown)}"]}
+            )
+        return fields
+
+    def create(self, request, *args, **kwargs):
+        """
+        Validate the payload with a lightweight engine instead of the serializer fields,
+        as it dominates the processing time of large payloads
+        """
+        serializer = self.get_serializer()
+        fields = self.get_output_fields(serializer)
+        validated_data = validate_issues_bulk(serializer, request.data)
+        output = serializer.create(validated_data)
+        bump_issues_version()
+        if fields:
+            data = serializer.to_compact_representation(output, fields)
+        else:
+            data = serializer.to_representation(output)
+        return Response(data, status=status.HTTP_201_CREATED)
+
 
 class IssueCheckDetails(generics.ListAPIView):
     """
@@ -247,12 +357,14 @@ class IssueCheckDetails(generics.ListAPIView):
     """
 
     serializer_class = IssueCheckSerializer
+    pagination_class = RecentIssuesPagination
 
     def get_queryset(self):
         repo = self.kwargs["repository"]
 
         queryset = (
-            Issue.objects.filter(issue_links__revision__head_repository__slug=repo)
+            Issue.objects.with_values()
+            .filter(issue_links__revision__head_repository__slug=repo)
             .filter(analyzer=self.kwargs["analyzer"])
             .filter(analyzer_check=self.kwargs["check"])
             .annotate(publishable=Q(issue_links__in_patch=True) & Q(level=LEVEL_ERROR))
@@ -267,7 +379,7 @@ class IssueCheckDetails(generics.ListAPIView):
             )
             # List of diffs for each link of this issue
             .prefetch_related("diffs")
-            .order_by("-created")
+            .order_by("-created", "-id")
         )
 
         # Display only publishable issues by default
@@ -301,61 +413,34 @@ class IssueCheckStats(CachedView, generics.ListAPIView):
     serializer_class = IssueCheckStatsSerializer
 
     def get_queryset(self):
-        queryset = (
-            Issue.objects.values(
-                "issue_links__revision__head_repository__slug",
+        # Only list the recent checks by default
+        since = parse_date_param(self.request.query_params, "since") or (
+            date.today() - timedelta(days=90)
+        )
+        queryset = CheckDailyStats.objects.filter(date__gte=since)
+
+        until = parse_date_param(self.request.query_params, "until")
+        if until is not None:
+            queryset = queryset.filter(date__lte=until)
+
+        return (
+            queryset.values(
                 "analyzer",
-                "analyzer_check",
+                repository_slug=F("repository__slug"),
+                check=NullIf("analyzer_check", Value("")),
             )
-            # We want to count distinct issues because they can be referenced on multiple diffs
-            .annotate(total=Count("id", distinct=True))
-            .annotate(
-                has_check=ExpressionWrapper(
-                    Q(analyzer_check__isnull=True), output_field=BooleanField()
-                )
-            )
-            .annotate(
-                publishable=Count(
-                    "id", filter=Q(issue_links__in_patch=True) | Q(level=LEVEL_ERROR)
-                )
-            )
-            .distinct(
-                "issue_links__revision__head_repository__slug",
+            # Each issue is counted on the day it was last found on a repository, so
+            # the total is the number of distinct issues found since the first day
+            # When the range has an end, issues also found after it are not counted
+            .annotate(total=Sum("last_found_issues"), publishable=Sum("publishable"))
+            .order_by(
+                "-total",
+                "repository_slug",
                 "analyzer",
-                "analyzer_check",
+                F("check").asc(nulls_last=True),
             )
         )
 
-        # Filter issues by date
-        since = self.request.query_params.get("since")
-        if since is not None:
-            try:
-                since = datetime.strptime(since, "%Y-%m-%d").date()
-            except ValueError:
-                raise APIException(detail="invalid since date - should be YYYY-MM-DD")
-        else:
-            # Because of the perf. hit filter, issues that are not older than today - 3 months.
-            since = date.today() - timedelta(days=90)
-
-        queryset = queryset.filter(issue_links__revision__created__gte=since).distinct()
-
-        return queryset.order_by(
-            "-total",
-            "issue_links__revision__head_repository__slug",
-            "analyzer",
-            # Use same order than PostgreSQL with SQLite
-            "has_check",
-            "analyzer_check",
-        ).values(
-            "issue_links__revision__head_repository__slug",
-            "analyzer",
-            "analyzer_check",
-            "total",
-            "publishable",
-            "issue_links__in_patch",
-            "issue_links__new_for_revision",
-        )
-
 
 class IssueCheckHistory(CachedView, generics.ListAPIView):
     """
@@ -364,6 +449,10 @@ class IssueCheckHistory(CachedView, generics.ListAPIView):
     * per repository
     * per analyzer
     * per check
+
+    New issues are counted on the day they were first found on the head
+    repository of their revisions, so an issue found on several repositories
+    is counted once on each of them, and globally as many times
     """
 
     serializer_class = HistoryPointSerializer
@@ -373,20 +462,12 @@ class IssueCheckHistory(CachedView, generics.ListAPIView):
     pagination_class = None
 
     def get_queryset(self):
-        # Count all the issues per day
-        queryset = (
-            Issue.objects.annotate(date=TruncDate("created"))
-            .values("date")
-            .annotate(total=Count("id"))
-        )
+        queryset = CheckDailyStats.objects.all()
 
         # Filter by repository
         repository = self.request.query_params.get("repository")
         if repository:
-            queryset = queryset.filter(
-                Q(diffs__revision__base_repository__slug=repository)
-                | Q(diffs__revision__head_repository__slug=repository)
-            )
+            queryset = queryset.filter(repository__slug=repository)
 
         # Filter by analyzer
         analyzer = self.request.query_params.get("analyzer")
@@ -399,33 +480,39 @@ class IssueCheckHistory(CachedView, generics.ListAPIView):
             queryset = queryset.filter(analyzer_check=check)
 
         # Filter by date
-        since = self.request.query_params.get("since")
+        since = parse_date_param(self.request.query_params, "since")
         if since is not None:
-            try:
-                since = datetime.strptime(since, "%Y-%m-%d")
-            except ValueError:
-                raise APIException(detail="invalid since date - should be YYYY-MM-DD")
-
-            if "postgresql" in settings.DATABASES["default"]["ENGINE"]:
-                # Use a specific WHERE clause to compare the creation date.
-                # Casting the date as its natural data type (timestamptz) allow Postgres to perform an
-                # index scan on small data ranges (depending on available memory), which is much faster.
-                # Overall performance is improved in practice, even if the planned cost is higher when
-                # aggregating on the whole table.
-                since_date = since.strftime("%Y-%m-%d")
-                queryset = queryset.extra(
-                    where=[f"created::timestamptz >= '{since_date}'::timestamptz"]
-                )
-            else:
-                queryset = queryset.filter(date__gte=since.date())
+            queryset = queryset.filter(date__gte=since)
+        until = parse_date_param(self.request.query_params, "until")
+        if until is not None:
+            queryset = queryset.filter(date__lte=until)
 
-        return queryset.order_by("date").distinct()
+        # Count all the new issues per day
+        return (
+            queryset.values("date")
+            .annotate(total=Sum("distinct_issues"))
+            .order_by("date")
+        )
 
 
 class IssueList(generics.ListAPIView):
-    serializer_class = IssueHashSerializer
+    """
+    List the hashes of known issues in a repository, filtered by revision.
+    A POST request allows to look for many paths or hashes at once.
+    """
 
-    def get_queryset(self):
+    pagination_class = IssuesPagination
+
+    def get_serializer_class(self):
+        if self.request.method == "POST":
+            return IssueLookupSerializer
+        return IssueHashSerializer
+
+    def filter_issues(self, params):
+        """
+        Filter issues by repository, then by the revision matching
+        either a changeset or a date from the given parameters
+        """
         qs = Issue.objects.all().only("id", "hash").prefetch_related("revisions")
 
         errors = defaultdict(list)
@@ -441,11 +528,11 @@ class IssueList(generics.ListAPIView):
             filters["revisions__head_repository"] = repo
 
         # Always filter by path when the parameter is set
-        if path := self.request.query_params.get("path"):
-            filters["path"] = path
+        if path := params.get("path"):
+            filters["path_ref__value"] = path
 
         date_revision = None
-        if date := self.request.query_params.get("date"):
+        if date := params.get("date"):
             try:
                 date = datetime.strptime(date, "%Y-%m-%d") + timedelta(days=1)
             except ValueError:
@@ -462,7 +549,7 @@ class IssueList(generics.ListAPIView):
                     .last()
                 )
 
-        rev_changeset = self.request.query_params.get("revision_changeset")
+        rev_changeset = params.get("revision_changeset")
         if rev_changeset is not None and len(rev_changeset) != 40:
             errors["revision_changeset"].append(
                 "invalid revision_changeset - should be the mercurial hash on the head repository"
@@ -483,7 +570,74 @@ class IssueList(generics.ListAPIView):
         elif date_revision:
             filters["revisions"] = date_revision
 
-        return qs.filter(**filters).order_by("created").distinct()
+        return qs.filter(**filters)
+
+    def get_queryset(self):
+        return (
+            self.filter_issues(self.request.query_params)
+            .order_by("created", "id")
+            .distinct()
+        )
+
+    def post(self, request, *args, **kwargs):
+        """
+        List the known hashes for each of the given paths,
+        restricted to the given hashes when they are set
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        lookup = serializer.validated_data
+
+        qs = self.filter_issues(lookup)
+        paths = lookup.get("paths", [])
+        if paths:
+            qs = qs.filter(path_ref__value__in=paths)
+        if hashes := lookup.get("hashes"):
+            qs = qs.filter(hash__in=hashes)
+
+        # Requested paths without any known issue are listed too
+        known = {issue_path: [] for issue_path in paths}
+        for issue_path, issue_hash in (
+            qs.prefetch_related(None)
+            .order_by("created")
+            .values_list("path_ref__value", "hash")
+            .distinct()
+        ):
+            known.setdefault(issue_path, []).append(issue_hash.hex)
+
+        return Response({"paths": known})
+
+
+class IssueSearch(generics.ListAPIView):
+    """
+    Search issues by their message, optionally restricted to the issues
+    found in a repository, by an analyzer or by a check
+    """
+
+    serializer_class = IssueSearchSerializer
+    pagination_class = RecentIssuesPagination
+
+    def get_queryset(self):
+        query = self.request.query_params.get("q", "").strip()
+        if not query:
+            raise ValidationError({"q": ["A search query is required"]})
+        issues = search_issues(Issue.objects.with_values(), query)
+
+        if repository := self.request.query_params.get("repository"):
+            issues = issues.filter(
+                Exists(
+                    IssueLink.objects.filter(
+                        issue_id=OuterRef("id"),
+                        revision__head_repository__slug=repository,
+                    )
+                )
+            )
+        if analyzer := self.request.query_params.get("analyzer"):
+            issues = issues.filter(analyzer=analyzer)
+        if check := self.request.query_params.get("check"):
+            issues = issues.filter(analyzer_check=check)
+
+        return issues
 
 
 # Build exposed urls for the API
@@ -511,4 +665,5 @@ urls = router.urls + [
         name="issue-check-details",
     ),
     path("issues/<slug:repo_slug>/", IssueList.as_view(), name="repository-issues"),
+    path("search/issues/", IssueSearch.as_view(), name="issues-search"),
 ]
@@ -0,0 +1,37 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import time
+
+from django.core.cache import cache
+
+# Version of the issues data, part of the keys of all the cached responses
+ISSUES_VERSION_KEY = "issues:version"
+
+# Version of the dictionary tables, changed once unused entries are deleted
+DICTIONARIES_VERSION_KEY = "issues:dictionaries"
+
+
+def get_issues_version():
+    """
+    Current version of the issues data, shared by all processes through the cache
+    Versions are built from the clock, so that a version evicted from the cache
+    can never be reused by the responses cached before
+    """
+    return cache.get_or_set(ISSUES_VERSION_KEY, time.time_ns, timeout=None)
+
+
+def bump_issues_version():
+    """Invalidate all the cached responses built from the issues data"""
+    cache.set(ISSUES_VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def get_dictionaries_version():
+    """Current version of the dictionary tables, None until entries are deleted"""
+    return cache.get(DICTIONARIES_VERSION_KEY)
+
+
+def bump_dictionaries_version():
+    """Invalidate the IDs of the dictionary entries cached by all processes"""
+    cache.set(DICTIONARIES_VERSION_KEY, time.time_ns(), timeout=None)
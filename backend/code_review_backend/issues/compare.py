@@ -1,6 +1,8 @@
 # This Source Code Form is subject to the terms of the Mozilla Public
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
+from collections.abc import Iterable
+
 from code_review_backend.issues.models import Diff, IssueLink
 
 
@@ -13,6 +15,29 @@ def detect_new_for_revision(diff: Diff, path: str, hash: str) -> bool:
     return not IssueLink.objects.filter(
         revision_id=diff.revision_id,
         diff_id__lt=diff.id,
-        issue__path=path,
+        issue__path_ref__value=path,
         issue__hash=hash,
     ).exists()
+
+
+def detect_new_for_revision_bulk(
+    diff: Diff, issues: Iterable[tuple[str, str]]
+) -> dict[tuple[str, str], bool]:
+    """
+    Detect if issues identified by their path and hash are new for a revision, from its diff
+    All the issues are checked with a single query, to be used on large sets of issues
+    Returns a mapping of each (path, hash) couple to its detection
+    This function ignores pre-existing issues outside of that revision !
+    """
+    assert diff is not None, "Missing diff"
+    issues = set(issues)
+    if not issues:
+        return {}
+    existing = set(
+        IssueLink.objects.filter(
+            revision_id=diff.revision_id,
+            diff_id__lt=diff.id,
+            issue__hash__in={issue_hash for _, issue_hash in issues},
+        ).values_list("issue__path_ref__value", "issue__hash")
+    )
+    return {issue: issue not in existing for issue in issues}
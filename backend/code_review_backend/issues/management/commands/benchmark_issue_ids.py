@@ -0,0 +1,112 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import logging
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from code_review_backend.issues.models import Issue, uuid7
+
+logger = logging.getLogger(__name__)
+
+# Number of rows inserted by each query while seeding the tables
+SEED_BATCH_SIZE = 50_000
+
+
+class Rollback(Exception):
+    """Used to revert all the rows created by the benchmark"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the insert throughput of issues with random (v4) and "
+        "time-ordered (v7) UUIDs as primary keys, in tables seeded with many rows"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=2_000_000,
+            help="Number of issues already stored in each table, defaults to 2 millions",
+        )
+        parser.add_argument(
+            "--inserts",
+            type=int,
+            default=100_000,
+            help="Number of issues inserted during the measure, defaults to 100000",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=100,
+            help="Number of issues inserted by each query, defaults to 100 as in the bot",
+        )
+
+    def insert(self, cursor, table, generator, size, offset):
+        """Insert issues with identifiers from a generator into a table"""
+        cursor.execute(
+            f"""
+            INSERT INTO {table}
+                (id, hash, path_ref_id, check_ref_id, level, created, updated)
+            SELECT id, md5((%s + index)::text)::uuid,
+                index %% 1000, 1, 'warning', now(), now()
+            FROM unnest(%s::uuid[]) WITH ORDINALITY AS ids (id, index)
+            """,
+            [offset, [str(generator()) for _ in range(size)]],
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("The benchmark is only supported on PostgreSQL")
+
+        generators = {"uuid4": uuid.uuid4, "uuid7": uuid7}
+        try:
+            with transaction.atomic(), connection.cursor() as cursor:
+                for name, generator in generators.items():
+                    # A copy of the issues table, with the same indexes
+                    # but without the foreign keys to the dictionary tables
+                    table = f"benchmark_issue_{name}"
+                    cursor.execute(
+                        f"CREATE TABLE {table} "
+                        f"(LIKE {Issue._meta.db_table} INCLUDING ALL)"
+                    )
+
+                    for offset in range(0, options["seed"], SEED_BATCH_SIZE):
+                        self.insert(
+                            cursor,
+                            table,
+                            generator,
+                            min(SEED_BATCH_SIZE, options["seed"] - offset),
+                            offset,
+                        )
+                    cursor.execute(f"ANALYZE {table}")
+
+                    start = time.perf_counter()
+                    for offset in range(0, options["inserts"], options["chunk_size"]):
+                        self.insert(
+                            cursor,
+                            table,
+                            generator,
+                            min(options["chunk_size"], options["inserts"] - offset),
+                            options["seed"] + offset,
+                        )
+                    duration = time.perf_counter() - start
+
+                    cursor.execute("SELECT pg_relation_size(%s)", [f"{table}_pkey"])
+                    (index_size,) = cursor.fetchone()
+                    logger.info(
+                        f"{name}: inserted {options['inserts']} issues after "
+                        f"{options['seed']} in {duration:.2f}s, "
+                        f"{options['inserts'] / duration:.0f} issues/s, "
+                        f"primary key index of {index_size / 1024 / 1024:.1f}MB"
+                    )
+
+                # Never keep the benchmark data
+                raise Rollback
+        except Rollback:
+            pass
@@ -0,0 +1,119 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import logging
+import statistics
+import time
+import uuid
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from code_review_backend.issues.models import LEVEL_WARNING, Repository
+from code_review_backend.issues.serializers import IssueBulkSerializer
+
+logger = logging.getLogger(__name__)
+
+
+class Rollback(Exception):
+    """Used to revert all the rows created by the benchmark"""
+
+
+class Command(BaseCommand):
+    help = "Measure the latency of the bulk creation of issues, for each chunk"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunks",
+            type=int,
+            default=20,
+            help="Number of chunks to create with each method, defaults to 20",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=100,
+            help="Number of issues in a chunk, defaults to 100 as in the bot",
+        )
+        parser.add_argument(
+            "--known-ratio",
+            type=float,
+            default=0.5,
+            help="Ratio of issues of a chunk that already exist, defaults to 0.5",
+        )
+
+    def build_chunk(self, size, known_hashes, known_ratio):
+        """
+        Build the issues of a chunk, as validated by the serializer,
+        along with the attributes of their links
+        """
+        nb_known = min(int(size * known_ratio), len(known_hashes))
+        hashes = known_hashes[:nb_known] + [
+            uuid.uuid4() for _ in range(size - nb_known)
+        ]
+
+        issues = []
+        link_attrs = defaultdict(list)
+        for index, issue_hash in enumerate(hashes):
+            issues.append(
+                {
+                    "hash": issue_hash,
+                    "analyzer": "benchmark",
+                    "path": f"path/to/file_{index % 10}.cpp",
+                    "level": LEVEL_WARNING,
+                    "analyzer_check": "check",
+                    "message": "Some message " * 10,
+                }
+            )
+            link_attrs[issue_hash].append(
+                {
+                    "new_for_revision": None,
+                    "in_patch": index % 2 == 0,
+                    "line": index,
+                    "nb_lines": 1,
+                    "char": None,
+                }
+            )
+        return issues, link_attrs
+
+    def handle(self, *args, **options):
+        methods = {"separate queries": "create_issues"}
+        if connection.vendor == "postgresql":
+            methods["upsert statements"] = "upsert_issues"
+        else:
+            logger.warning("The upsert statements are only available on PostgreSQL")
+
+        try:
+            with transaction.atomic():
+                repository = Repository.objects.create(
+                    slug="benchmark", url="https://benchmark.test/repo"
+                )
+                for name, method in methods.items():
+                    revision = repository.head_revisions.create(
+                        base_repository=repository, title=f"Benchmark {name}"
+                    )
+                    serializer = IssueBulkSerializer(context={"revision": revision})
+                    known_hashes = []
+                    timings = []
+                    for _ in range(options["chunks"]):
+                        issues, link_attrs = self.build_chunk(
+                            options["chunk_size"], known_hashes, options["known_ratio"]
+                        )
+                        start = time.perf_counter()
+                        getattr(serializer, method)(issues, link_attrs, None)
+                        timings.append(time.perf_counter() - start)
+                        known_hashes = list(link_attrs.keys())
+
+                    logger.info(
+                        f"{name}: {len(timings)} chunks of {options['chunk_size']} issues, "
+                        f"median {statistics.median(timings) * 1000:.2f}ms, "
+                        f"mean {statistics.mean(timings) * 1000:.2f}ms, "
+                        f"max {max(timings) * 1000:.2f}ms per chunk"
+                    )
+
+                # Never keep the benchmark data
+                raise Rollback
+        except Rollback:
+            pass
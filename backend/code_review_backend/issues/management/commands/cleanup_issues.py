@@ -3,25 +3,61 @@
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
 import logging
-import math
-from collections import defaultdict
+import time
 from datetime import timedelta
 
+from django.core.cache import cache
 from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Exists, OuterRef
 from django.utils import timezone
 
+from code_review_backend.issues.cache import (
+    bump_dictionaries_version,
+    bump_issues_version,
+)
 from code_review_backend.issues.models import (
     Diff,
     Issue,
+    IssueCheck,
     IssueLink,
+    IssueMessage,
+    IssuePath,
     Repository,
     Revision,
 )
+from code_review_backend.issues.partitions import (
+    add_months,
+    drop_partition,
+    ensure_partitions,
+    is_partitioned,
+    list_partitions,
+    month_datetime,
+)
 
 logger = logging.getLogger(__name__)
 
 DEL_CHUNK_SIZE = 500
 
+# Progress of an interrupted cleanup, stored in the cache shared by all processes
+CHECKPOINT_KEY = "cleanup_issues:checkpoint"
+
+# Dictionary tables, with the field of the issues referencing their entries
+DICTIONARIES = (
+    (IssuePath, "path_ref"),
+    (IssueCheck, "check_ref"),
+    (IssueMessage, "message_ref"),
+)
+
+# Models of the deleted rows, in the order they are reported
+DELETED_MODELS = (
+    IssueLink,
+    Diff,
+    Issue,
+    Revision,
+    *(model for model, _ in DICTIONARIES),
+)
+
 
 class Command(BaseCommand):
     help = "Cleanup old issues from all repositories"
@@ -33,75 +69,283 @@ class Command(BaseCommand):
             help="Number of days the issues are old to select them for cleaning, defaults to 30 days (1 month)",
             default=30,
         )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            help=f"Number of revisions deleted in each transaction, defaults to {DEL_CHUNK_SIZE}",
+            default=DEL_CHUNK_SIZE,
+        )
+        parser.add_argument(
+            "--rows-per-second",
+            type=float,
+            help="Maximum number of rows deleted per second, to limit the load on the database",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report the number of rows that would be deleted",
+        )
+        parser.add_argument(
+            "--restart",
+            action="store_true",
+            help="Ignore the checkpoint of an interrupted cleanup instead of resuming it",
+        )
 
-    def cleanup_repositories(self):
+    def cleanup_repositories(self, dry_run):
         unused_repositories = Repository.objects.filter(
             base_revisions__isnull=True,
             head_revisions__isnull=True,
             diffs__isnull=True,
         )
+        if dry_run:
+            delete_count = unused_repositories.count()
+            if delete_count:
+                logger.info(f"Would delete {delete_count} unused Repository.")
+            return
+
         delete_count = unused_repositories._raw_delete(unused_repositories.db)
         if delete_count:
             logger.info(f"Deleted {delete_count} unused Repository.")
 
-    def handle(self, *args, **options):
-        self.cleanup_repositories()
+    def list_dropped_partitions(self, clean_until):
+        """
+        List the monthly partitions of revisions older than the cleanup date
+        """
+        partitions = {}
+        for month, name in list_partitions(Revision).items():
+            if month_datetime(add_months(month, 1)) > clean_until:
+                break
+            partitions[month] = name
+        return partitions
 
-        clean_until = timezone.now() - timedelta(days=options["nb_days"])
+    def drop_partitions(self, now, clean_until, stats):
+        """
+        Drop the monthly partitions of revisions older than the cleanup date,
+        along with the partitions of their links and with their diffs
+        Returns the number of dropped partitions of revisions
+        """
+        ensure_partitions(now)
 
-        rev_to_delete = Revision.objects.filter(
-            created__lte=clean_until,
-        )
-        total_rev_count = rev_to_delete.count()
+        links_partitions = list_partitions(IssueLink)
+        dropped = 0
+        for month, name in self.list_dropped_partitions(clean_until).items():
+            if month in links_partitions:
+                stats["IssueLink"] += drop_partition(IssueLink, links_partitions[month])
 
-        if not total_rev_count:
-            logger.info("Didn't find any old revision to delete.")
-            return
+            diffs_qs = Diff.objects.filter(
+                revision__created__gte=month_datetime(month),
+                revision__created__lt=month_datetime(add_months(month, 1)),
+            )
+            stats["Diff"] += diffs_qs._raw_delete(diffs_qs.db)
 
-        logger.info(f"Retrieved {total_rev_count} old revisions to be deleted.")
+            stats["Revision"] += drop_partition(Revision, name)
+            logger.info(f"Dropped partition {name}.")
+            dropped += 1
 
-        stats = defaultdict(int)
+        return dropped
 
-        iterations = math.ceil(total_rev_count / DEL_CHUNK_SIZE)
-        for i, start in enumerate(range(0, total_rev_count, DEL_CHUNK_SIZE), start=1):
-            logger.info(f"Page {i}/{iterations}.")
-            # First fetch revisions IDs in a first DB request
-            chunk_rev_ids = rev_to_delete.order_by("id")[
-                start : start + DEL_CHUNK_SIZE
-            ].values_list("id", flat=True)
+    def cleanup_dictionaries(self, stats):
+        """
+        Delete the entries of the dictionary tables not used by any issue anymore,
+        then invalidate the IDs cached by the processes creating issues
+        """
+        for model, field in DICTIONARIES:
+            unused_qs = model.objects.filter(
+                ~Exists(Issue._base_manager.filter(**{field: OuterRef("id")}))
+            )
+            stats[model.__name__] += unused_qs._raw_delete(unused_qs.db)
+        bump_dictionaries_version()
 
-            # Store IDs of related Issues, to make issues deletion faster later on
-            chunk_issues_ids = list(
-                Issue.objects.filter(
-                    issue_links__revision_id__in=chunk_rev_ids
-                ).values_list("id", flat=True)
+    def count_revisions(self, clean_until, last_id, partitioned):
+        """
+        Count the rows that would be deleted along with old revisions,
+        from the same checkpoint and partitions as an actual cleanup
+        Returns None when there is no old revision to delete
+        """
+        rev_to_delete = Revision.objects.filter(created__lte=clean_until)
+        if last_id is not None:
+            rev_to_delete = rev_to_delete.filter(id__gt=last_id)
+
+        # Whole months of old revisions are dropped, regardless of the checkpoint
+        dropped = self.list_dropped_partitions(clean_until) if partitioned else {}
+        if dropped:
+            rev_to_delete |= Revision.objects.filter(
+                created__lt=month_datetime(add_months(max(dropped), 1))
             )
+        elif not rev_to_delete.exists():
+            return None
 
-            # Delete IssueLink for this chunk
-            links_qs = IssueLink.objects.filter(revision_id__in=chunk_rev_ids)
-            links_count = links_qs._raw_delete(links_qs.db)
-            stats["IssueLink"] += links_count
-
-            # Perform a raw deletion to avoid Django performing lookups to IssueLink
-            # as the M2M has already be cleaned up at this stage.
-            diffs_qs = Diff.objects.filter(revision__id__in=chunk_rev_ids)
-            diffs_count = diffs_qs._raw_delete(diffs_qs.db)
-            stats["Diff"] += diffs_count
-
-            # Only delete issues that are not linked to a revision anymore
-            issues_qs = Issue.objects.filter(
-                id__in=chunk_issues_ids,
-                issue_links=None,
+        # Issues without any remaining link, only the ones linked to the deleted
+        # revisions unless they are all deleted in a single pass
+        old_issues = Issue._base_manager.exclude(
+            Exists(
+                IssueLink.objects.filter(issue_id=OuterRef("id")).exclude(
+                    revision__in=rev_to_delete
+                )
+            )
+        )
+        if not dropped:
+            old_issues = old_issues.filter(
+                Exists(
+                    IssueLink.objects.filter(
+                        issue_id=OuterRef("id"), revision__in=rev_to_delete
+                    )
+                )
             )
-            # Perform a raw deletion to avoid Django performing lookups to IssueLink
-            # as the M2M has already be cleaned up at this stage.
-            issues_count = issues_qs._raw_delete(issues_qs.db)
-            stats["Issue"] += issues_count
 
-        # Drop the revisions with a raw deletion to avoid Django performing lookups to IssueLink
+        counts = {
+            "IssueLink": IssueLink.objects.filter(revision__in=rev_to_delete).count(),
+            "Diff": Diff.objects.filter(revision__in=rev_to_delete).count(),
+            "Issue": old_issues.count(),
+            "Revision": rev_to_delete.count(),
+        }
+        for model, field in DICTIONARIES:
+            counts[model.__name__] = model.objects.exclude(
+                Exists(
+                    Issue._base_manager.filter(**{field: OuterRef("id")}).exclude(
+                        id__in=old_issues
+                    )
+                )
+            ).count()
+        return counts
+
+    def delete_chunk(self, chunk_rev_ids, stats):
+        """
+        Delete a chunk of old revisions along with their links, diffs and issues
+        Returns the number of deleted rows
+        """
+        # Store IDs of related Issues, to make issues deletion faster later on
+        # The base manager does not join the dictionary tables of the issues
+        chunk_issues_ids = list(
+            Issue._base_manager.filter(issue_links__revision_id__in=chunk_rev_ids)
+            .order_by()
+            .values_list("id", flat=True)
+        )
+
+        # Delete IssueLink for this chunk
+        links_qs = IssueLink.objects.filter(revision_id__in=chunk_rev_ids)
+        counts = {"IssueLink": links_qs._raw_delete(links_qs.db)}
+
+        # Perform a raw deletion to avoid Django performing lookups to IssueLink
         # as the M2M has already be cleaned up at this stage.
-        rev_count = rev_to_delete._raw_delete(rev_to_delete.db)
-        stats["Revision"] += rev_count
+        diffs_qs = Diff.objects.filter(revision_id__in=chunk_rev_ids)
+        counts["Diff"] = diffs_qs._raw_delete(diffs_qs.db)
+
+        # Only delete issues that are not linked to a revision anymore
+        issues_qs = Issue._base_manager.filter(
+            id__in=chunk_issues_ids,
+            issue_links=None,
+        )
+        counts["Issue"] = issues_qs._raw_delete(issues_qs.db)
+
+        rev_qs = Revision.objects.filter(id__in=chunk_rev_ids)
+        counts["Revision"] = rev_qs._raw_delete(rev_qs.db)
+
+        for key, count in counts.items():
+            stats[key] += count
+        return sum(counts.values())
+
+    def delete_revisions(self, clean_until, last_id, options, stats):
+        """
+        Delete old revisions by chunks paginated on their IDs, each in a short
+        transaction saving the progress, so that an interrupted cleanup resumes
+        from its last chunk
+        Returns the number of deleted revisions
+        """
+        chunk_size = options["chunk_size"]
+        rows_per_second = options["rows_per_second"]
+        rev_to_delete = Revision.objects.filter(created__lte=clean_until).order_by("id")
+
+        nb_revisions = 0
+        while True:
+            started = time.monotonic()
+            chunk_qs = rev_to_delete
+            if last_id is not None:
+                chunk_qs = chunk_qs.filter(id__gt=last_id)
+            chunk_rev_ids = list(chunk_qs.values_list("id", flat=True)[:chunk_size])
+            if not chunk_rev_ids:
+                break
+
+            with transaction.atomic():
+                nb_rows = self.delete_chunk(chunk_rev_ids, stats)
+                last_id = chunk_rev_ids[-1]
+                # The last chunk completes the cleanup, leaving no progress to save
+                if len(chunk_rev_ids) == chunk_size:
+                    cache.set(
+                        CHECKPOINT_KEY,
+                        {"clean_until": clean_until, "last_id": last_id},
+                        timeout=None,
+                    )
+            nb_revisions += len(chunk_rev_ids)
+            logger.info(f"Deleted {nb_revisions} revisions, up to #{last_id}.")
+
+            if len(chunk_rev_ids) < chunk_size:
+                break
+
+            # Wait so that the deleted rows do not exceed the allowed rate
+            if rows_per_second:
+                delay = nb_rows / rows_per_second - (time.monotonic() - started)
+                if delay > 0:
+                    time.sleep(delay)
+
+        return nb_revisions
+
+    def handle(self, *args, **options):
+        dry_run = options["dry_run"]
+        self.cleanup_repositories(dry_run)
+
+        now = timezone.now()
+        clean_until = now - timedelta(days=options["nb_days"])
+
+        # Resume an interrupted cleanup with its cleanup date
+        last_id = None
+        checkpoint = None if options["restart"] else cache.get(CHECKPOINT_KEY)
+        if checkpoint is not None:
+            clean_until, last_id = checkpoint["clean_until"], checkpoint["last_id"]
+            if dry_run:
+                logger.info(f"Would resume the cleanup after revision #{last_id}.")
+            else:
+                logger.info(f"Resuming the cleanup after revision #{last_id}.")
+
+        if dry_run:
+            counts = self.count_revisions(
+                clean_until, last_id, is_partitioned(Revision)
+            )
+            if counts is None:
+                logger.info("Didn't find any old revision to delete.")
+                return
+            msg = ", ".join((f"{n} {key}" for key, n in counts.items()))
+            logger.info(f"Would delete {msg}.")
+            return
+
+        stats = {model.__name__: 0 for model in DELETED_MODELS}
+
+        # Whole months of old revisions are dropped at once from partitioned tables
+        dropped_partitions = 0
+        if is_partitioned(Revision):
+            dropped_partitions = self.drop_partitions(now, clean_until, stats)
+
+        nb_revisions = self.delete_revisions(clean_until, last_id, options, stats)
+        if checkpoint is not None or nb_revisions >= options["chunk_size"]:
+            cache.delete(CHECKPOINT_KEY)
+
+        if not nb_revisions and not dropped_partitions:
+            logger.info("Didn't find any old revision to delete.")
+            return
+
+        if dropped_partitions:
+            # Issues of the dropped partitions are only orphaned once all their
+            # links are gone, so they are deleted in a single pass
+            issues_qs = Issue._base_manager.filter(
+                ~Exists(IssueLink.objects.filter(issue_id=OuterRef("id")))
+            )
+            stats["Issue"] += issues_qs._raw_delete(issues_qs.db)
+
+        # The strings of the deleted issues may not be used anymore
+        self.cleanup_dictionaries(stats)
+
+        # Cached responses may still refer to the deleted rows
+        bump_issues_version()
 
         msg = ", ".join((f"{n} {key}" for key, n in stats.items()))
         logger.info(f"Deleted {msg}.")
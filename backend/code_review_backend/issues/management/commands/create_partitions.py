@@ -0,0 +1,27 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import logging
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from code_review_backend.issues.models import Revision
+from code_review_backend.issues.partitions import ensure_partitions, is_partitioned
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Create the monthly partitions of the upcoming months, to be scheduled "
+        "so that new rows are never stored in the default partitions"
+    )
+
+    def handle(self, *args, **options):
+        if not is_partitioned(Revision):
+            logger.info("Tables are not partitioned.")
+            return
+
+        ensure_partitions(timezone.now())
@@ -76,12 +76,14 @@ def process_diff(diff: Diff):
         lines = load_hgmo_patch(diff)
 
         issue_links = [
-            detect_in_patch(issue_link, lines) for issue_link in diff.issue_links.all()
+            detect_in_patch(issue_link, lines)
+            for issue_link in diff.issue_links.select_related("issue__path_ref")
         ]
         logging.info(
             f"Found {len([i for i in issue_links if i.in_patch])} issue link in patch for {diff.id}"
         )
         IssueLink.objects.bulk_update(issue_links, ["in_patch"])
+        Diff.objects.filter(id=diff.id).update_issues_counters()
     except Exception as e:
         logging.info(f"Failure on diff {diff.id}: {e}")
 
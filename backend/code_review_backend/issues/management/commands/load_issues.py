@@ -6,6 +6,7 @@ import json
 import logging
 import os
 import tempfile
+import uuid
 from urllib.parse import urlparse
 
 import taskcluster
@@ -14,8 +15,15 @@ from django.core.management.base import BaseCommand
 from django.db import transaction
 from requests.exceptions import HTTPError
 
-from code_review_backend.issues.compare import detect_new_for_revision
-from code_review_backend.issues.models import Issue, IssueLink, Repository
+from code_review_backend.issues.cache import bump_issues_version
+from code_review_backend.issues.compare import detect_new_for_revision_bulk
+from code_review_backend.issues.models import (
+    CheckDailyStats,
+    Diff,
+    Issue,
+    IssueLink,
+    Repository,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -67,44 +75,66 @@ class Command(BaseCommand):
             except Exception as e:
                 logger.error(f"Failed to save issues for {task_id}: {e}", exc_info=True)
 
+        bump_issues_version()
+
     @transaction.atomic
     def save_issues(self, diff, issues):
+        # Count the issues of the diff and of the report in the daily statistics
+        # of their checks, before they are removed or linked again
+        found_links = IssueLink.objects.filter(
+            issue__hash__in={
+                *diff.issues.values_list("hash", flat=True),
+                *(uuid.UUID(hex=i["hash"]) for i in issues if i["hash"]),
+            }
+        )
+        previous_stats = CheckDailyStats.objects.count_links(found_links)
+
         # Remove all issues from diff
         diff.issues.all().delete()
 
-        # Build all issues for that diff, in a single DB call
+        # Build all issues for that diff, each paired with its report entry
+        # as issues without hash are skipped
         created_issues = [
-            Issue.objects.get_or_create(
-                hash=i["hash"],
-                defaults={
-                    "path": i["path"],
-                    "level": i.get("level", "warning"),
-                    "analyzer_check": i.get("kind") or i.get("check"),
-                    "message": i.get("message"),
-                    "analyzer": i["analyzer"],
-                },
+            (
+                Issue.objects.with_values().get_or_create(
+                    hash=uuid.UUID(hex=i["hash"]),
+                    defaults={
+                        "path": i["path"],
+                        "level": i.get("level", "warning"),
+                        "analyzer_check": i.get("kind") or i.get("check"),
+                        "message": i.get("message"),
+                        "analyzer": i["analyzer"],
+                    },
+                )[0],
+                i,
             )
             for i in issues
             if i["hash"]
         ]
 
+        # Detect all the new issues of the revision at once
+        new_issues = detect_new_for_revision_bulk(
+            diff, [(issue_db.path, issue_db.hash) for issue_db, _ in created_issues]
+        )
+
         IssueLink.objects.bulk_create(
             [
                 IssueLink(
                     issue=issue_db,
                     diff=diff,
                     revision_id=diff.revision_id,
-                    new_for_revision=detect_new_for_revision(
-                        diff, path=issue_db.path, hash=issue_db.hash
-                    ),
+                    revision_created=diff.revision.created,
+                    new_for_revision=new_issues[(issue_db.path, issue_db.hash)],
                     line=issue_src["line"],
                     nb_lines=issue_src.get("nb_lines", 1),
                     char=issue_src.get("char"),
                 )
-                for (issue_db, _), issue_src in zip(created_issues, issues)
+                for issue_db, issue_src in created_issues
             ],
             ignore_conflicts=True,
         )
+        Diff.objects.filter(id=diff.id).update_issues_counters()
+        CheckDailyStats.objects.update_links(found_links, previous_stats)
         return created_issues
 
     def load_tasks(self, environment, chunk=200):
@@ -0,0 +1,142 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import logging
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Min
+from django.utils import timezone
+
+from code_review_backend.issues.models import IssueLink, Revision
+from code_review_backend.issues.partitions import (
+    MONTHS_AHEAD,
+    PARTITIONED_MODELS,
+    add_months,
+    create_partitions,
+    create_revision_keys,
+    is_partitioned,
+    month_start,
+)
+
+logger = logging.getLogger(__name__)
+
+# Closing parenthesis of the columns of an index definition
+INDEX_COLUMNS_END = re.compile(r"\)( WHERE .*)?$")
+
+
+class Command(BaseCommand):
+    help = (
+        "Convert the revisions and issues links tables to tables partitioned "
+        "by month on PostgreSQL, so that old rows can be dropped by whole partitions"
+    )
+
+    def get_indexes(self, cursor, table):
+        """Definitions of the indexes of a table, except its primary key"""
+        cursor.execute(
+            """
+            SELECT pg_get_indexdef(indexrelid), indisunique FROM pg_index
+            WHERE indrelid = %s::regclass AND NOT indisprimary
+            """,
+            [table],
+        )
+        return cursor.fetchall()
+
+    def get_foreign_keys(self, cursor, table):
+        """Definitions of the foreign keys of a table, by name"""
+        cursor.execute(
+            """
+            SELECT conname, pg_get_constraintdef(oid), confrelid::regclass::text
+            FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'f'
+            """,
+            [table],
+        )
+        return cursor.fetchall()
+
+    def partition_table(self, cursor, model, key, first_month, last_month):
+        table = model._meta.db_table
+        old_table = f"{table}_unpartitioned"
+        quote = connection.ops.quote_name
+
+        cursor.execute(f"ALTER TABLE {quote(table)} RENAME TO {quote(old_table)}")
+        indexes = self.get_indexes(cursor, old_table)
+        foreign_keys = self.get_foreign_keys(cursor, old_table)
+
+        cursor.execute(
+            f"CREATE TABLE {quote(table)} (LIKE {quote(old_table)} "
+            "INCLUDING DEFAULTS INCLUDING IDENTITY INCLUDING CONSTRAINTS) "
+            f"PARTITION BY RANGE ({quote(key)})"
+        )
+        create_partitions(model, first_month, last_month)
+
+        # Links are copied with the creation date of their revision
+        columns = [field.column for field in model._meta.concrete_fields]
+        values = [f"old.{quote(column)}" for column in columns]
+        join = ""
+        if model is IssueLink:
+            values[columns.index(key)] = "revision.created"
+            join = (
+                f"INNER JOIN {quote(Revision._meta.db_table)} AS revision "
+                "ON revision.id = old.revision_id"
+            )
+        cursor.execute(
+            f"INSERT INTO {quote(table)} ({', '.join(map(quote, columns))}) "
+            f"SELECT {', '.join(values)} FROM {quote(old_table)} AS old {join}"
+        )
+        nb_rows = cursor.rowcount
+
+        # Foreign keys referencing the old table are dropped along with it,
+        # those to the revisions are recreated once both tables are partitioned
+        cursor.execute(f"DROP TABLE {quote(old_table)} CASCADE")
+
+        # Unique indexes of a partitioned table must include its partition key
+        cursor.execute(f"ALTER TABLE {quote(table)} ADD PRIMARY KEY (id, {quote(key)})")
+        for definition, unique in indexes:
+            definition = re.sub(
+                rf" ON (\S+\.)?{old_table} ", f" ON {quote(table)} ", definition
+            )
+            if unique:
+                definition = INDEX_COLUMNS_END.sub(
+                    rf", {quote(key)})\1", definition, count=1
+                )
+            cursor.execute(definition)
+
+        # Foreign keys can't reference a partitioned table without its partition key,
+        # the revisions keys table is referenced instead
+        for name, definition, referenced in foreign_keys:
+            if referenced == Revision._meta.db_table:
+                continue
+            cursor.execute(
+                f"ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(name)} {definition}"
+            )
+
+        cursor.execute(
+            "SELECT setval(pg_get_serial_sequence(%s, 'id'), "
+            f"(SELECT coalesce(max(id), 0) + 1 FROM {quote(table)}), false)",
+            [table],
+        )
+        logger.info(f"Partitioned {nb_rows} rows of {table}.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("Partitioning is only supported on PostgreSQL")
+
+        if is_partitioned(Revision):
+            logger.info("Tables are already partitioned.")
+            return
+
+        current = month_start(timezone.now())
+        oldest = Revision.objects.aggregate(oldest=Min("created"))["oldest"]
+        first_month = month_start(oldest) if oldest is not None else current
+        last_month = add_months(current, MONTHS_AHEAD)
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            # Tables can't be dropped with deferred foreign keys checks pending
+            cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+            for model, key in PARTITIONED_MODELS:
+                self.partition_table(cursor, model, key, first_month, last_month)
+
+            # Revisions are still unique by their Phabricator identifiers
+            create_revision_keys(cursor)
@@ -0,0 +1,49 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import logging
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+from django.utils import timezone
+
+from code_review_backend.issues.cache import bump_issues_version
+from code_review_backend.issues.models import CheckDailyStats, Revision
+
+logger = logging.getLogger(__name__)
+
+
+def parse_date(value):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        raise CommandError(f"Invalid date {value} - should be YYYY-MM-DD")
+
+
+class Command(BaseCommand):
+    help = "Rebuild the daily statistics of the checks from the stored issues"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--since",
+            type=parse_date,
+            help=(
+                "Rebuild the statistics from that day (YYYY-MM-DD), defaults to the "
+                "day of the oldest revision, to keep the statistics of removed revisions"
+            ),
+        )
+
+    def handle(self, *args, **options):
+        since = options["since"]
+        if since is None:
+            oldest = Revision.objects.aggregate(oldest=Min("created"))["oldest"]
+            if oldest is None:
+                logger.info("Didn't find any revision to compute statistics from.")
+                return
+            since = timezone.localdate(oldest)
+
+        nb_stats = CheckDailyStats.objects.rebuild(since)
+        bump_issues_version()
+        logger.info(f"Rebuilt {nb_stats} daily statistics of checks since {since}.")
@@ -0,0 +1,61 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import logging
+import math
+
+from django.core.management.base import BaseCommand
+
+from code_review_backend.issues.models import Diff
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compute the issues counters of diffs from their links, "
+        "to fill them on existing diffs or repair them"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=1000,
+            help="Number of diffs updated in a single query, defaults to 1000",
+        )
+        parser.add_argument(
+            "--diff",
+            type=int,
+            action="append",
+            dest="diffs",
+            help="Only update that diff, can be used multiple times",
+        )
+
+    def handle(self, *args, **options):
+        diffs = Diff.objects.order_by("id")
+        if options["diffs"]:
+            diffs = diffs.filter(id__in=options["diffs"])
+
+        total = diffs.count()
+        if not total:
+            logger.info("Didn't find any diff to update.")
+            return
+
+        chunk_size = options["chunk_size"]
+        iterations = math.ceil(total / chunk_size)
+        last_id = None
+        updated = 0
+        for i in range(1, iterations + 1):
+            # Paginate on the IDs, to keep each query on a small range of diffs
+            chunk = diffs if last_id is None else diffs.filter(id__gt=last_id)
+            chunk_ids = list(chunk.values_list("id", flat=True)[:chunk_size])
+            if not chunk_ids:
+                break
+            last_id = chunk_ids[-1]
+
+            logger.info(f"Page {i}/{iterations}.")
+            updated += Diff.objects.filter(id__in=chunk_ids).update_issues_counters()
+
+        logger.info(f"Updated issues counters of {updated} diffs.")
@@ -0,0 +1,36 @@
+# Generated by Django 5.1.6 on 2026-10-17 06:34
+
+from django.db import migrations, models
+
+# The counters of the existing diffs are filled by the update_diffs_counters
+# command once deployed, as computing them here would lock every diff
+# in the migration transaction
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("issues", "0015_remove_repository_phid_alter_repository_id"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="diff",
+            name="nb_errors",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="diff",
+            name="nb_issues",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="diff",
+            name="nb_issues_publishable",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="diff",
+            name="nb_warnings",
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.1.6 on 2026-10-17 06:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("issues", "0016_diff_issues_counters"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CheckDailyStats",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                ("date", models.DateField()),
+                ("analyzer", models.CharField(max_length=50)),
+                (
+                    "analyzer_check",
+                    models.CharField(blank=True, default="", max_length=250),
+                ),
+                ("total", models.PositiveIntegerField(default=0)),
+                ("publishable", models.PositiveIntegerField(default=0)),
+                ("distinct_issues", models.PositiveIntegerField(default=0)),
+                (
+                    "repository",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="check_stats",
+                        to="issues.repository",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "check daily stats",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("date", "repository", "analyzer", "analyzer_check"),
+                        name="check_daily_stats_unique",
+                    )
+                ],
+            },
+        ),
+    ]
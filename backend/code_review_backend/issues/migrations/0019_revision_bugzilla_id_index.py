@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-17 06:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("issues", "0018_cache_table"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="revision",
+            index=models.Index(
+                fields=["bugzilla_id"], name="issues_revi_bugzill_0799a6_idx"
+            ),
+        ),
+    ]
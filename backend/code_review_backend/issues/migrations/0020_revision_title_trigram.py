@@ -0,0 +1,43 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+from django.db import migrations
+
+# Index the expression used by Django for case insensitive lookups
+# (title__icontains), so that the search of diffs by title uses it
+CREATE_TRIGRAM_INDEX = """
+CREATE INDEX IF NOT EXISTS issues_revision_title_trgm
+ON issues_revision USING gin ((UPPER(title::text)) gin_trgm_ops)
+"""
+
+
+def create_trigram_index(apps, schema_editor):
+    """
+    Create the trigram index of the revisions titles on PostgreSQL,
+    when the pg_trgm extension is available. Searches fall back to
+    a sequential scan otherwise
+    """
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        if cursor.fetchone() is None:
+            return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    schema_editor.execute(CREATE_TRIGRAM_INDEX)
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute("DROP INDEX IF EXISTS issues_revision_title_trgm")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("issues", "0019_revision_bugzilla_id_index"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
@@ -0,0 +1,35 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+from django.db import migrations
+
+# Index the text search vector of the messages as an expression, matched by the
+# search queries, so that the issues table is not rewritten to store it
+ADD_MESSAGE_SEARCH = """
+CREATE INDEX IF NOT EXISTS issues_issue_message_search
+ON issues_issue USING gin (to_tsvector('english'::regconfig, coalesce(message, '')))
+"""
+
+DROP_MESSAGE_SEARCH = "DROP INDEX IF EXISTS issues_issue_message_search"
+
+
+def add_message_search(apps, schema_editor):
+    # Other databases search the messages with a LIKE
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(ADD_MESSAGE_SEARCH)
+
+
+def drop_message_search(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(DROP_MESSAGE_SEARCH)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("issues", "0020_revision_title_trigram"),
+    ]
+
+    operations = [
+        migrations.RunPython(add_message_search, drop_message_search),
+    ]
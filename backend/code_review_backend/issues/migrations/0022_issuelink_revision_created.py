@@ -0,0 +1,30 @@
+# Generated by Django 5.1.6 on 2026-10-17 06:55
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def fill_revision_created(apps, schema_editor):
+    """Copy the creation date of the revisions on their existing links"""
+    IssueLink = apps.get_model("issues", "IssueLink")
+    Revision = apps.get_model("issues", "Revision")
+    IssueLink.objects.filter(revision_created__isnull=True).update(
+        revision_created=Subquery(
+            Revision.objects.filter(id=OuterRef("revision_id")).values("created")[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("issues", "0021_issue_message_search"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="issuelink",
+            name="revision_created",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(fill_revision_created, migrations.RunPython.noop),
+    ]
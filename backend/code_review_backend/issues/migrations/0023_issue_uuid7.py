@@ -0,0 +1,23 @@
+# Generated by Django 5.1.6 on 2026-10-17 07:01
+
+from django.db import migrations, models
+
+import code_review_backend.issues.models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("issues", "0022_issuelink_revision_created"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="issue",
+            name="id",
+            field=models.UUIDField(
+                default=code_review_backend.issues.models.uuid7,
+                primary_key=True,
+                serialize=False,
+            ),
+        ),
+    ]
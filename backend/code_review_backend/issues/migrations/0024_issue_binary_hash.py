@@ -0,0 +1,42 @@
+# Generated by Django 5.1.6 on 2026-10-17 07:08
+
+import hashlib
+import re
+
+from django.db import migrations, models
+
+HASH_REGEX = re.compile(r"^[0-9a-f]{32}$")
+
+
+def normalize_hashes(apps, schema_editor):
+    """
+    Only hexadecimal MD5 digests can be stored as UUIDs, so other hashes
+    are lowered or hashed again
+    """
+    Issue = apps.get_model("issues", "Issue")
+    invalid = Issue.objects.exclude(hash__regex=HASH_REGEX.pattern)
+    for issue_id, issue_hash in invalid.values_list("id", "hash").iterator():
+        new_hash = issue_hash.lower()
+        if not HASH_REGEX.match(new_hash):
+            new_hash = hashlib.md5(issue_hash.encode()).hexdigest()
+        Issue.objects.filter(id=issue_id).update(hash=new_hash)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("issues", "0023_issue_uuid7"),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_hashes, migrations.RunPython.noop),
+        # The hash is already indexed by its unique constraint
+        migrations.RemoveIndex(
+            model_name="issue",
+            name="issue_hash_idx",
+        ),
+        migrations.AlterField(
+            model_name="issue",
+            name="hash",
+            field=models.UUIDField(unique=True),
+        ),
+    ]
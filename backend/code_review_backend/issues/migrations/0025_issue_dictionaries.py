@@ -0,0 +1,255 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import hashlib
+import uuid
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Each distinct string is stored once, then referenced by the issues
+# Foreign keys are checked right away, so that the table can be altered afterwards
+FILL_DICTIONARIES = """
+SET CONSTRAINTS ALL IMMEDIATE;
+
+INSERT INTO issues_issuepath (value)
+SELECT DISTINCT path FROM issues_issue;
+
+INSERT INTO issues_issuecheck (analyzer, analyzer_check)
+SELECT DISTINCT analyzer, coalesce(analyzer_check, '') FROM issues_issue;
+
+INSERT INTO issues_issuemessage (digest, value)
+SELECT DISTINCT ON (md5(message)) md5(message)::uuid, message
+FROM issues_issue WHERE message IS NOT NULL;
+
+UPDATE issues_issue AS i SET
+    path_ref_id = p.id,
+    check_ref_id = c.id,
+    message_ref_id = (
+        SELECT m.id FROM issues_issuemessage AS m
+        WHERE m.digest = md5(i.message)::uuid
+    )
+FROM issues_issuepath AS p, issues_issuecheck AS c
+WHERE p.value = i.path
+    AND c.analyzer = i.analyzer
+    AND c.analyzer_check = coalesce(i.analyzer_check, '');
+"""
+
+RESTORE_VALUES = """
+SET CONSTRAINTS ALL IMMEDIATE;
+
+UPDATE issues_issue AS i SET
+    path = p.value,
+    analyzer = c.analyzer,
+    analyzer_check = nullif(c.analyzer_check, ''),
+    message = (
+        SELECT m.value FROM issues_issuemessage AS m WHERE m.id = i.message_ref_id
+    )
+FROM issues_issuepath AS p, issues_issuecheck AS c
+WHERE p.id = i.path_ref_id AND c.id = i.check_ref_id;
+"""
+
+# The text search index of migration 0021 now only covers the distinct messages
+ADD_ISSUE_MESSAGE_SEARCH = """
+CREATE INDEX IF NOT EXISTS issues_issue_message_search
+ON issues_issue USING gin (to_tsvector('english'::regconfig, coalesce(message, '')))
+"""
+
+DROP_ISSUE_MESSAGE_SEARCH = "DROP INDEX IF EXISTS issues_issue_message_search"
+
+ADD_MESSAGE_SEARCH = """
+CREATE INDEX IF NOT EXISTS issues_issuemessage_search
+ON issues_issuemessage USING gin (to_tsvector('english'::regconfig, value))
+"""
+
+DROP_MESSAGE_SEARCH = "DROP INDEX IF EXISTS issues_issuemessage_search"
+
+
+def run_on_postgresql(sql):
+    def run(apps, schema_editor):
+        # Other databases search the messages with a LIKE
+        if schema_editor.connection.vendor == "postgresql":
+            schema_editor.execute(sql)
+
+    return run
+
+
+def fill_dictionaries(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(FILL_DICTIONARIES)
+        return
+
+    Issue = apps.get_model("issues", "Issue")
+    IssuePath = apps.get_model("issues", "IssuePath")
+    IssueCheck = apps.get_model("issues", "IssueCheck")
+    IssueMessage = apps.get_model("issues", "IssueMessage")
+    paths, checks, messages = {}, {}, {}
+    for issue in Issue.objects.all().iterator():
+        if issue.path not in paths:
+            paths[issue.path] = IssuePath.objects.create(value=issue.path).id
+        check = (issue.analyzer, issue.analyzer_check or "")
+        if check not in checks:
+            checks[check] = IssueCheck.objects.create(
+                analyzer=check[0], analyzer_check=check[1]
+            ).id
+        if issue.message is not None and issue.message not in messages:
+            messages[issue.message] = IssueMessage.objects.create(
+                digest=uuid.UUID(bytes=hashlib.md5(issue.message.encode()).digest()),
+                value=issue.message,
+            ).id
+        Issue.objects.filter(id=issue.id).update(
+            path_ref_id=paths[issue.path],
+            check_ref_id=checks[check],
+            message_ref_id=messages.get(issue.message),
+        )
+
+
+def restore_values(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(RESTORE_VALUES)
+        return
+
+    Issue = apps.get_model("issues", "Issue")
+    for issue in (
+        Issue.objects.select_related("path_ref", "check_ref", "message_ref")
+        .all()
+        .iterator()
+    ):
+        Issue.objects.filter(id=issue.id).update(
+            path=issue.path_ref.value,
+            analyzer=issue.check_ref.analyzer,
+            analyzer_check=issue.check_ref.analyzer_check or None,
+            message=issue.message_ref and issue.message_ref.value,
+        )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("issues", "0024_issue_binary_hash"),
+    ]
+
+    operations = [
+        # Allows restoring the values when reverting this migration
+        migrations.AlterField(
+            model_name="issue",
+            name="path",
+            field=models.CharField(max_length=250, null=True),
+        ),
+        migrations.AlterField(
+            model_name="issue",
+            name="analyzer",
+            field=models.CharField(max_length=50, null=True),
+        ),
+        migrations.CreateModel(
+            name="IssuePath",
+            fields=[
+                ("id", models.AutoField(primary_key=True, serialize=False)),
+                ("value", models.CharField(max_length=250, unique=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="IssueCheck",
+            fields=[
+                ("id", models.AutoField(primary_key=True, serialize=False)),
+                ("analyzer", models.CharField(max_length=50)),
+                (
+                    "analyzer_check",
+                    models.CharField(blank=True, default="", max_length=250),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("analyzer", "analyzer_check"),
+                        name="issue_check_unique",
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="IssueMessage",
+            fields=[
+                ("id", models.AutoField(primary_key=True, serialize=False)),
+                ("digest", models.UUIDField(unique=True)),
+                ("value", models.TextField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name="issue",
+            name="path_ref",
+            field=models.ForeignKey(
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="issues",
+                to="issues.issuepath",
+            ),
+        ),
+        migrations.AddField(
+            model_name="issue",
+            name="check_ref",
+            field=models.ForeignKey(
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="issues",
+                to="issues.issuecheck",
+            ),
+        ),
+        migrations.AddField(
+            model_name="issue",
+            name="message_ref",
+            field=models.ForeignKey(
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="issues",
+                to="issues.issuemessage",
+            ),
+        ),
+        migrations.RunPython(fill_dictionaries, restore_values),
+        migrations.RunPython(
+            run_on_postgresql(DROP_ISSUE_MESSAGE_SEARCH),
+            run_on_postgresql(ADD_ISSUE_MESSAGE_SEARCH),
+        ),
+        migrations.RemoveIndex(
+            model_name="issue",
+            name="issues_issu_path_ee2627_idx",
+        ),
+        migrations.RemoveField(
+            model_name="issue",
+            name="path",
+        ),
+        migrations.RemoveField(
+            model_name="issue",
+            name="analyzer",
+        ),
+        migrations.RemoveField(
+            model_name="issue",
+            name="analyzer_check",
+        ),
+        migrations.RemoveField(
+            model_name="issue",
+            name="message",
+        ),
+        migrations.AlterField(
+            model_name="issue",
+            name="path_ref",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="issues",
+                to="issues.issuepath",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="issue",
+            name="check_ref",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="issues",
+                to="issues.issuecheck",
+            ),
+        ),
+        migrations.RunPython(
+            run_on_postgresql(ADD_MESSAGE_SEARCH),
+            run_on_postgresql(DROP_MESSAGE_SEARCH),
+        ),
+    ]
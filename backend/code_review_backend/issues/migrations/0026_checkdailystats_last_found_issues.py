@@ -0,0 +1,63 @@
+# Generated by Django 5.1.6 on 2026-10-17 07:44
+
+from collections import Counter
+
+from django.db import migrations, models
+from django.db.models import F, Max
+from django.utils import timezone
+
+
+def count_last_found_issues(apps, schema_editor):
+    """
+    Count each issue in the existing statistics of the day it was last found
+    on a repository, as done when ingesting issues
+    """
+    CheckDailyStats = apps.get_model("issues", "CheckDailyStats")
+    IssueLink = apps.get_model("issues", "IssueLink")
+
+    counts = Counter()
+    for values in (
+        IssueLink.objects.values(
+            "issue_id",
+            repository_id=F("revision__head_repository_id"),
+            analyzer=F("issue__check_ref__analyzer"),
+            check=F("issue__check_ref__analyzer_check"),
+        )
+        .annotate(last_found=Max("revision__created"))
+        .order_by()
+        .iterator()
+    ):
+        key = (
+            timezone.localdate(values["last_found"]),
+            values["repository_id"],
+            values["analyzer"],
+            values["check"],
+        )
+        counts[key] += 1
+
+    updated_stats = []
+    for stats in CheckDailyStats.objects.filter(
+        date__in={day for day, *_ in counts}
+    ).iterator():
+        key = (stats.date, stats.repository_id, stats.analyzer, stats.analyzer_check)
+        if key in counts:
+            stats.last_found_issues = counts[key]
+            updated_stats.append(stats)
+    CheckDailyStats.objects.bulk_update(
+        updated_stats, ["last_found_issues"], batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("issues", "0025_issue_dictionaries"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="checkdailystats",
+            name="last_found_issues",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(count_last_found_issues, migrations.RunPython.noop),
+    ]
@@ -2,18 +2,39 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
+import hashlib
 import urllib.parse
 import uuid
+from collections import defaultdict
+from datetime import datetime, time
+from time import time_ns
 
 from django.conf import settings
-from django.db import models
-from django.db.models import Q
+from django.db import models, transaction
+from django.db.models import Count, F, Max, Min, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, NullIf, TruncDate
+from django.utils import timezone
+
+from code_review_backend.issues.cache import get_dictionaries_version
 
 LEVEL_WARNING = "warning"
 LEVEL_ERROR = "error"
 ISSUE_LEVELS = ((LEVEL_WARNING, "Warning"), (LEVEL_ERROR, "Error"))
 
 
+def uuid7():
+    """
+    Build a time-ordered UUID (version 7 from RFC 9562), starting with the
+    current timestamp in milliseconds followed by random bits, so that new
+    rows are appended at the end of the indexes instead of random pages
+    """
+    value = (time_ns() // 1_000_000) << 80 | uuid.uuid4().int & ((1 << 80) - 1)
+    # Set the version and the variant bits
+    value = value & ~(0xF << 76) | 7 << 76
+    value = value & ~(0x3 << 62) | 0x2 << 62
+    return uuid.UUID(int=value)
+
+
 class Repository(models.Model):
     id = models.AutoField(primary_key=True)
 
@@ -74,7 +95,11 @@ class Revision(models.Model):
     class Meta:
         ordering = ("phabricator_id", "id")
 
-        indexes = (models.Index(fields=["head_repository", "head_changeset"]),)
+        indexes = (
+            models.Index(fields=["head_repository", "head_changeset"]),
+            # Diffs are searched by their Bugzilla ID
+            models.Index(fields=["bugzilla_id"]),
+        )
         constraints = [
             models.UniqueConstraint(
                 fields=["phabricator_id"],
@@ -101,6 +126,33 @@ class Revision(models.Model):
         return f"{parser.scheme}://{parser.netloc}/D{self.phabricator_id}"
 
 
+class DiffQuerySet(models.QuerySet):
+    def update_issues_counters(self):
+        """
+        Compute the issues counters of the diffs from their links, in a single query
+        Returns the number of updated diffs
+        """
+
+        def count_links(condition=Q()):
+            links = (
+                IssueLink.objects.filter(condition, diff_id=OuterRef("id"))
+                .order_by()
+                .values("diff_id")
+                .annotate(total=Count("id"))
+                .values("total")
+            )
+            return Coalesce(Subquery(links), 0)
+
+        return self.update(
+            nb_issues=count_links(),
+            nb_errors=count_links(Q(issue__level=LEVEL_ERROR)),
+            nb_warnings=count_links(Q(issue__level=LEVEL_WARNING)),
+            nb_issues_publishable=count_links(
+                Q(in_patch=True) | Q(issue__level=LEVEL_ERROR)
+            ),
+        )
+
+
 class Diff(models.Model):
     """Reference of a specific code patch (diff) in Phabricator.
     A revision can be linked to multiple successive diffs, or none in case of a repository push.
@@ -125,6 +177,15 @@ class Diff(models.Model):
         Repository, related_name="diffs", on_delete=models.CASCADE
     )
 
+    # Counters of the issues linked to this diff, updated when ingesting issues
+    # so that diffs can be listed without aggregating their links
+    nb_issues = models.PositiveIntegerField(default=0)
+    nb_issues_publishable = models.PositiveIntegerField(default=0)
+    nb_warnings = models.PositiveIntegerField(default=0)
+    nb_errors = models.PositiveIntegerField(default=0)
+
+    objects = DiffQuerySet.as_manager()
+
     def __str__(self):
         return f"Diff {self.id}"
 
@@ -169,6 +230,10 @@ class IssueLink(models.Model):
     nb_lines = models.PositiveIntegerField(null=True)
     char = models.PositiveIntegerField(null=True)
 
+    # Creation date of the revision, so that links can be partitioned
+    # along with their revision (see the partition_tables command)
+    revision_created = models.DateTimeField(null=True, blank=True)
+
     class Meta:
         constraints = [
             # Two constraints are required as Null values are not compared for unicity
@@ -184,16 +249,260 @@ class IssueLink(models.Model):
             ),
         ]
 
+    def save(self, *args, **kwargs):
+        if self.revision_created is None:
+            self.revision_created = self.revision.created
+        super().save(*args, **kwargs)
+
     @property
     def publishable(self):
         """Is that issue publishable on Phabricator to developers"""
         return self.in_patch is True or self.issue.level == LEVEL_ERROR
 
 
+class DictionaryManager(models.Manager):
+    """
+    Entries of a dictionary table, storing once a string repeated by many issues
+    Entries are never updated, so their IDs are kept in a cache local to each
+    process, until the cleanup of unused entries changes the dictionaries version
+    """
+
+    # Number of IDs kept in the cache of each process
+    cache_size = 50_000
+
+    def __init__(self):
+        super().__init__()
+        self.cached_ids = {}
+        self.cached_version = None
+
+    def refresh_cache(self, version):
+        """Drop the cached IDs when they were built from another dictionaries version"""
+        if version != self.cached_version:
+            self.cached_ids.clear()
+            self.cached_version = version
+
+    def get_ids(self, values):
+        """
+        Map values to the IDs of their entries, creating the missing ones
+        Only the IDs of committed entries are cached, as a rollback removes them
+        """
+        ids, missing = {}, {}
+        for value in set(values):
+            key = self.model.build_key(value)
+            if key in self.cached_ids:
+                ids[value] = self.cached_ids[key]
+            else:
+                missing[key] = value
+        if not missing:
+            return ids
+
+        self.bulk_create(
+            [self.model.from_key(key, value) for key, value in missing.items()],
+            ignore_conflicts=True,
+        )
+        found = {
+            entry.key: entry.id
+            for entry in self.filter(self.model.lookup(missing.keys()))
+        }
+        assert found.keys() == missing.keys(), "Failed to create all entries"
+        ids.update((missing[key], entry_id) for key, entry_id in found.items())
+
+        def cache_ids():
+            if len(self.cached_ids) + len(found) > self.cache_size:
+                self.cached_ids.clear()
+            self.cached_ids.update(found)
+
+        transaction.on_commit(cache_ids, using=self.db)
+        return ids
+
+
+class IssuePath(models.Model):
+    """Path of a file where issues are found"""
+
+    id = models.AutoField(primary_key=True)
+    value = models.CharField(max_length=250, unique=True)
+
+    objects = DictionaryManager()
+
+    def __str__(self):
+        return self.value
+
+    @property
+    def key(self):
+        return self.value
+
+    @staticmethod
+    def build_key(value):
+        return value or ""
+
+    @classmethod
+    def from_key(cls, key, value):
+        return cls(value=key)
+
+    @staticmethod
+    def lookup(keys):
+        return Q(value__in=keys)
+
+
+class IssueCheck(models.Model):
+    """Analyzer and check detecting issues"""
+
+    id = models.AutoField(primary_key=True)
+    analyzer = models.CharField(max_length=50)
+    # Empty when the issues have no check, so that it is part of the unique key
+    analyzer_check = models.CharField(max_length=250, blank=True, default="")
+
+    objects = DictionaryManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["analyzer", "analyzer_check"],
+                name="issue_check_unique",
+            ),
+        ]
+
+    def __str__(self):
+        if self.analyzer_check:
+            return f"{self.analyzer} - {self.analyzer_check}"
+        return self.analyzer
+
+    @property
+    def key(self):
+        return (self.analyzer, self.analyzer_check)
+
+    @staticmethod
+    def build_key(value):
+        analyzer, check = value
+        return (analyzer or "", check or "")
+
+    @classmethod
+    def from_key(cls, key, value):
+        analyzer, check = key
+        return cls(analyzer=analyzer, analyzer_check=check)
+
+    @staticmethod
+    def lookup(keys):
+        query = Q(pk__in=[])
+        for analyzer, check in keys:
+            query |= Q(analyzer=analyzer, analyzer_check=check)
+        return query
+
+
+class IssueMessage(models.Model):
+    """
+    Message describing issues, identified by its MD5 digest as long texts
+    cannot be compared by a unique index
+    """
+
+    id = models.AutoField(primary_key=True)
+    digest = models.UUIDField(unique=True)
+    value = models.TextField()
+
+    objects = DictionaryManager()
+
+    def __str__(self):
+        return self.value
+
+    @property
+    def key(self):
+        return self.digest
+
+    @staticmethod
+    def build_key(value):
+        return uuid.UUID(bytes=hashlib.md5(value.encode()).digest())
+
+    @classmethod
+    def from_key(cls, key, value):
+        return cls(digest=key, value=value)
+
+    @staticmethod
+    def lookup(keys):
+        return Q(digest__in=keys)
+
+
+class DictionaryValue(property):
+    """
+    Attribute of an issue stored in a dictionary table, loaded with the issues
+    by IssueQuerySet.with_values or read from the referenced entry
+    Values set on an issue are resolved to their entries when it is saved
+    """
+
+    def __init__(self, relation, field, empty_value=""):
+        super().__init__(self.get_value, self.set_value)
+        self.relation = relation
+        self.field = field
+        self.empty_value = empty_value
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def get_value(self, issue):
+        if self.name in issue.__dict__:
+            return issue.__dict__[self.name]
+        if getattr(issue, f"{self.relation}_id") is None:
+            return None
+        value = getattr(getattr(issue, self.relation), self.field)
+        return self.empty_value if value == "" else value
+
+    def set_value(self, issue, value):
+        issue.__dict__[self.name] = value
+
+
+class IssueQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        set_entries(objs)
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def with_values(self):
+        """
+        Load the values of the dictionary tables under their former names,
+        only for the queries that need them as it joins all those tables
+        """
+        return self.annotate(
+            path=F("path_ref__value"),
+            analyzer=F("check_ref__analyzer"),
+            analyzer_check=NullIf("check_ref__analyzer_check", Value("")),
+            message=F("message_ref__value"),
+        )
+
+
+def refresh_dictionaries():
+    """
+    Check the cached IDs of all the dictionary entries are still valid,
+    in a single query before resolving values to their entries
+    """
+    version = get_dictionaries_version()
+    for model in (IssuePath, IssueCheck, IssueMessage):
+        model.objects.refresh_cache(version)
+
+
+def set_entries(issues):
+    """
+    Reference the dictionary entries of the values set on issues,
+    with a single query per dictionary table for all the missing entries
+    """
+    refresh_dictionaries()
+    paths = IssuePath.objects.get_ids(issue.path for issue in issues)
+    checks = IssueCheck.objects.get_ids(
+        (issue.analyzer, issue.analyzer_check) for issue in issues
+    )
+    messages = IssueMessage.objects.get_ids(
+        issue.message for issue in issues if issue.message is not None
+    )
+    for issue in issues:
+        issue.path_ref_id = paths[issue.path]
+        issue.check_ref_id = checks[(issue.analyzer, issue.analyzer_check)]
+        issue.message_ref_id = (
+            messages[issue.message] if issue.message is not None else None
+        )
+
+
 class Issue(models.Model):
     """An issue detected on a Phabricator patch"""
 
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4)
+    id = models.UUIDField(primary_key=True, default=uuid7)
 
     revisions = models.ManyToManyField(
         "issues.Revision",
@@ -206,22 +515,219 @@ class Issue(models.Model):
         related_name="issues",
     )
 
-    # Raw issue data
-    path = models.CharField(max_length=250)
+    # Raw issue data, the strings repeated by many issues being
+    # stored once in dictionary tables
+    path_ref = models.ForeignKey(
+        IssuePath, related_name="issues", on_delete=models.PROTECT
+    )
     level = models.CharField(max_length=20, choices=ISSUE_LEVELS)
-    analyzer_check = models.CharField(max_length=250, null=True)
-    message = models.TextField(null=True)
-    analyzer = models.CharField(max_length=50)
+    check_ref = models.ForeignKey(
+        IssueCheck, related_name="issues", on_delete=models.PROTECT
+    )
+    message_ref = models.ForeignKey(
+        IssueMessage, related_name="issues", on_delete=models.PROTECT, null=True
+    )
 
-    # Calculated hash identifying issue
-    hash = models.CharField(max_length=32, unique=True)
+    path = DictionaryValue("path_ref", "value")
+    analyzer = DictionaryValue("check_ref", "analyzer")
+    # Checks are stored as empty strings in their unique key
+    analyzer_check = DictionaryValue("check_ref", "analyzer_check", empty_value=None)
+    message = DictionaryValue("message_ref", "value")
+
+    # Calculated hash identifying issue, a MD5 digest stored in 16 bytes
+    # as a native UUID (see IssueHashField for its hexadecimal representation)
+    hash = models.UUIDField(unique=True)
 
     created = models.DateTimeField(auto_now_add=True)
     updated = models.DateTimeField(auto_now=True)
 
+    objects = IssueQuerySet.as_manager()
+
     class Meta:
         ordering = ("created",)
-        indexes = (
-            models.Index(fields=["hash"], name="issue_hash_idx"),
-            models.Index(fields=["path"]),
+
+    def save(self, *args, **kwargs):
+        set_entries([self])
+        super().save(*args, **kwargs)
+
+
+class CheckDailyStatsQuerySet(models.QuerySet):
+    COUNTERS = ("total", "publishable", "distinct_issues", "last_found_issues")
+
+    def count_links(self, links, start=None):
+        """
+        Count the daily statistics of the checks from some issue links, by day,
+        repository, analyzer and check. All the links of an issue on a repository
+        must be provided, to count it on the days it was first and last found there
+        Only the links of the revisions created since start are counted
+        """
+        check = F("issue__check_ref__analyzer_check")
+        analyzer = F("issue__check_ref__analyzer")
+        rows = defaultdict(lambda: defaultdict(int))
+        found_links = links
+        if start is not None:
+            links = links.filter(revision__created__gte=start)
+        for values in (
+            links.values(
+                day=TruncDate("revision__created"),
+                repository_id=F("revision__head_repository_id"),
+                analyzer=analyzer,
+                check=check,
+            )
+            .annotate(
+                total=Count("id"),
+                publishable=Count(
+                    "id", filter=Q(in_patch=True) | Q(issue__level=LEVEL_ERROR)
+                ),
+            )
+            .order_by()
+            .iterator()
+        ):
+            key = (
+                values["day"],
+                values["repository_id"],
+                values["analyzer"],
+                values["check"],
+            )
+            rows[key]["total"] = values["total"]
+            rows[key]["publishable"] = values["publishable"]
+
+        # Count each issue on the days it was first and last found on a repository
+        found_links = found_links.values(
+            "issue_id",
+            repository_id=F("revision__head_repository_id"),
+            analyzer=analyzer,
+            check=check,
+        ).annotate(
+            first_found=Min("revision__created"),
+            last_found=Max("revision__created"),
+        )
+        if start is not None:
+            found_links = found_links.filter(last_found__gte=start)
+        for values in found_links.order_by().iterator():
+            check_key = (values["repository_id"], values["analyzer"], values["check"])
+            if start is None or values["first_found"] >= start:
+                key = (timezone.localdate(values["first_found"]), *check_key)
+                rows[key]["distinct_issues"] += 1
+            key = (timezone.localdate(values["last_found"]), *check_key)
+            rows[key]["last_found_issues"] += 1
+
+        return rows
+
+    def update_links(self, links, previous_rows):
+        """
+        Apply the changes of some issue links to the daily statistics, from
+        their rows counted before the change with count_links
+        """
+        changes = {}
+        rows = self.count_links(links)
+        for key in rows.keys() | previous_rows.keys():
+            values = {
+                name: rows[key][name] - previous_rows[key][name]
+                for name in self.COUNTERS
+            }
+            if any(values.values()):
+                changes[key] = values
+        if not changes:
+            return
+
+        known_stats = {
+            (stats.date, stats.repository_id, stats.analyzer, stats.analyzer_check): (
+                stats
+            )
+            for stats in self.filter(
+                date__in={day for day, _, _, _ in changes},
+                repository_id__in={repository_id for _, repository_id, _, _ in changes},
+                analyzer__in={analyzer for _, _, analyzer, _ in changes},
+            )
+        }
+        updated_stats, empty_stats = [], []
+        for key, values in changes.items():
+            stats = known_stats.get(key)
+            if stats is None:
+                day, repository_id, analyzer, check = key
+                stats = self.model(
+                    date=day,
+                    repository_id=repository_id,
+                    analyzer=analyzer,
+                    analyzer_check=check,
+                )
+            for name, value in values.items():
+                setattr(stats, name, max(getattr(stats, name) + value, 0))
+            # Rows are only kept while something is counted, as when rebuilt
+            if any(getattr(stats, name) for name in self.COUNTERS):
+                updated_stats.append(stats)
+            elif stats.id is not None:
+                empty_stats.append(stats.id)
+
+        if empty_stats:
+            self.filter(id__in=empty_stats).delete()
+        self.bulk_create(
+            updated_stats,
+            update_conflicts=True,
+            unique_fields=["date", "repository", "analyzer", "analyzer_check"],
+            update_fields=list(self.COUNTERS),
+        )
+
+    @transaction.atomic
+    def rebuild(self, since):
+        """
+        Compute the daily statistics of the checks from the issue links
+        of the revisions created since a given day
+        Returns the number of statistics rows created
+        """
+        start = timezone.make_aware(datetime.combine(since, time.min))
+        self.filter(date__gte=since).delete()
+        rows = self.count_links(IssueLink.objects.all(), start)
+        return len(
+            self.bulk_create(
+                [
+                    self.model(
+                        date=day,
+                        repository_id=repository_id,
+                        analyzer=analyzer,
+                        analyzer_check=check,
+                        **values,
+                    )
+                    for (day, repository_id, analyzer, check), values in rows.items()
+                ],
+                batch_size=1000,
+            )
         )
+
+
+class CheckDailyStats(models.Model):
+    """
+    Statistics of the issues found by an analyzer check on a repository,
+    aggregated by day of creation of their revision
+    """
+
+    id = models.BigAutoField(primary_key=True)
+    date = models.DateField()
+    repository = models.ForeignKey(
+        Repository, related_name="check_stats", on_delete=models.CASCADE
+    )
+    analyzer = models.CharField(max_length=50)
+    # Empty when the issues have no check, so that it is part of the unique key
+    analyzer_check = models.CharField(max_length=250, blank=True, default="")
+
+    # Number of issue links
+    total = models.PositiveIntegerField(default=0)
+    # Number of issue links that can be published to developers
+    publishable = models.PositiveIntegerField(default=0)
+    # Number of issues found for the first time on the repository
+    distinct_issues = models.PositiveIntegerField(default=0)
+    # Number of issues found for the last time on the repository so far, so that
+    # the issues found since a day are counted once, whenever they were first found
+    last_found_issues = models.PositiveIntegerField(default=0)
+
+    objects = CheckDailyStatsQuerySet.as_manager()
+
+    class Meta:
+        verbose_name_plural = "check daily stats"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["date", "repository", "analyzer", "analyzer_check"],
+                name="check_daily_stats_unique",
+            ),
+        ]
@@ -0,0 +1,215 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import json
+
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from rest_framework.pagination import CursorPagination, LimitOffsetPagination
+from rest_framework.response import Response
+
+# Number of rows counted exactly before relying on estimates
+COUNT_CAP = 1000
+
+
+def estimate_count(queryset, offset=0, cap=COUNT_CAP):
+    """
+    Cheaply count the rows of a queryset, returning that count
+    and whether it's approximate
+    Rows are counted exactly up to the cap after the offset. Over it, the
+    planner statistics of PostgreSQL are used, and the count always reaches
+    past the offset so that the requested page remains available
+    """
+    connection = connections[queryset.db]
+    query = queryset.query
+    is_postgresql = connection.vendor == "postgresql"
+
+    # The size of a whole table is tracked by PostgreSQL
+    if (
+        is_postgresql
+        and not query.where
+        and not query.distinct
+        and query.group_by is None
+        and not query.combinator
+    ):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                [connection.ops.quote_name(queryset.model._meta.db_table)],
+            )
+            (estimate,) = cursor.fetchone()
+        if estimate > offset + cap:
+            return estimate, True
+
+    count = queryset[offset : offset + cap + 1].count()
+    if not count and offset:
+        # The offset is past the last row, count from the start instead
+        return estimate_count(queryset, cap=cap)
+    if count <= cap:
+        return offset + count, False
+
+    estimate = 0
+    if is_postgresql:
+        plan = json.loads(queryset.explain(format="json"))
+        estimate = plan[0]["Plan"]["Plan Rows"]
+    return max(estimate, offset + count), True
+
+
+class EstimatedCountPagination(LimitOffsetPagination):
+    """
+    Limit/offset pagination with an estimated count, as an exact count
+    may cost more than the page itself on large querysets
+    The exact count is only computed when requested with ?count=exact
+    """
+
+    count_query_param = "count"
+    count_query_description = (
+        "Set to exact to count all the results, instead of an estimation."
+    )
+    count_cap = COUNT_CAP
+
+    def get_count(self, queryset):
+        if self.request.query_params.get(self.count_query_param) == "exact":
+            self.approximate_count = False
+            return queryset.count()
+
+        count, self.approximate_count = estimate_count(
+            queryset, self.get_offset(self.request), self.count_cap
+        )
+        return count
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "count": self.count,
+                "approximate_count": self.approximate_count,
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+                "results": data,
+            }
+        )
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema["properties"] = {
+            "count": response_schema["properties"]["count"],
+            "approximate_count": {"type": "boolean", "example": False},
+            **response_schema["properties"],
+        }
+        return response_schema
+
+    def get_schema_operation_parameters(self, view):
+        return super().get_schema_operation_parameters(view) + [
+            {
+                "name": self.count_query_param,
+                "required": False,
+                "in": "query",
+                "description": self.count_query_description,
+                "schema": {"type": "string", "enum": ["exact"]},
+            }
+        ]
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator of the admin with an estimated count, set by EstimatedCountAdmin
+    with the offset of the requested page
+    """
+
+    offset = 0
+    approximate_count = False
+    count_cap = COUNT_CAP
+
+    @cached_property
+    def count(self):
+        count, self.approximate_count = estimate_count(
+            self.object_list, self.offset, self.count_cap
+        )
+        return count
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Paginate on stable keys, so that each page is read from an index
+    instead of scanning all the previous rows with an OFFSET
+    The total count is only computed when requested with ?count=true,
+    as an estimation unless requested with ?count=exact
+    Links with an offset, from the previous pagination, are still supported
+    """
+
+    ordering = "-id"
+    page_size_query_param = "limit"
+    count_query_param = "count"
+    count_query_description = (
+        "Set to true to include an estimation of the total number of results,"
+        " or to exact to count all of them."
+    )
+    count_cap = COUNT_CAP
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count = None
+        self.legacy = None
+        if EstimatedCountPagination.offset_query_param in request.query_params:
+            self.legacy = EstimatedCountPagination()
+            self.legacy.count_cap = self.count_cap
+            return self.legacy.paginate_queryset(queryset, request, view)
+
+        count = request.query_params.get(self.count_query_param, "").lower()
+        if count == "exact":
+            self.count, self.approximate_count = queryset.count(), False
+        elif count == "true":
+            self.count, self.approximate_count = estimate_count(
+                queryset, cap=self.count_cap
+            )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.legacy is not None:
+            return self.legacy.get_paginated_response(data)
+
+        payload = {
+            "next": self.get_next_link(),
+            "previous": self.get_previous_link(),
+            "results": data,
+        }
+        if self.count is not None:
+            payload = {
+                "count": self.count,
+                "approximate_count": self.approximate_count,
+                **payload,
+            }
+        return Response(payload)
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema["properties"] = {
+            "count": {"type": "integer", "example": 123},
+            "approximate_count": {"type": "boolean", "example": False},
+            **response_schema["properties"],
+        }
+        return response_schema
+
+    def get_schema_operation_parameters(self, view):
+        return super().get_schema_operation_parameters(view) + [
+            {
+                "name": self.count_query_param,
+                "required": False,
+                "in": "query",
+                "description": self.count_query_description,
+                "schema": {"type": "string", "enum": ["true", "exact"]},
+            }
+        ]
+
+
+class IssuesPagination(KeysetPagination):
+    """Paginate issues from the oldest, as they are listed to be compared"""
+
+    ordering = ("created", "id")
+
+
+class RecentIssuesPagination(KeysetPagination):
+    """Paginate issues from the most recent"""
+
+    ordering = ("-created", "-id")
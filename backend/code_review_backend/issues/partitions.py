@@ -0,0 +1,220 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+Optional partitioning by month of the revisions and of their issues links,
+on PostgreSQL only. Links are partitioned by the creation date of their revision,
+so that a month of revisions and all their links can be dropped at once.
+The tables are converted by the partition_tables command.
+
+Unique constraints and foreign keys of a partitioned table must include its partition
+key, so the unique keys of the revisions are also stored in a regular table, kept in
+sync by a trigger, which is referenced by the foreign keys instead of the revisions.
+"""
+
+import logging
+import re
+from datetime import date, datetime, time, timezone
+
+from django.db import connection
+
+from code_review_backend.issues.models import Diff, IssueLink, Revision
+
+logger = logging.getLogger(__name__)
+
+# Partitioned models, with the column used as partition key
+PARTITIONED_MODELS = (
+    (Revision, "created"),
+    (IssueLink, "revision_created"),
+)
+
+# Number of monthly partitions created in advance
+MONTHS_AHEAD = 2
+
+PARTITION_NAME_REGEX = re.compile(r"_(\d{4})_(\d{2})$")
+
+# Regular table holding the unique keys of the partitioned revisions
+REVISION_KEYS_TABLE = f"{Revision._meta.db_table}_keys"
+
+
+def month_start(day):
+    return date(day.year, day.month, 1)
+
+
+def add_months(month, nb):
+    year, index = divmod(month.month - 1 + nb, 12)
+    return date(month.year + year, index + 1, 1)
+
+
+def month_datetime(month):
+    """Start of a month, as partitions bounds are in UTC"""
+    return datetime.combine(month, time.min, tzinfo=timezone.utc)
+
+
+def partition_name(model, month):
+    return f"{model._meta.db_table}_{month:%Y_%m}"
+
+
+def is_partitioned(model):
+    """Check if the table of a model is partitioned"""
+    if connection.vendor != "postgresql":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT relkind = 'p' FROM pg_class WHERE oid = %s::regclass",
+            [model._meta.db_table],
+        )
+        return cursor.fetchone()[0]
+
+
+def list_partitions(model):
+    """List the monthly partitions of a model table, by month"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname FROM pg_inherits
+            INNER JOIN pg_class AS child ON child.oid = pg_inherits.inhrelid
+            WHERE pg_inherits.inhparent = %s::regclass
+            """,
+            [model._meta.db_table],
+        )
+        names = [name for (name,) in cursor.fetchall()]
+
+    partitions = {}
+    for name in names:
+        match = PARTITION_NAME_REGEX.search(name)
+        if match is not None:
+            partitions[date(int(match.group(1)), int(match.group(2)), 1)] = name
+    return dict(sorted(partitions.items()))
+
+
+def create_partitions(model, first_month, last_month):
+    """
+    Create the missing monthly partitions of a model table between two months,
+    along with a default partition receiving the rows out of these months
+    Months with rows already in the default partition are skipped, as those rows
+    would have to be moved while locking the whole table
+    Returns the names of the created partitions
+    """
+    table = connection.ops.quote_name(model._meta.db_table)
+    default_table = connection.ops.quote_name(f"{model._meta.db_table}_default")
+    key = connection.ops.quote_name(dict(PARTITIONED_MODELS)[model])
+    existing = list_partitions(model)
+    created = []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS {default_table} PARTITION OF {table} DEFAULT"
+        )
+        month = first_month
+        while month <= last_month:
+            if month not in existing:
+                name = partition_name(model, month)
+                cursor.execute(
+                    f"SELECT EXISTS (SELECT 1 FROM {default_table} "
+                    f"WHERE {key} >= %s AND {key} < %s)",
+                    [month_datetime(month), month_datetime(add_months(month, 1))],
+                )
+                if cursor.fetchone()[0]:
+                    logger.warning(
+                        f"Skipped partition {name}, as its rows are already "
+                        "stored in the default partition."
+                    )
+                else:
+                    cursor.execute(
+                        f"CREATE TABLE {connection.ops.quote_name(name)} "
+                        f"PARTITION OF {table} "
+                        f"FOR VALUES FROM ('{month.isoformat()}') "
+                        f"TO ('{add_months(month, 1).isoformat()}')"
+                    )
+                    created.append(name)
+            month = add_months(month, 1)
+    return created
+
+
+def ensure_partitions(today):
+    """
+    Create the partitions of the current and next months, before any of their
+    rows is stored in the default partition
+    """
+    current = month_start(today)
+    for model, _ in PARTITIONED_MODELS:
+        for name in create_partitions(
+            model, current, add_months(current, MONTHS_AHEAD)
+        ):
+            logger.info(f"Created partition {name}.")
+
+
+def create_revision_keys(cursor):
+    """
+    Store the unique keys of the revisions in a regular table, maintained by a trigger,
+    then reference it from the foreign keys to the revisions
+    """
+    quote = connection.ops.quote_name
+    table = quote(Revision._meta.db_table)
+    keys_table = quote(REVISION_KEYS_TABLE)
+    function = quote(f"{REVISION_KEYS_TABLE}_sync")
+
+    cursor.execute(
+        f"""
+        CREATE TABLE {keys_table} (
+            id integer PRIMARY KEY,
+            phabricator_id integer UNIQUE,
+            phabricator_phid varchar(40) UNIQUE
+        );
+        INSERT INTO {keys_table} (id, phabricator_id, phabricator_phid)
+        SELECT id, phabricator_id, phabricator_phid FROM {table};
+
+        CREATE FUNCTION {function}() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                INSERT INTO {keys_table} (id, phabricator_id, phabricator_phid)
+                VALUES (NEW.id, NEW.phabricator_id, NEW.phabricator_phid);
+            ELSIF TG_OP = 'UPDATE' THEN
+                UPDATE {keys_table} SET
+                    id = NEW.id,
+                    phabricator_id = NEW.phabricator_id,
+                    phabricator_phid = NEW.phabricator_phid
+                WHERE id = OLD.id;
+            ELSE
+                DELETE FROM {keys_table} WHERE id = OLD.id;
+            END IF;
+            RETURN NULL;
+        END;
+        $$;
+        CREATE TRIGGER {function} AFTER INSERT OR UPDATE OR DELETE ON {table}
+        FOR EACH ROW EXECUTE FUNCTION {function}();
+        """
+    )
+
+    # Foreign keys to the revisions, dropped along with their unpartitioned table
+    for field in (Diff.revision.field, IssueLink.revision.field):
+        name = f"{field.model._meta.db_table}_{field.column}_keys_fk"
+        cursor.execute(
+            f"ALTER TABLE {quote(field.model._meta.db_table)} "
+            f"ADD CONSTRAINT {quote(name)} FOREIGN KEY ({quote(field.column)}) "
+            f"REFERENCES {keys_table} (id) DEFERRABLE INITIALLY DEFERRED"
+        )
+
+
+def drop_partition(model, name):
+    """
+    Detach then drop a partition of a model table
+    Returns the number of dropped rows
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"ALTER TABLE {connection.ops.quote_name(model._meta.db_table)} "
+            f"DETACH PARTITION {connection.ops.quote_name(name)}"
+        )
+        cursor.execute(f"SELECT count(*) FROM {connection.ops.quote_name(name)}")
+        (count,) = cursor.fetchone()
+        # Dropping a table does not trigger the removal of the keys of its revisions
+        if model is Revision:
+            cursor.execute(
+                f"DELETE FROM {connection.ops.quote_name(REVISION_KEYS_TABLE)} "
+                f"WHERE id IN (SELECT id FROM {connection.ops.quote_name(name)})"
+            )
+        cursor.execute(f"DROP TABLE {connection.ops.quote_name(name)}")
+
+    return count
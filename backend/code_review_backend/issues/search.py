@@ -0,0 +1,61 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+from django.db import connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from code_review_backend.issues.models import IssueMessage, Revision
+
+# Largest value of the integer columns used as identifiers
+MAX_ID = 2**31 - 1
+
+# Select the messages matching a text search query, using the same expression
+# as their index (see migration 0025)
+MESSAGE_SEARCH_SQL = (
+    f"SELECT id FROM {IssueMessage._meta.db_table}"
+    " WHERE to_tsvector('english'::regconfig, value)"
+    " @@ websearch_to_tsquery('english'::regconfig, %s)"
+)
+
+
+def search_diffs(diffs, query):
+    """
+    Filter diffs matching a text search query, always through an index
+    A numeric query is an exact lookup on the IDs of the diffs, and on the
+    Phabricator and Bugzilla IDs of their revisions
+    Other queries are matched against the revisions titles, using a trigram
+    index on PostgreSQL (see migration 0020) and a plain LIKE on SQLite
+    """
+    query = query.strip()
+    if not query:
+        return diffs
+
+    if query.isascii() and query.isdigit():
+        value = int(query)
+        if value > MAX_ID:
+            return diffs.none()
+
+        # Resolve the few matching revisions first, so that both lookups use an index
+        revisions = (
+            Revision.objects.filter(Q(phabricator_id=value) | Q(bugzilla_id=value))
+            .order_by()
+            .values_list("id", flat=True)
+        )
+        return diffs.filter(Q(id=value) | Q(revision_id__in=list(revisions)))
+
+    return diffs.filter(revision__title__icontains=query)
+
+
+def search_issues(issues, query):
+    """
+    Filter issues whose message matches a text search query
+    On PostgreSQL, the query uses the web search syntax (quoted phrases, "or",
+    negation with "-") on the indexed text search vector of the messages
+    Other databases fall back to a LIKE scan of the messages
+    """
+    if connections[issues.db].vendor == "postgresql":
+        # Each distinct message is only indexed once in its dictionary table
+        return issues.filter(message_ref__in=RawSQL(MESSAGE_SEARCH_SQL, (query,)))
+    return issues.filter(message__icontains=query)
@@ -2,22 +2,110 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
+import re
+import uuid
 from collections import defaultdict
 from urllib.parse import urlparse
 
 from django.conf import settings
-from django.db import transaction
+from django.db import connection, transaction
+from django.utils import timezone
 from rest_framework import serializers
 
+from code_review_backend.issues.compare import detect_new_for_revision_bulk
 from code_review_backend.issues.models import (
     LEVEL_ERROR,
+    LEVEL_WARNING,
+    CheckDailyStats,
     Diff,
     Issue,
+    IssueCheck,
     IssueLink,
+    IssueMessage,
+    IssuePath,
     Repository,
     Revision,
+    refresh_dictionaries,
+    uuid7,
 )
 
+# Max number of paths or hashes accepted in a single lookup of known issues
+MAX_LOOKUP_ITEMS = 1000
+
+# Upsert issues on PostgreSQL, returning them with their dictionary values.
+# Known issues are left untouched and read from the statement snapshot, where
+# the issues inserted by the statement itself are not visible yet
+UPSERT_ISSUES_SQL = f"""
+WITH new_issues AS (
+    SELECT * FROM unnest(
+        %s::uuid[], %s::uuid[], %s::integer[], %s::varchar[],
+        %s::integer[], %s::integer[], %s::timestamptz[]
+    ) AS t (id, hash, path_ref_id, level, check_ref_id, message_ref_id, created)
+),
+inserted AS (
+    INSERT INTO {Issue._meta.db_table}
+        (id, hash, path_ref_id, level, check_ref_id, message_ref_id, created, updated)
+    SELECT id, hash, path_ref_id, level, check_ref_id, message_ref_id, created, created
+    FROM new_issues
+    ON CONFLICT (hash) DO NOTHING
+    RETURNING
+        id, hash, path_ref_id, level, check_ref_id, message_ref_id, created, updated
+),
+issues AS (
+    SELECT * FROM inserted
+    UNION ALL
+    SELECT id, hash, path_ref_id, level, check_ref_id, message_ref_id, created, updated
+    FROM {Issue._meta.db_table}
+    WHERE hash IN (SELECT hash FROM new_issues)
+)
+SELECT
+    issues.*,
+    paths.value AS path,
+    checks.analyzer,
+    nullif(checks.analyzer_check, '') AS analyzer_check,
+    messages.value AS message
+FROM issues
+INNER JOIN {IssuePath._meta.db_table} AS paths ON paths.id = issues.path_ref_id
+INNER JOIN {IssueCheck._meta.db_table} AS checks ON checks.id = issues.check_ref_id
+LEFT JOIN {IssueMessage._meta.db_table} AS messages
+    ON messages.id = issues.message_ref_id
+"""
+
+# Create the links of upserted issues on PostgreSQL, then increment the
+# issues counters of the diff with the links actually created
+CREATE_LINKS_SQL = f"""
+WITH links AS (
+    INSERT INTO {IssueLink._meta.db_table}
+        (revision_id, revision_created, diff_id, issue_id,
+         new_for_revision, in_patch, line, nb_lines, char)
+    SELECT %s, %s, %s, l.issue_id,
+        l.new_for_revision, l.in_patch, l.line, l.nb_lines, l.char
+    FROM unnest(
+        %s::uuid[], %s::boolean[], %s::boolean[],
+        %s::integer[], %s::integer[], %s::integer[]
+    ) AS l (issue_id, new_for_revision, in_patch, line, nb_lines, char)
+    ON CONFLICT DO NOTHING
+    RETURNING issue_id, in_patch
+)
+UPDATE {Diff._meta.db_table} AS d SET
+    nb_issues = d.nb_issues + c.nb_issues,
+    nb_errors = d.nb_errors + c.nb_errors,
+    nb_warnings = d.nb_warnings + c.nb_warnings,
+    nb_issues_publishable = d.nb_issues_publishable + c.nb_issues_publishable
+FROM (
+    SELECT
+        count(*) AS nb_issues,
+        count(*) FILTER (WHERE issues.level = '{LEVEL_ERROR}') AS nb_errors,
+        count(*) FILTER (WHERE issues.level = '{LEVEL_WARNING}') AS nb_warnings,
+        count(*) FILTER (
+            WHERE links.in_patch OR issues.level = '{LEVEL_ERROR}'
+        ) AS nb_issues_publishable
+    FROM links
+    INNER JOIN {Issue._meta.db_table} AS issues ON issues.id = links.issue_id
+) AS c
+WHERE d.id = %s
+"""
+
 
 class RepositorySerializer(serializers.ModelSerializer):
     """
@@ -200,13 +288,46 @@ class DiffFullSerializer(serializers.ModelSerializer):
         )
 
 
+class IssueHashField(serializers.UUIDField):
+    """
+    Hash of an issue, stored as a UUID but exchanged as the 32 hexadecimal
+    characters of its MD5 digest
+    """
+
+    default_error_messages = {
+        "invalid": "Must be a hash of 32 hexadecimal characters.",
+    }
+    regex = re.compile(r"^[0-9a-fA-F]{32}$")
+
+    def __init__(self, **kwargs):
+        kwargs["format"] = "hex"
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        if not isinstance(data, str) or not self.regex.match(data):
+            self.fail("invalid")
+        return uuid.UUID(hex=data)
+
+    def to_representation(self, value):
+        if not isinstance(value, uuid.UUID):
+            value = uuid.UUID(hex=value)
+        return value.hex
+
+
 class IssueSerializer(serializers.ModelSerializer):
     """
     Serialize an Issue in a Diff
     """
 
+    hash = IssueHashField(read_only=True)
     publishable = serializers.BooleanField(read_only=True)
+    # Stored in dictionary tables, see IssueQuerySet.with_values
+    analyzer = serializers.CharField(max_length=50)
+    path = serializers.CharField(max_length=250)
     check = serializers.CharField(source="analyzer_check", required=False)
+    message = serializers.CharField(
+        allow_null=True, required=False, style={"base_template": "textarea.html"}
+    )
     publishable = serializers.BooleanField(read_only=True)
     in_patch = serializers.BooleanField(
         source="issue_links__in_patch", allow_null=True, required=False
@@ -250,6 +371,8 @@ class IssueHashSerializer(serializers.ModelSerializer):
     Serialize an Issue hash
     """
 
+    hash = IssueHashField(read_only=True)
+
     class Meta:
         model = Issue
         fields = (
@@ -259,9 +382,62 @@ class IssueHashSerializer(serializers.ModelSerializer):
         read_only_fields = ("id", "hash")
 
 
+class IssueSearchSerializer(serializers.ModelSerializer):
+    """
+    Serialize an Issue found by a search on its message
+    """
+
+    hash = IssueHashField(read_only=True)
+    analyzer = serializers.CharField(read_only=True)
+    path = serializers.CharField(read_only=True)
+    check = serializers.CharField(source="analyzer_check", read_only=True)
+    message = serializers.CharField(allow_null=True, read_only=True)
+
+    class Meta:
+        model = Issue
+        fields = (
+            "id",
+            "hash",
+            "analyzer",
+            "check",
+            "path",
+            "level",
+            "message",
+            "created",
+        )
+        read_only_fields = fields
+
+
+class IssueLookupSerializer(serializers.Serializer):
+    """
+    Validate a lookup of known issues for many paths or hashes at once
+    """
+
+    paths = serializers.ListField(
+        child=serializers.CharField(max_length=250),
+        required=False,
+        max_length=MAX_LOOKUP_ITEMS,
+    )
+    hashes = serializers.ListField(
+        child=IssueHashField(),
+        required=False,
+        max_length=MAX_LOOKUP_ITEMS,
+    )
+    # Same filters as the issues list, validated by the view
+    date = serializers.CharField(required=False)
+    revision_changeset = serializers.CharField(required=False)
+
+    def validate(self, data):
+        if not data.get("paths") and not data.get("hashes"):
+            raise serializers.ValidationError(
+                "At least one path or one hash is required"
+            )
+        return data
+
+
 class SingleIssueBulkSerializer(IssueSerializer):
-    # Make hash non unique to avoid validation checks
-    hash = serializers.CharField(max_length=32)
+    # Make hash writable and non unique to avoid validation checks
+    hash = IssueHashField()
 
 
 class IssueBulkSerializer(serializers.Serializer):
@@ -280,42 +456,126 @@ class IssueBulkSerializer(serializers.Serializer):
             return
         self.fields["diff_id"].queryset = self.context["revision"].diffs.all()
 
-    @transaction.atomic
     def create(self, validated_data):
         diff = validated_data.get("diff_id", None)
         link_attrs = defaultdict(list)
+        # Links of the payload, in request order
+        payload_links = []
         # Separate attributes that are specific to the IssueLink M2M
         for issue in validated_data["issues"]:
-            link_attrs[issue["hash"]].append(
+            link = {
+                "new_for_revision": issue.pop("issue_links__new_for_revision", None),
+                "in_patch": issue.pop("issue_links__in_patch", None),
+                "line": issue.pop("issue_links__line", None),
+                "nb_lines": issue.pop("issue_links__nb_lines", None),
+                "char": issue.pop("issue_links__char", None),
+            }
+            link_attrs[issue["hash"]].append(link)
+            payload_links.append((issue["hash"], link))
+
+        # Detect the new issues of the revision, when not provided by the client
+        if diff is not None:
+            undetected = [
+                (issue["path"], issue_hash, link)
+                for issue, (issue_hash, link) in zip(
+                    validated_data["issues"], payload_links
+                )
+                if link["new_for_revision"] is None
+            ]
+            if undetected:
+                new_issues = detect_new_for_revision_bulk(
+                    diff, [(path, issue_hash) for path, issue_hash, _ in undetected]
+                )
+                for path, issue_hash, link in undetected:
+                    link["new_for_revision"] = new_issues[(path, issue_hash)]
+
+        # The payload issues are counted again on the repository in the daily
+        # statistics of their checks, with the links actually created
+        found_links = IssueLink.objects.filter(
+            issue__hash__in=link_attrs.keys(),
+            revision__head_repository_id=self.context["revision"].head_repository_id,
+        )
+        with transaction.atomic():
+            previous_stats = CheckDailyStats.objects.count_links(found_links)
+            if connection.vendor == "postgresql":
+                known_issues = self.upsert_issues(
+                    validated_data["issues"], link_attrs, diff
+                )
+            else:
+                known_issues = self.create_issues(
+                    validated_data["issues"], link_attrs, diff
+                )
+            CheckDailyStats.objects.update_links(found_links, previous_stats)
+
+        # Endpoint expects Issue with specific attributes for re-serialization of links
+        # The output follows the order of the payload, so clients can match both
+        output = []
+        for issue_hash, link in payload_links:
+            existing_issue = known_issues[issue_hash]
+
+            # Set attributes for re-serialization
+            output_link = {f"issue_links__{k}": v for k, v in link.items()}
+            output_link.update(vars(existing_issue))
+            output_link["publishable"] = (
+                link["in_patch"] and existing_issue.level == LEVEL_ERROR
+            )
+
+            output.append(output_link)
+
+        return {
+            "diff_id": diff,
+            "issues": output,
+        }
+
+    def to_compact_representation(self, instance, fields):
+        """
+        Serialize only some fields of the created issues, as the full
+        representation of large payloads is costly and mostly unused by clients
+        """
+        issue_fields = self.fields["issues"].child.fields
+        fields = [(name, issue_fields[name]) for name in fields]
+        diff = instance["diff_id"]
+        return {
+            "diff_id": diff.id if diff is not None else None,
+            "issues": [
                 {
-                    "new_for_revision": issue.pop(
-                        "issue_links__new_for_revision", None
-                    ),
-                    "in_patch": issue.pop("issue_links__in_patch", None),
-                    "line": issue.pop("issue_links__line", None),
-                    "nb_lines": issue.pop("issue_links__nb_lines", None),
-                    "char": issue.pop("issue_links__path", None),
+                    name: (
+                        field.to_representation(issue[field.source])
+                        if issue.get(field.source) is not None
+                        else None
+                    )
+                    for name, field in fields
                 }
-            )
-        # Only create issues that do not exist yet
+                for issue in instance["issues"]
+            ],
+        }
+
+    @transaction.atomic
+    def create_issues(self, issues, link_attrs, diff):
+        """
+        Create the issues that do not exist yet then their links, in separate queries
+        Returns all the issues of the payload, by hash
+        """
         Issue.objects.bulk_create(
-            [Issue(**values) for values in validated_data["issues"]],
+            [Issue(**values) for values in issues],
             ignore_conflicts=True,
         )
 
         # Retrieve issues to get existing IDs
-        hashes = set(link_attrs.keys())
-        known_issues = {i.hash: i for i in Issue.objects.filter(hash__in=hashes)}
-
-        assert set(known_issues.keys()) == hashes, "Failed to create all issues"
+        known_issues = {
+            i.hash: i
+            for i in Issue.objects.with_values().filter(hash__in=link_attrs.keys())
+        }
+        assert known_issues.keys() == link_attrs.keys(), "Failed to create all issues"
 
         # Create all links, using DB conflicts
-        links = IssueLink.objects.bulk_create(
+        IssueLink.objects.bulk_create(
             [
                 IssueLink(
                     issue_id=known_issues[issue_hash].id,
                     diff=diff,
                     revision=self.context["revision"],
+                    revision_created=self.context["revision"].created,
                     **link,
                 )
                 for issue_hash, links in link_attrs.items()
@@ -324,27 +584,106 @@ class IssueBulkSerializer(serializers.Serializer):
             ignore_conflicts=True,
         )
 
-        # Endpoint expects Issue with specific attributes for re-serialization of links
-        # TODO in treeherder: only expose hash & publishable in output
-        output = []
-        for issue_hash, links in link_attrs.items():
-            for link in links:
-                existing_issue = known_issues[issue_hash]
-
-                # Set attributes for re-serialization
-                output_link = {f"issue_links__{k}": v for k, v in link.items()}
-                output_link.update(vars(existing_issue))
-                output_link["publishable"] = (
-                    link["in_patch"] and existing_issue.level == LEVEL_ERROR
-                )
+        # Links conflicts are unknown, so the counters are computed again
+        if diff is not None:
+            Diff.objects.filter(id=diff.id).update_issues_counters()
 
-                output.append(output_link)
+        return known_issues
 
-        return {
-            "diff_id": diff,
-            "issues": output,
+    @transaction.atomic
+    def upsert_issues(self, issues, link_attrs, diff):
+        """
+        Upsert the issues then create their links with two PostgreSQL statements,
+        retrieving the existing issues at the same time
+        Returns all the issues of the payload, by hash
+        """
+        # A row cannot be upserted twice in the same statement
+        unique_issues = {}
+        for values in issues:
+            unique_issues.setdefault(values["hash"], values)
+
+        # Repeated strings are resolved to their dictionary entries, mostly cached
+        refresh_dictionaries()
+        paths = IssuePath.objects.get_ids(
+            values["path"] for values in unique_issues.values()
+        )
+        checks = IssueCheck.objects.get_ids(
+            (values["analyzer"], values.get("analyzer_check"))
+            for values in unique_issues.values()
+        )
+        messages = IssueMessage.objects.get_ids(
+            values["message"]
+            for values in unique_issues.values()
+            if values.get("message") is not None
+        )
+
+        # Same identifiers and creation dates as the ones set by bulk_create,
+        # to keep the issues order of the payload
+        created = {
+            issue_hash: (str(uuid7()), timezone.now()) for issue_hash in unique_issues
         }
 
+        known_issues = {}
+        # Issues inserted by a concurrent ingestion after the first statement
+        # started are not returned, they are visible to a new statement
+        for _ in range(2):
+            # Rows are inserted by hash, so that concurrent ingestions lock them
+            # in the same order
+            rows = sorted(
+                (issue_hash, values)
+                for issue_hash, values in unique_issues.items()
+                if issue_hash not in known_issues
+            )
+            if not rows:
+                break
+            issue_columns = [
+                [created[issue_hash][0] for issue_hash, _ in rows],
+                [issue_hash for issue_hash, _ in rows],
+                [paths[values["path"]] for _, values in rows],
+                [values["level"] for _, values in rows],
+                [
+                    checks[(values["analyzer"], values.get("analyzer_check"))]
+                    for _, values in rows
+                ],
+                [messages.get(values.get("message")) for _, values in rows],
+                [created[issue_hash][1] for issue_hash, _ in rows],
+            ]
+            known_issues.update(
+                (issue.hash, issue)
+                for issue in Issue.objects.raw(UPSERT_ISSUES_SQL, issue_columns)
+            )
+        assert known_issues.keys() == link_attrs.keys(), "Failed to create all issues"
+
+        links = [
+            (str(known_issues[issue_hash].id), link)
+            for issue_hash, links in link_attrs.items()
+            for link in links
+        ]
+        revision = self.context["revision"]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                CREATE_LINKS_SQL,
+                [
+                    revision.id,
+                    revision.created,
+                    diff.id if diff is not None else None,
+                    [issue_id for issue_id, _ in links],
+                    *(
+                        [link[attr] for _, link in links]
+                        for attr in (
+                            "new_for_revision",
+                            "in_patch",
+                            "line",
+                            "nb_lines",
+                            "char",
+                        )
+                    ),
+                    diff.id if diff is not None else None,
+                ],
+            )
+
+        return known_issues
+
 
 class IssueCheckSerializer(IssueSerializer):
     """
@@ -364,12 +703,10 @@ class IssueCheckStatsSerializer(serializers.Serializer):
     Serialize the usage statistics for each check encountered
     """
 
-    # The view aggregates issues depending on their reference to a repository (via IssueLink M2M)
-    repository = serializers.SlugField(
-        source="issue_links__revision__head_repository__slug"
-    )
+    # The view aggregates the daily statistics of the checks on each repository
+    repository = serializers.SlugField(source="repository_slug")
     analyzer = serializers.CharField()
-    check = serializers.CharField(source="analyzer_check")
+    check = serializers.CharField()
     total = serializers.IntegerField()
     publishable = serializers.IntegerField(read_only=True, default=0)
 
@@ -0,0 +1,43 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import unittest
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase
+
+LOG_PREFIX = "INFO:code_review_backend.issues.management.commands.benchmark_issue_ids:"
+
+
+class BenchmarkIssueIdsCommandTestCase(TestCase):
+    @unittest.skipIf(connection.vendor == "postgresql", "The benchmark is supported")
+    def test_unsupported_database(self):
+        with self.assertRaisesMessage(
+            CommandError, "The benchmark is only supported on PostgreSQL"
+        ):
+            call_command("benchmark_issue_ids")
+
+    @unittest.skipUnless(
+        connection.vendor == "postgresql",
+        "The benchmark is only supported on PostgreSQL",
+    )
+    def test_benchmark(self):
+        with self.assertLogs() as logs:
+            call_command("benchmark_issue_ids", seed=1000, inserts=200, chunk_size=50)
+
+        results = [log for log in logs.output if log.startswith(LOG_PREFIX)]
+        self.assertEqual(len(results), 2)
+        for name, result in zip(("uuid4", "uuid7"), results):
+            self.assertTrue(
+                result.startswith(
+                    f"{LOG_PREFIX}{name}: inserted 200 issues after 1000 in "
+                )
+            )
+
+        # Nothing is kept in the database
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT to_regclass('benchmark_issue_uuid4')")
+            self.assertIsNone(cursor.fetchone()[0])
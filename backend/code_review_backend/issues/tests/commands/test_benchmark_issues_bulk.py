@@ -0,0 +1,34 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+
+from code_review_backend.issues.models import Issue, IssueLink, Repository
+
+LOG_PREFIX = (
+    "INFO:code_review_backend.issues.management.commands.benchmark_issues_bulk:"
+)
+
+
+class BenchmarkIssuesBulkCommandTestCase(TestCase):
+    def test_benchmark(self):
+        with self.assertLogs() as logs:
+            call_command("benchmark_issues_bulk", chunks=3, chunk_size=10)
+
+        methods = ["separate queries"]
+        if connection.vendor == "postgresql":
+            methods.append("upsert statements")
+        results = [log for log in logs.output if log.startswith(LOG_PREFIX)]
+        self.assertEqual(len(results), len(methods))
+        for method, result in zip(methods, results):
+            self.assertTrue(
+                result.startswith(f"{LOG_PREFIX}{method}: 3 chunks of 10 issues")
+            )
+
+        # Nothing is kept in the database
+        self.assertFalse(Repository.objects.filter(slug="benchmark").exists())
+        self.assertFalse(Issue.objects.exists())
+        self.assertFalse(IssueLink.objects.exists())
@@ -4,26 +4,45 @@
 
 import uuid
 from datetime import timedelta
+from unittest import mock
 
+from django.core.cache import cache
 from django.core.management import call_command
+from django.db import connection
 from django.db.models import Count
 from django.test import TestCase
 from django.utils import timezone
 
+from code_review_backend.issues.management.commands.cleanup_issues import (
+    CHECKPOINT_KEY,
+)
 from code_review_backend.issues.models import (
     LEVEL_ERROR,
     Diff,
     Issue,
     IssueLink,
+    IssuePath,
     Repository,
     Revision,
 )
 
 LOG_PREFIX = "INFO:code_review_backend.issues.management.commands.cleanup_issues:"
 
+# The version of the cached responses is bumped in the database cache
+CACHE_QUERIES = 5
+
+# Partitioning of the revisions table is checked on PostgreSQL
+PARTITION_QUERIES = 1 if connection.vendor == "postgresql" else 0
+
+# Unused entries of the 3 dictionary tables are deleted, then their version is bumped
+DICTIONARY_QUERIES = 3 + CACHE_QUERIES
+
+# Each chunk is deleted by 5 queries, within a savepoint during tests
+CHUNK_QUERIES = 2 + 5
+
 
 def build_issue(path, revisions=[]):
-    issue, _ = Issue.objects.get_or_create(
+    issue, _ = Issue.objects.with_values().get_or_create(
         path=path,
         level=LEVEL_ERROR,
         analyzer="analyzer",
@@ -95,7 +114,7 @@ class CleanupIssuesCommandTestCase(TestCase):
             id__in=(self.moz_central.id, self.autoland.id, self.test_repo.id)
         ).delete()
         with self.assertLogs() as mock_log:
-            with self.assertNumQueries(2):
+            with self.assertNumQueries(3 + PARTITION_QUERIES):
                 call_command("cleanup_issues", "--nb-days", "40")
 
         self.assertEqual(
@@ -111,12 +130,23 @@ class CleanupIssuesCommandTestCase(TestCase):
         ).delete()
         self.assertEqual(Issue.objects.count(), 6)
         with self.assertLogs() as mock_log:
-            with self.assertNumQueries(7):
+            with self.assertNumQueries(
+                3
+                + CHUNK_QUERIES
+                + DICTIONARY_QUERIES
+                + CACHE_QUERIES
+                + PARTITION_QUERIES
+            ):
                 call_command("cleanup_issues")
 
         self.assertEqual(Issue.objects.count(), 4)
         self.assertListEqual(
-            list(Issue.objects.values_list("path", flat=True)),
+            list(Issue.objects.values_list("path_ref__value", flat=True)),
+            ["path3", "path4", "path5", "path6"],
+        )
+        # Paths of the deleted issues are not stored anymore
+        self.assertListEqual(
+            sorted(IssuePath.objects.values_list("value", flat=True)),
             ["path3", "path4", "path5", "path6"],
         )
 
@@ -127,9 +157,9 @@ class CleanupIssuesCommandTestCase(TestCase):
         self.assertListEqual(
             mock_log.output,
             [
-                f"{LOG_PREFIX}Retrieved 1 old revisions to be deleted.",
-                f"{LOG_PREFIX}Page 1/1.",
-                f"{LOG_PREFIX}Deleted 4 IssueLink, 1 Diff, 2 Issue, 1 Revision.",
+                f"{LOG_PREFIX}Deleted 1 revisions, up to #0.",
+                f"{LOG_PREFIX}Deleted 4 IssueLink, 1 Diff, 2 Issue, 1 Revision, "
+                "2 IssuePath, 0 IssueCheck, 0 IssueMessage.",
             ],
         )
 
@@ -139,21 +169,27 @@ class CleanupIssuesCommandTestCase(TestCase):
         ).delete()
         self.assertEqual(Issue.objects.count(), 6)
         with self.assertLogs() as mock_log:
-            with self.assertNumQueries(7):
+            with self.assertNumQueries(
+                3
+                + CHUNK_QUERIES
+                + DICTIONARY_QUERIES
+                + CACHE_QUERIES
+                + PARTITION_QUERIES
+            ):
                 call_command("cleanup_issues", "--nb-days", "4")
 
         self.assertEqual(Issue.objects.count(), 2)
         self.assertListEqual(
-            list(Issue.objects.values_list("path", flat=True)),
+            list(Issue.objects.values_list("path_ref__value", flat=True)),
             ["path5", "path6"],
         )
 
         self.assertEqual(
             mock_log.output,
             [
-                f"{LOG_PREFIX}Retrieved 2 old revisions to be deleted.",
-                f"{LOG_PREFIX}Page 1/1.",
-                f"{LOG_PREFIX}Deleted 6 IssueLink, 1 Diff, 4 Issue, 2 Revision.",
+                f"{LOG_PREFIX}Deleted 2 revisions, up to #1.",
+                f"{LOG_PREFIX}Deleted 6 IssueLink, 1 Diff, 4 Issue, 2 Revision, "
+                "4 IssuePath, 0 IssueCheck, 0 IssueMessage.",
             ],
         )
 
@@ -175,16 +211,22 @@ class CleanupIssuesCommandTestCase(TestCase):
 
         self.assertEqual(Issue.objects.count(), 6)
         with self.assertLogs() as mock_log:
-            with self.assertNumQueries(7):
+            with self.assertNumQueries(
+                3
+                + CHUNK_QUERIES
+                + DICTIONARY_QUERIES
+                + CACHE_QUERIES
+                + PARTITION_QUERIES
+            ):
                 call_command("cleanup_issues", "--nb-days", "4")
         self.assertEqual(Issue.objects.count(), 2)
         self.assertEqual(
             mock_log.output,
             [
                 f"{LOG_PREFIX}Deleted 2 unused Repository.",
-                f"{LOG_PREFIX}Retrieved 2 old revisions to be deleted.",
-                f"{LOG_PREFIX}Page 1/1.",
-                f"{LOG_PREFIX}Deleted 6 IssueLink, 1 Diff, 4 Issue, 2 Revision.",
+                f"{LOG_PREFIX}Deleted 2 revisions, up to #1.",
+                f"{LOG_PREFIX}Deleted 6 IssueLink, 1 Diff, 4 Issue, 2 Revision, "
+                "4 IssuePath, 0 IssueCheck, 0 IssueMessage.",
             ],
         )
         self.assertListEqual(
@@ -199,3 +241,108 @@ class CleanupIssuesCommandTestCase(TestCase):
                 ("test", 1),
             ],
         )
+
+    def test_cleanup_issues_dry_run(self):
+        with self.assertLogs() as mock_log:
+            call_command("cleanup_issues", "--nb-days", "4", "--dry-run")
+
+        self.assertEqual(
+            mock_log.output,
+            [
+                f"{LOG_PREFIX}Would delete 2 unused Repository.",
+                f"{LOG_PREFIX}Would delete 6 IssueLink, 1 Diff, 4 Issue, 2 Revision, "
+                "4 IssuePath, 0 IssueCheck, 0 IssueMessage.",
+            ],
+        )
+        self.assertEqual(Repository.objects.count(), 5)
+        self.assertEqual(Revision.objects.count(), 3)
+        self.assertEqual(Issue.objects.count(), 6)
+
+    def test_cleanup_issues_dry_run_resume(self):
+        # The dry run reports the rows left by an interrupted cleanup
+        cache.set(
+            CHECKPOINT_KEY,
+            {"clean_until": timezone.now() - timedelta(days=4), "last_id": 0},
+            timeout=None,
+        )
+        with self.assertLogs() as mock_log:
+            call_command("cleanup_issues", "--dry-run")
+
+        self.assertEqual(
+            mock_log.output,
+            [
+                f"{LOG_PREFIX}Would delete 2 unused Repository.",
+                f"{LOG_PREFIX}Would resume the cleanup after revision #0.",
+                f"{LOG_PREFIX}Would delete 2 IssueLink, 0 Diff, 2 Issue, 1 Revision, "
+                "2 IssuePath, 0 IssueCheck, 0 IssueMessage.",
+            ],
+        )
+        self.assertEqual(Revision.objects.count(), 3)
+        self.assertIsNotNone(cache.get(CHECKPOINT_KEY))
+
+    def test_cleanup_issues_throttled_chunks(self):
+        with mock.patch(
+            "code_review_backend.issues.management.commands.cleanup_issues.time.sleep"
+        ) as mock_sleep:
+            with self.assertLogs() as mock_log:
+                call_command(
+                    "cleanup_issues",
+                    "--nb-days",
+                    "4",
+                    "--chunk-size",
+                    "1",
+                    "--rows-per-second",
+                    "2",
+                )
+
+        self.assertEqual(Issue.objects.count(), 2)
+        self.assertEqual(
+            mock_log.output,
+            [
+                f"{LOG_PREFIX}Deleted 2 unused Repository.",
+                f"{LOG_PREFIX}Deleted 1 revisions, up to #0.",
+                f"{LOG_PREFIX}Deleted 2 revisions, up to #1.",
+                f"{LOG_PREFIX}Deleted 6 IssueLink, 1 Diff, 4 Issue, 2 Revision, "
+                "4 IssuePath, 0 IssueCheck, 0 IssueMessage.",
+            ],
+        )
+
+        # The chunks deleted 8 then 5 rows
+        self.assertEqual(mock_sleep.call_count, 2)
+        delays = [call.args[0] for call in mock_sleep.call_args_list]
+        self.assertAlmostEqual(delays[0], 4, delta=0.5)
+        self.assertAlmostEqual(delays[1], 2.5, delta=0.5)
+
+        # The checkpoint is removed once the cleanup is complete
+        self.assertIsNone(cache.get(CHECKPOINT_KEY))
+
+    def test_cleanup_issues_resume(self):
+        # An interrupted cleanup of the revisions older than 4 days stopped after the first one
+        cache.set(
+            CHECKPOINT_KEY,
+            {"clean_until": timezone.now() - timedelta(days=4), "last_id": 0},
+            timeout=None,
+        )
+        with self.assertLogs() as mock_log:
+            call_command("cleanup_issues")
+
+        self.assertEqual(
+            mock_log.output,
+            [
+                f"{LOG_PREFIX}Deleted 2 unused Repository.",
+                f"{LOG_PREFIX}Resuming the cleanup after revision #0.",
+                f"{LOG_PREFIX}Deleted 1 revisions, up to #1.",
+                f"{LOG_PREFIX}Deleted 2 IssueLink, 0 Diff, 2 Issue, 1 Revision, "
+                "2 IssuePath, 0 IssueCheck, 0 IssueMessage.",
+            ],
+        )
+        self.assertListEqual(
+            list(Revision.objects.order_by("id").values_list("id", flat=True)),
+            [0, 2],
+        )
+        self.assertIsNone(cache.get(CHECKPOINT_KEY))
+
+        # Without a checkpoint, the cleanup uses its own cleanup date
+        with self.assertLogs() as mock_log:
+            call_command("cleanup_issues", "--restart")
+        self.assertFalse(Revision.objects.filter(id=0).exists())
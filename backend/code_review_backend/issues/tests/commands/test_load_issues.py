@@ -0,0 +1,128 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import json
+import os
+import tempfile
+import uuid
+from datetime import date
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from code_review_backend.issues.models import CheckDailyStats, Diff, IssueLink
+
+
+class LoadIssuesCommandTestCase(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        reports_dir = os.path.join(
+            self.tmp_dir.name, "code-review-reports", "production"
+        )
+        os.makedirs(reports_dir)
+
+        issue = {
+            "analyzer": "analyzer-X",
+            "check": "check-1",
+            "level": "warning",
+            "path": "path/to/file",
+            "nb_lines": 1,
+            "char": None,
+        }
+        report = {
+            "revision": {
+                "id": 10,
+                "phid": "PHID-DREV-arev",
+                "title": "Revision A",
+                "bugzilla_id": None,
+                "diff_id": 1,
+                "diff_phid": "PHID-DIFF-1",
+                "repository": "https://hg.mozilla.org/try",
+                "target_repository": "https://hg.mozilla.org/mozilla-central",
+                "mercurial_revision": "deadbeef",
+            },
+            "issues": [
+                # Issues without hash are skipped
+                {**issue, "hash": "", "line": 10},
+                {**issue, "hash": "958a32aaa2082687e9609f09a6bb1bfd", "line": 1},
+                {
+                    **issue,
+                    "hash": "958a32aaa2082687e9609f09a6bb1bfd",
+                    "line": 2,
+                    "level": "error",
+                },
+                {
+                    **issue,
+                    "hash": "2579477254e08af7c9080370a347cb2d",
+                    "line": 3,
+                    "check": None,
+                },
+            ],
+        }
+        with open(os.path.join(reports_dir, "task-1"), "w") as f:
+            json.dump(report, f)
+
+    def load_issues(self):
+        with mock.patch("tempfile.gettempdir", return_value=self.tmp_dir.name):
+            with self.assertLogs():
+                call_command("load_issues", offline=True)
+
+    def list_stats(self):
+        return list(
+            CheckDailyStats.objects.order_by(
+                "date", "repository", "analyzer", "analyzer_check"
+            ).values_list(
+                "date",
+                "repository__slug",
+                "analyzer",
+                "analyzer_check",
+                "total",
+                "publishable",
+                "distinct_issues",
+                "last_found_issues",
+            )
+        )
+
+    def test_load_twice(self):
+        """
+        Check the daily statistics are the same when a task is loaded again,
+        as its issues are removed then created again
+        """
+        today = date.today()
+        expected = [
+            (today, "try", "analyzer-X", "", 1, 0, 1, 1),
+            (today, "try", "analyzer-X", "check-1", 2, 0, 1, 1),
+        ]
+        self.load_issues()
+        self.assertListEqual(self.list_stats(), expected)
+        self.assertEqual(IssueLink.objects.count(), 3)
+
+        self.load_issues()
+        self.assertListEqual(self.list_stats(), expected)
+        self.assertEqual(IssueLink.objects.count(), 3)
+        self.assertEqual(Diff.objects.get(id=1).nb_issues, 3)
+
+        call_command("rebuild_check_stats")
+        self.assertListEqual(self.list_stats(), expected)
+
+    def test_load_positions(self):
+        """
+        Check the links are created with the positions of their own issue,
+        when the issues without hash are skipped
+        """
+        self.load_issues()
+        self.assertListEqual(
+            list(
+                IssueLink.objects.order_by("line").values_list(
+                    "issue__hash", "line", "nb_lines"
+                )
+            ),
+            [
+                (uuid.UUID("958a32aaa2082687e9609f09a6bb1bfd"), 1, 1),
+                (uuid.UUID("958a32aaa2082687e9609f09a6bb1bfd"), 2, 1),
+                (uuid.UUID("2579477254e08af7c9080370a347cb2d"), 3, 1),
+            ],
+        )
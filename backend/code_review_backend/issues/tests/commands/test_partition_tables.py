@@ -0,0 +1,227 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import unittest
+import uuid
+from datetime import datetime, timezone
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase
+from django.utils import timezone as django_timezone
+
+from code_review_backend.issues.models import (
+    LEVEL_ERROR,
+    Diff,
+    Issue,
+    IssueLink,
+    Repository,
+    Revision,
+)
+from code_review_backend.issues.partitions import (
+    add_months,
+    drop_partition,
+    is_partitioned,
+    list_partitions,
+    month_datetime,
+    month_start,
+)
+
+LOG_PREFIX = "INFO:code_review_backend.issues.management.commands.partition_tables:"
+
+
+class PartitionTablesCommandTestCase(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.repo = Repository.objects.create(
+            slug="partitioned", url="https://www.test-partitioned.com"
+        )
+
+    def build_revision(self, phabricator_id, created):
+        revision = Revision.objects.create(
+            phabricator_id=phabricator_id,
+            phabricator_phid=f"PHID-{phabricator_id}",
+            title=f"Revision {phabricator_id}",
+            base_repository=self.repo,
+            head_repository=self.repo,
+        )
+        Revision.objects.filter(id=revision.id).update(created=created)
+        revision.refresh_from_db()
+        diff = revision.diffs.create(
+            id=phabricator_id,
+            phid=f"PHID-DIFF-{phabricator_id}",
+            review_task_id=f"Task{phabricator_id}",
+            mercurial_hash="MercurialHash",
+            repository=self.repo,
+        )
+        issue = Issue.objects.create(
+            hash=uuid.uuid4().hex,
+            path=f"path{phabricator_id}",
+            level=LEVEL_ERROR,
+            analyzer="analyzer",
+        )
+        issue.issue_links.create(revision=revision, diff=diff)
+        return revision
+
+    @unittest.skipIf(connection.vendor == "postgresql", "Partitioning is supported")
+    def test_unsupported_database(self):
+        with self.assertRaisesMessage(
+            CommandError, "Partitioning is only supported on PostgreSQL"
+        ):
+            call_command("partition_tables")
+        self.assertFalse(is_partitioned(Revision))
+
+    @unittest.skipUnless(
+        connection.vendor == "postgresql",
+        "Partitioning is only supported on PostgreSQL",
+    )
+    def test_partition_tables(self):
+        old = self.build_revision(1, datetime(2020, 1, 15, tzinfo=timezone.utc))
+        recent = self.build_revision(2, django_timezone.now())
+
+        with self.assertLogs() as mock_log:
+            call_command("partition_tables")
+        self.assertEqual(
+            mock_log.output,
+            [
+                f"{LOG_PREFIX}Partitioned 2 rows of issues_revision.",
+                f"{LOG_PREFIX}Partitioned 2 rows of issues_issuelink.",
+            ],
+        )
+        self.assertTrue(is_partitioned(Revision))
+        self.assertTrue(is_partitioned(IssueLink))
+
+        # Monthly partitions are created from the oldest revision
+        current = month_start(django_timezone.now())
+        partitions = list_partitions(Revision)
+        self.assertEqual(min(partitions), datetime(2020, 1, 1).date())
+        self.assertEqual(max(partitions), add_months(current, 2))
+        self.assertEqual(list(list_partitions(IssueLink)), list(partitions))
+
+        # Rows are kept and new ones can be written
+        self.assertEqual(
+            list(Revision.objects.order_by("id").values_list("id", flat=True)),
+            [old.id, recent.id],
+        )
+        self.assertEqual(
+            IssueLink.objects.get(revision=old).revision_created, old.created
+        )
+        self.build_revision(3, django_timezone.now())
+        self.assertEqual(IssueLink.objects.count(), 3)
+
+        # Revisions are still unique by their Phabricator identifiers
+        for duplicate in ({"phabricator_id": 3}, {"phabricator_phid": "PHID-3"}):
+            with transaction.atomic(), self.assertRaises(IntegrityError):
+                Revision.objects.create(
+                    title="Duplicate",
+                    base_repository=self.repo,
+                    head_repository=self.repo,
+                    **duplicate,
+                )
+
+        # Diffs and links can't reference a missing revision
+        with transaction.atomic(), self.assertRaises(IntegrityError):
+            Diff.objects.create(
+                id=404,
+                revision_id=404,
+                review_task_id="Task404",
+                mercurial_hash="MercurialHash",
+                repository=self.repo,
+            )
+            connection.check_constraints()
+
+        # The command can be run again safely
+        with self.assertLogs() as mock_log:
+            call_command("partition_tables")
+        self.assertEqual(
+            mock_log.output, [f"{LOG_PREFIX}Tables are already partitioned."]
+        )
+
+        # Cleanup drops whole old months, then removes the orphaned issues
+        cleanup_prefix = (
+            "INFO:code_review_backend.issues.management.commands.cleanup_issues:"
+        )
+        with self.assertLogs() as mock_log:
+            call_command("cleanup_issues", "--nb-days", "30", "--dry-run")
+        self.assertIn(
+            f"{cleanup_prefix}Would delete 1 IssueLink, 1 Diff, 1 Issue, "
+            "1 Revision, 1 IssuePath, 0 IssueCheck, 0 IssueMessage.",
+            mock_log.output,
+        )
+        with self.assertLogs() as mock_log:
+            call_command("cleanup_issues", "--nb-days", "30")
+        self.assertIn(
+            f"{cleanup_prefix}Dropped partition issues_revision_2020_01.",
+            mock_log.output,
+        )
+        self.assertIn(
+            f"{cleanup_prefix}Deleted 1 IssueLink, 1 Diff, 1 Issue, "
+            "1 Revision, 1 IssuePath, 0 IssueCheck, 0 IssueMessage.",
+            mock_log.output,
+        )
+        self.assertNotIn(datetime(2020, 1, 1).date(), list_partitions(Revision))
+        self.assertNotIn(datetime(2020, 1, 1).date(), list_partitions(IssueLink))
+        self.assertFalse(Revision.objects.filter(id=old.id).exists())
+        self.assertFalse(Diff.objects.filter(id=1).exists())
+        self.assertFalse(Issue.objects.filter(path_ref__value="path1").exists())
+        self.assertEqual(Revision.objects.count(), 2)
+        self.assertEqual(Issue.objects.count(), 2)
+
+        # The keys of the dropped revisions can be used again
+        self.build_revision(1, django_timezone.now())
+
+    def test_create_partitions_unpartitioned(self):
+        with self.assertLogs() as mock_log:
+            call_command("create_partitions")
+        self.assertEqual(
+            mock_log.output,
+            [
+                "INFO:code_review_backend.issues.management.commands.create_partitions:"
+                "Tables are not partitioned."
+            ],
+        )
+
+    @unittest.skipUnless(
+        connection.vendor == "postgresql",
+        "Partitioning is only supported on PostgreSQL",
+    )
+    def test_create_partitions(self):
+        with self.assertLogs():
+            call_command("partition_tables")
+
+        # Remove the partitions of the upcoming months
+        current = month_start(django_timezone.now())
+        next_month, last_month = add_months(current, 1), add_months(current, 2)
+        for model in (Revision, IssueLink):
+            partitions = list_partitions(model)
+            for month in (next_month, last_month):
+                drop_partition(model, partitions[month])
+
+        # Rows of the next month are stored in the default partitions
+        self.build_revision(1, month_datetime(next_month))
+
+        with self.assertLogs("code_review_backend.issues.partitions") as mock_log:
+            call_command("create_partitions")
+        self.assertEqual(
+            mock_log.output,
+            [
+                f"WARNING:code_review_backend.issues.partitions:Skipped partition "
+                f"issues_revision_{next_month:%Y_%m}, as its rows are already "
+                "stored in the default partition.",
+                f"INFO:code_review_backend.issues.partitions:Created partition "
+                f"issues_revision_{last_month:%Y_%m}.",
+                f"WARNING:code_review_backend.issues.partitions:Skipped partition "
+                f"issues_issuelink_{next_month:%Y_%m}, as its rows are already "
+                "stored in the default partition.",
+                f"INFO:code_review_backend.issues.partitions:Created partition "
+                f"issues_issuelink_{last_month:%Y_%m}.",
+            ],
+        )
+        self.assertEqual(
+            list_partitions(Revision).keys(), list_partitions(IssueLink).keys()
+        )
+        self.assertNotIn(next_month, list_partitions(Revision))
+        self.assertIn(last_month, list_partitions(Revision))
+        self.assertEqual(Revision.objects.count(), 1)
@@ -0,0 +1,96 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import uuid
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from code_review_backend.issues.models import (
+    LEVEL_ERROR,
+    LEVEL_WARNING,
+    Diff,
+    Issue,
+    Repository,
+)
+
+LOG_PREFIX = (
+    "INFO:code_review_backend.issues.management.commands.update_diffs_counters:"
+)
+
+
+class UpdateDiffsCountersCommandTestCase(TestCase):
+    def setUp(self):
+        repo = Repository.objects.create(slug="myrepo", url="http://repo.test/myrepo")
+        revision = repo.head_revisions.create(
+            phabricator_id=1, base_repository=repo, title="Revision"
+        )
+        self.diffs = [
+            revision.diffs.create(
+                id=i,
+                phid=f"PHID-DIFF-{i}",
+                review_task_id=f"task-{i}",
+                mercurial_hash=f"hash-{i}",
+                repository=repo,
+            )
+            for i in range(1, 4)
+        ]
+
+        # Links are created without updating the counters
+        for diff, levels in (
+            (self.diffs[0], [LEVEL_ERROR, LEVEL_WARNING, LEVEL_WARNING]),
+            (self.diffs[1], [LEVEL_WARNING]),
+        ):
+            for line, level in enumerate(levels):
+                issue = Issue.objects.create(
+                    hash=uuid.uuid4().hex, analyzer="analyzer", path="path", level=level
+                )
+                issue.issue_links.create(
+                    revision=revision, diff=diff, line=line, in_patch=line == 1
+                )
+
+        # Counters of the last diff are wrong
+        Diff.objects.filter(id=3).update(nb_issues=12, nb_errors=12)
+
+    def assertCounters(self, expected):
+        self.assertListEqual(
+            list(
+                Diff.objects.order_by("id").values_list(
+                    "id",
+                    "nb_issues",
+                    "nb_errors",
+                    "nb_warnings",
+                    "nb_issues_publishable",
+                )
+            ),
+            expected,
+        )
+
+    def test_update_counters(self):
+        with self.assertLogs() as mock_log:
+            with self.assertNumQueries(5):
+                call_command("update_diffs_counters", "--chunk-size", "2")
+
+        self.assertCounters([(1, 3, 1, 2, 2), (2, 1, 0, 1, 0), (3, 0, 0, 0, 0)])
+        self.assertListEqual(
+            mock_log.output,
+            [
+                f"{LOG_PREFIX}Page 1/2.",
+                f"{LOG_PREFIX}Page 2/2.",
+                f"{LOG_PREFIX}Updated issues counters of 3 diffs.",
+            ],
+        )
+
+    def test_update_counters_diffs(self):
+        with self.assertLogs() as mock_log:
+            call_command("update_diffs_counters", "--diff", "2", "--diff", "3")
+
+        self.assertCounters([(1, 0, 0, 0, 0), (2, 1, 0, 1, 0), (3, 0, 0, 0, 0)])
+        self.assertListEqual(
+            mock_log.output,
+            [
+                f"{LOG_PREFIX}Page 1/1.",
+                f"{LOG_PREFIX}Updated issues counters of 2 diffs.",
+            ],
+        )
@@ -2,22 +2,42 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
+import gzip
+import json
 import unittest
+import uuid
 
 from django.contrib.auth.models import User
+from django.db import connection
 from rest_framework import status
 from rest_framework.test import APITestCase
 
+from code_review_backend.issues.cache import bump_dictionaries_version
 from code_review_backend.issues.models import (
     Diff,
     Issue,
+    IssueCheck,
     IssueLink,
+    IssueMessage,
+    IssuePath,
     Repository,
     Revision,
 )
 
 
 class CreationAPITestCase(APITestCase):
+    # Issues then their links are created in two statements on PostgreSQL, and
+    # the checks statistics are updated from their links counted before and after
+    bulk_queries = 13 if connection.vendor == "postgresql" else 14
+    # The issues counters of a diff are updated with the links on PostgreSQL
+    counters_queries = 0 if connection.vendor == "postgresql" else 1
+    # The paths and checks are resolved in their dictionary tables, as their
+    # caches are only filled once the transactions are committed, after
+    # checking the version of those tables in the database cache
+    dictionary_queries = 5
+    # The version of the cached responses is bumped in the database cache
+    cache_queries = 5
+
     def setUp(self):
         # Create a user
         self.user = User.objects.create(username="crash_user")
@@ -195,7 +215,7 @@ class CreationAPITestCase(APITestCase):
         Check we can create a issue through the API
         """
         data = {
-            "hash": "somemd5hash",
+            "hash": "3344ba80a6b5476ce8cb7b8f2e864cb3",
             "line": 1,
             "analyzer": "remote-flake8",
             "level": "error",
@@ -239,7 +259,7 @@ class CreationAPITestCase(APITestCase):
         data = {
             "issues": [
                 {
-                    "hash": "somemd5hash",
+                    "hash": "3344ba80a6b5476ce8cb7b8f2e864cb3",
                     "line": 1,
                     "analyzer": "remote-flake8",
                     "level": "error",
@@ -248,7 +268,7 @@ class CreationAPITestCase(APITestCase):
                     "new_for_revision": False,
                 },
                 {
-                    "hash": "anothermd5hash",
+                    "hash": "2579477254e08af7c9080370a347cb2d",
                     "line": 2,
                     "analyzer": "test",
                     "level": "warning",
@@ -267,7 +287,9 @@ class CreationAPITestCase(APITestCase):
         # Once authenticated, creation will work
         self.assertEqual(Issue.objects.count(), 0)
         self.client.force_authenticate(user=self.user)
-        with self.assertNumQueries(6):
+        with self.assertNumQueries(
+            self.bulk_queries + self.dictionary_queries + self.cache_queries
+        ):
             response = self.client.post(
                 f"/v1/revision/{self.revision.id}/issues/", data, format="json"
             )
@@ -287,7 +309,7 @@ class CreationAPITestCase(APITestCase):
                         "analyzer": "remote-flake8",
                         "char": None,
                         "check": None,
-                        "hash": "somemd5hash",
+                        "hash": "3344ba80a6b5476ce8cb7b8f2e864cb3",
                         "id": str(issues[0].id),
                         "in_patch": True,
                         "level": "error",
@@ -302,7 +324,7 @@ class CreationAPITestCase(APITestCase):
                         "analyzer": "test",
                         "char": None,
                         "check": None,
-                        "hash": "anothermd5hash",
+                        "hash": "2579477254e08af7c9080370a347cb2d",
                         "id": str(issues[1].id),
                         "in_patch": False,
                         "level": "warning",
@@ -329,6 +351,126 @@ class CreationAPITestCase(APITestCase):
         self.assertEqual(link.new_for_revision, None)
         self.assertEqual(link.line, 2)
 
+    def test_create_issue_bulk_gzip(self):
+        """
+        Check the bulk payload can be sent as a gzip body
+        """
+        data = {
+            "issues": [
+                {
+                    "hash": "3344ba80a6b5476ce8cb7b8f2e864cb3",
+                    "line": 1,
+                    "analyzer": "remote-flake8",
+                    "level": "error",
+                    "path": "path/to/file.py",
+                },
+            ]
+        }
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post(
+            f"/v1/revision/{self.revision.id}/issues/",
+            gzip.compress(json.dumps(data).encode()),
+            content_type="application/json",
+            headers={"Content-Encoding": "gzip"},
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            response.json()["issues"][0]["hash"], "3344ba80a6b5476ce8cb7b8f2e864cb3"
+        )
+        self.assertEqual(Issue.objects.get().path, "path/to/file.py")
+
+        # A corrupted body is rejected
+        response = self.client.post(
+            f"/v1/revision/{self.revision.id}/issues/",
+            b"not gzip",
+            content_type="application/json",
+            headers={"Content-Encoding": "gzip"},
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_create_issue_bulk_fields(self):
+        """
+        Check the bulk creation can only output some fields, in the payload order
+        """
+        data = {
+            "diff_id": 1234,
+            "issues": [
+                {
+                    "hash": "299f00c73ad4b2365a908d4a2b0accd0",
+                    "line": 1,
+                    "analyzer": "remote-flake8",
+                    "level": "error",
+                    "path": "path/to/file.py",
+                    "in_patch": True,
+                },
+                {
+                    "hash": "1ed7367dcc351c0f81fafa896fd4ef5b",
+                    "line": 2,
+                    "analyzer": "test",
+                    "level": "warning",
+                    "path": "path/to/file.py",
+                },
+                {
+                    "hash": "299f00c73ad4b2365a908d4a2b0accd0",
+                    "line": 3,
+                    "analyzer": "remote-flake8",
+                    "level": "error",
+                    "path": "path/to/file.py",
+                    "in_patch": False,
+                },
+            ],
+        }
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post(
+            f"/v1/revision/{self.revision.id}/issues/?fields=hash,publishable",
+            data,
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertDictEqual(
+            response.json(),
+            {
+                "diff_id": 1234,
+                "issues": [
+                    {"hash": "299f00c73ad4b2365a908d4a2b0accd0", "publishable": True},
+                    {"hash": "1ed7367dcc351c0f81fafa896fd4ef5b", "publishable": None},
+                    {"hash": "299f00c73ad4b2365a908d4a2b0accd0", "publishable": False},
+                ],
+            },
+        )
+
+        # Other fields are serialized as in the full output
+        issue = Issue.objects.get(hash="1ed7367dcc351c0f81fafa896fd4ef5b")
+        response = self.client.post(
+            f"/v1/revision/{self.revision.id}/issues/?fields=id,line,check",
+            {"issues": data["issues"][1:2]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertDictEqual(
+            response.json(),
+            {
+                "diff_id": None,
+                "issues": [{"id": str(issue.id), "line": 2, "check": None}],
+            },
+        )
+
+        # Unknown fields are rejected before creating anything
+        response = self.client.post(
+            f"/v1/revision/{self.revision.id}/issues/?fields=hash,unknown",
+            {
+                "issues": [
+                    {**data["issues"][0], "hash": "958a32aaa2082687e9609f09a6bb1bfd"}
+                ]
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json(), {"fields": ["Unknown issue fields: unknown"]})
+        self.assertFalse(
+            Issue.objects.filter(hash="958a32aaa2082687e9609f09a6bb1bfd").exists()
+        )
+
     def test_create_issue_bulk_with_diff(self):
         """
         Check we can create issues on a revision with a reference to a diff
@@ -337,7 +479,7 @@ class CreationAPITestCase(APITestCase):
             "diff_id": 1234,
             "issues": [
                 {
-                    "hash": "somemd5hash",
+                    "hash": "3344ba80a6b5476ce8cb7b8f2e864cb3",
                     "line": 1,
                     "analyzer": "remote-flake8",
                     "level": "error",
@@ -348,7 +490,13 @@ class CreationAPITestCase(APITestCase):
             ],
         }
         self.client.force_authenticate(user=self.user)
-        with self.assertNumQueries(7):
+        with self.assertNumQueries(
+            self.bulk_queries
+            + self.dictionary_queries
+            + self.cache_queries
+            + self.counters_queries
+            + 1
+        ):
             response = self.client.post(
                 f"/v1/revision/{self.revision.id}/issues/", data, format="json"
             )
@@ -366,7 +514,7 @@ class CreationAPITestCase(APITestCase):
                         "analyzer": "remote-flake8",
                         "char": None,
                         "check": None,
-                        "hash": "somemd5hash",
+                        "hash": "3344ba80a6b5476ce8cb7b8f2e864cb3",
                         "id": str(issue.id),
                         "in_patch": True,
                         "level": "error",
@@ -389,6 +537,237 @@ class CreationAPITestCase(APITestCase):
         self.assertFalse(link.new_for_revision)
         self.assertEqual(link.line, 1)
 
+    def test_create_issue_bulk_new_for_revision(self):
+        """
+        Check the new issues of a revision are detected when not set by the client
+        """
+        issue = {
+            "hash": "3344ba80a6b5476ce8cb7b8f2e864cb3",
+            "line": 1,
+            "analyzer": "remote-flake8",
+            "level": "error",
+            "path": "path/to/file.py",
+        }
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post(
+            f"/v1/revision/{self.revision.id}/issues/",
+            {"diff_id": 1234, "issues": [issue]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(response.json()["issues"][0]["new_for_revision"])
+
+        # The first issue is known on the next diff
+        self.revision.diffs.create(
+            id=1235,
+            phid="PHID-DIFF-yyy",
+            review_task_id="deadbeef456",
+            mercurial_hash="coffee67890",
+            repository=self.repo_try,
+        )
+        data = {
+            "diff_id": 1235,
+            "issues": [
+                issue,
+                {**issue, "hash": "2579477254e08af7c9080370a347cb2d", "line": 2},
+                {
+                    **issue,
+                    "hash": "460f6d69d6a0c0aabe1caa35cb28e1fd",
+                    "new_for_revision": False,
+                },
+            ],
+        }
+        # A single query detects all the new issues
+        with self.assertNumQueries(
+            self.bulk_queries
+            + self.dictionary_queries
+            + self.cache_queries
+            + self.counters_queries
+            + 2
+        ):
+            response = self.client.post(
+                f"/v1/revision/{self.revision.id}/issues/?fields=hash,new_for_revision",
+                data,
+                format="json",
+            )
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertListEqual(
+            response.json()["issues"],
+            [
+                {"hash": "3344ba80a6b5476ce8cb7b8f2e864cb3", "new_for_revision": False},
+                {"hash": "2579477254e08af7c9080370a347cb2d", "new_for_revision": True},
+                {"hash": "460f6d69d6a0c0aabe1caa35cb28e1fd", "new_for_revision": False},
+            ],
+        )
+        self.assertListEqual(
+            list(
+                IssueLink.objects.filter(diff_id=1235)
+                .order_by("line", "issue__hash")
+                .values_list("issue__hash", "new_for_revision")
+            ),
+            [
+                (uuid.UUID("3344ba80a6b5476ce8cb7b8f2e864cb3"), False),
+                (uuid.UUID("460f6d69d6a0c0aabe1caa35cb28e1fd"), False),
+                (uuid.UUID("2579477254e08af7c9080370a347cb2d"), True),
+            ],
+        )
+
+        # A null value is detected too, but only with a diff
+        for diff_id, expected in ((1235, False), (None, None)):
+            response = self.client.post(
+                f"/v1/revision/{self.revision.id}/issues/?fields=new_for_revision",
+                {
+                    "diff_id": diff_id,
+                    "issues": [{**issue, "line": 3, "new_for_revision": None}],
+                },
+                format="json",
+            )
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            self.assertEqual(response.json()["issues"][0]["new_for_revision"], expected)
+
+    def test_create_issue_bulk_diff_counters(self):
+        """
+        Check the issues counters of the diff are updated with the created links
+        """
+        issue = {
+            "hash": "3344ba80a6b5476ce8cb7b8f2e864cb3",
+            "line": 1,
+            "nb_lines": 1,
+            "char": 1,
+            "analyzer": "remote-flake8",
+            "level": "error",
+            "path": "path/to/file.py",
+            "in_patch": False,
+        }
+        data = {
+            "diff_id": 1234,
+            "issues": [
+                issue,
+                {
+                    **issue,
+                    "hash": "2579477254e08af7c9080370a347cb2d",
+                    "level": "warning",
+                },
+                {
+                    **issue,
+                    "hash": "460f6d69d6a0c0aabe1caa35cb28e1fd",
+                    "level": "warning",
+                    "in_patch": True,
+                },
+            ],
+        }
+        self.client.force_authenticate(user=self.user)
+        for _ in range(2):
+            # Existing links are not counted twice
+            response = self.client.post(
+                f"/v1/revision/{self.revision.id}/issues/", data, format="json"
+            )
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            self.diff.refresh_from_db()
+            self.assertEqual(self.diff.nb_issues, 3)
+            self.assertEqual(self.diff.nb_errors, 1)
+            self.assertEqual(self.diff.nb_warnings, 2)
+            self.assertEqual(self.diff.nb_issues_publishable, 2)
+
+        # Another link of a known issue is counted
+        response = self.client.post(
+            f"/v1/revision/{self.revision.id}/issues/",
+            {"diff_id": 1234, "issues": [{**issue, "line": 2}]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.diff.refresh_from_db()
+        self.assertEqual(self.diff.nb_issues, 4)
+        self.assertEqual(self.diff.nb_errors, 2)
+        self.assertEqual(self.diff.nb_warnings, 2)
+        self.assertEqual(self.diff.nb_issues_publishable, 3)
+
+    def test_update_issue_diff_counters(self):
+        """
+        Check the issues counters of the diff follow the updated and deleted issues
+        """
+        issue = {
+            "hash": "3344ba80a6b5476ce8cb7b8f2e864cb3",
+            "line": 1,
+            "analyzer": "remote-flake8",
+            "level": "error",
+            "path": "path/to/file.py",
+            "in_patch": False,
+        }
+        data = {
+            "diff_id": 1234,
+            "issues": [
+                issue,
+                {
+                    **issue,
+                    "hash": "2579477254e08af7c9080370a347cb2d",
+                    "level": "warning",
+                },
+            ],
+        }
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post(
+            f"/v1/revision/{self.revision.id}/issues/", data, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        error_id, warning_id = (issue["id"] for issue in response.json()["issues"])
+
+        # The error is also found on another diff
+        other_diff = self.revision.diffs.create(
+            id=1235,
+            phid="PHID-DIFF-yyy",
+            review_task_id="deadbeef456",
+            mercurial_hash="coffee67890",
+            repository=self.repo_try,
+        )
+        response = self.client.post(
+            f"/v1/revision/{self.revision.id}/issues/",
+            {"diff_id": 1235, "issues": [issue]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        # The attributes of a link only count on its diff
+        response = self.client.patch(
+            f"/v1/diff/1235/issues/{error_id}/", {"in_patch": True}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        other_diff.refresh_from_db()
+        self.assertEqual(other_diff.nb_errors, 1)
+        self.diff.refresh_from_db()
+        self.assertEqual(self.diff.nb_issues_publishable, 1)
+
+        # The level of the issue counts on all its diffs
+        response = self.client.patch(
+            f"/v1/diff/1234/issues/{error_id}/",
+            {"level": "warning", "in_patch": True, "line": 3},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["level"], "warning")
+        self.assertEqual(response.json()["line"], 3)
+        self.assertTrue(
+            IssueLink.objects.filter(issue_id=error_id, in_patch=True).exists()
+        )
+        self.diff.refresh_from_db()
+        self.assertEqual(self.diff.nb_issues, 2)
+        self.assertEqual(self.diff.nb_errors, 0)
+        self.assertEqual(self.diff.nb_warnings, 2)
+        self.assertEqual(self.diff.nb_issues_publishable, 1)
+        other_diff.refresh_from_db()
+        self.assertEqual(other_diff.nb_errors, 0)
+        self.assertEqual(other_diff.nb_warnings, 1)
+        self.assertEqual(other_diff.nb_issues_publishable, 1)
+
+        response = self.client.delete(f"/v1/diff/1234/issues/{warning_id}/")
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(Issue.objects.filter(id=warning_id).exists())
+        self.diff.refresh_from_db()
+        self.assertEqual(self.diff.nb_issues, 1)
+        self.assertEqual(self.diff.nb_errors, 0)
+        self.assertEqual(self.diff.nb_warnings, 1)
+        self.assertEqual(self.diff.nb_issues_publishable, 1)
+
     # This test is currently expected to fail due to the unique
     # constraints on IssueLink not respecting the NULL values unicity
     # So we end up with duplicate IssueLinks being created when NULL values
@@ -401,7 +780,7 @@ class CreationAPITestCase(APITestCase):
         payload_1 = {
             "issues": [
                 {
-                    "hash": "somemd5hash",
+                    "hash": "3344ba80a6b5476ce8cb7b8f2e864cb3",
                     "line": 1,
                     "analyzer": "remote-flake8",
                     "level": "error",
@@ -410,7 +789,7 @@ class CreationAPITestCase(APITestCase):
                     "new_for_revision": False,
                 },
                 {
-                    "hash": "anothermd5hash",
+                    "hash": "2579477254e08af7c9080370a347cb2d",
                     "line": 2,
                     "analyzer": "test",
                     "level": "warning",
@@ -423,7 +802,7 @@ class CreationAPITestCase(APITestCase):
         payload_2 = {
             "issues": [
                 {
-                    "hash": "somemd5hash",
+                    "hash": "3344ba80a6b5476ce8cb7b8f2e864cb3",
                     "line": 1,
                     "analyzer": "remote-flake8",
                     "level": "error",
@@ -432,7 +811,7 @@ class CreationAPITestCase(APITestCase):
                     "new_for_revision": False,
                 },
                 {
-                    "hash": "athirdmd5hash",
+                    "hash": "460f6d69d6a0c0aabe1caa35cb28e1fd",
                     "line": 3,
                     "analyzer": "remote-flake8",
                     "level": "error",
@@ -445,45 +824,55 @@ class CreationAPITestCase(APITestCase):
 
         self.assertEqual(Issue.objects.count(), 0)
         self.client.force_authenticate(user=self.user)
-        with self.assertNumQueries(6):
+        with self.assertNumQueries(
+            self.bulk_queries + self.dictionary_queries + self.cache_queries
+        ):
             response = self.client.post(
                 f"/v1/revision/{self.revision.id}/issues/", payload_1, format="json"
             )
             self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertCountEqual(
             [issue["hash"] for issue in response.json()["issues"]],
-            ["somemd5hash", "anothermd5hash"],
+            ["3344ba80a6b5476ce8cb7b8f2e864cb3", "2579477254e08af7c9080370a347cb2d"],
         )
 
         issues = list(Issue.objects.order_by("created"))
         self.assertEqual(len(issues), 2)
 
-        with self.assertNumQueries(6):
+        with self.assertNumQueries(
+            self.bulk_queries + self.dictionary_queries + self.cache_queries
+        ):
             response = self.client.post(
                 f"/v1/revision/{self.revision.id}/issues/", payload_2, format="json"
             )
             self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertCountEqual(
             [issue["hash"] for issue in response.json()["issues"]],
-            ["somemd5hash", "athirdmd5hash"],
+            ["3344ba80a6b5476ce8cb7b8f2e864cb3", "460f6d69d6a0c0aabe1caa35cb28e1fd"],
         )
         new_issues = list(Issue.objects.order_by("created"))
         self.assertEqual(len(new_issues), 3)
         self.assertListEqual([i.id for i in issues], [i.id for i in new_issues[:2]])
         self.assertListEqual(
             [i.hash for i in new_issues],
-            ["somemd5hash", "anothermd5hash", "athirdmd5hash"],
+            [
+                "3344ba80a6b5476ce8cb7b8f2e864cb3",
+                "2579477254e08af7c9080370a347cb2d",
+                "460f6d69d6a0c0aabe1caa35cb28e1fd",
+            ],
         )
 
         # Calling again with the same payload should give the same result
-        with self.assertNumQueries(6):
+        with self.assertNumQueries(
+            self.bulk_queries + self.dictionary_queries + self.cache_queries
+        ):
             response = self.client.post(
                 f"/v1/revision/{self.revision.id}/issues/", payload_2, format="json"
             )
             self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertCountEqual(
             [issue["hash"] for issue in response.json()["issues"]],
-            ["somemd5hash", "athirdmd5hash"],
+            ["3344ba80a6b5476ce8cb7b8f2e864cb3", "460f6d69d6a0c0aabe1caa35cb28e1fd"],
         )
         self.assertListEqual(
             list(
@@ -491,23 +880,125 @@ class CreationAPITestCase(APITestCase):
                     "issue__hash", flat=True
                 )
             ),
-            ["somemd5hash", "anothermd5hash", "athirdmd5hash"],
+            [
+                "3344ba80a6b5476ce8cb7b8f2e864cb3",
+                "2579477254e08af7c9080370a347cb2d",
+                "460f6d69d6a0c0aabe1caa35cb28e1fd",
+            ],
         )
 
         # And we still have the same issues in DB
         new_issues = list(
             Issue.objects.order_by("created").values_list("hash", flat=True)
         )
-        self.assertEqual(new_issues, ["somemd5hash", "anothermd5hash", "athirdmd5hash"])
+        self.assertEqual(
+            new_issues,
+            [
+                "3344ba80a6b5476ce8cb7b8f2e864cb3",
+                "2579477254e08af7c9080370a347cb2d",
+                "460f6d69d6a0c0aabe1caa35cb28e1fd",
+            ],
+        )
         self.assertListEqual(
             list(
                 IssueLink.objects.order_by("issue__created").values_list(
                     "issue__hash", flat=True
                 )
             ),
-            ["somemd5hash", "anothermd5hash", "athirdmd5hash"],
+            [
+                "3344ba80a6b5476ce8cb7b8f2e864cb3",
+                "2579477254e08af7c9080370a347cb2d",
+                "460f6d69d6a0c0aabe1caa35cb28e1fd",
+            ],
+        )
+
+    def test_create_issue_bulk_cached_dictionaries(self):
+        """
+        Paths, checks and messages are stored once in dictionary tables,
+        whose entries are cached once committed
+        """
+        for model in (IssuePath, IssueCheck, IssueMessage):
+            self.addCleanup(model.objects.cached_ids.clear)
+
+        def build_issue(issue_hash, line):
+            return {
+                "hash": issue_hash,
+                "line": line,
+                "analyzer": "clang-tidy",
+                "check": "unused-variable",
+                "level": "warning",
+                "path": "path/to/file.cpp",
+                "message": "Unused variable 'foo'",
+                "in_patch": True,
+                "new_for_revision": False,
+            }
+
+        self.client.force_authenticate(user=self.user)
+        with (
+            self.captureOnCommitCallbacks(execute=True),
+            self.assertNumQueries(
+                self.bulk_queries + self.dictionary_queries + 2 + self.cache_queries
+            ),
+        ):
+            response = self.client.post(
+                f"/v1/revision/{self.revision.id}/issues/",
+                {"issues": [build_issue("3344ba80a6b5476ce8cb7b8f2e864cb3", 1)]},
+                format="json",
+            )
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        # No dictionary table is queried anymore for the same strings,
+        # only the version of their cached IDs is checked
+        with self.assertNumQueries(self.bulk_queries + 1 + self.cache_queries):
+            response = self.client.post(
+                f"/v1/revision/{self.revision.id}/issues/",
+                {"issues": [build_issue("2579477254e08af7c9080370a347cb2d", 2)]},
+                format="json",
+            )
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            response.json()["issues"][0],
+            {
+                "id": str(
+                    Issue.objects.get(
+                        hash=uuid.UUID(hex="2579477254e08af7c9080370a347cb2d")
+                    ).id
+                ),
+                "hash": "2579477254e08af7c9080370a347cb2d",
+                "analyzer": "clang-tidy",
+                "path": "path/to/file.cpp",
+                "level": "warning",
+                "check": "unused-variable",
+                "message": "Unused variable 'foo'",
+                "publishable": False,
+                "in_patch": True,
+                "new_for_revision": False,
+                "line": 2,
+                "nb_lines": None,
+                "char": None,
+            },
         )
 
+        first, second = Issue.objects.order_by("created")
+        self.assertEqual(first.path_ref_id, second.path_ref_id)
+        self.assertEqual(first.check_ref_id, second.check_ref_id)
+        self.assertEqual(first.message_ref_id, second.message_ref_id)
+        self.assertEqual(IssuePath.objects.count(), 1)
+        self.assertEqual(IssueCheck.objects.count(), 1)
+        self.assertEqual(IssueMessage.objects.count(), 1)
+
+        # Cached IDs are dropped once unused entries may have been deleted
+        bump_dictionaries_version()
+        with self.assertNumQueries(
+            self.bulk_queries + self.dictionary_queries + 2 + self.cache_queries
+        ):
+            response = self.client.post(
+                f"/v1/revision/{self.revision.id}/issues/",
+                {"issues": [build_issue("84aa8b4bbd6f5ba51bca8c2ba8c3a6f4", 3)]},
+                format="json",
+            )
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
     def test_create_issue_bulk_duplicate(self):
         """
         If the same issue is sent twice in the payload, it is deduplicated with no error
@@ -515,7 +1006,7 @@ class CreationAPITestCase(APITestCase):
         payload = {
             "issues": [
                 {
-                    "hash": "somemd5hash",
+                    "hash": "3344ba80a6b5476ce8cb7b8f2e864cb3",
                     "line": 1,
                     "analyzer": "remote-flake8",
                     "level": "error",
@@ -524,7 +1015,7 @@ class CreationAPITestCase(APITestCase):
                     "new_for_revision": False,
                 },
                 {
-                    "hash": "somemd5hash",
+                    "hash": "3344ba80a6b5476ce8cb7b8f2e864cb3",
                     "line": 1,
                     "analyzer": "remote-flake8",
                     "level": "error",
@@ -537,7 +1028,9 @@ class CreationAPITestCase(APITestCase):
 
         self.assertEqual(Issue.objects.count(), 0)
         self.client.force_authenticate(user=self.user)
-        with self.assertNumQueries(6):
+        with self.assertNumQueries(
+            self.bulk_queries + self.dictionary_queries + self.cache_queries
+        ):
             response = self.client.post(
                 f"/v1/revision/{self.revision.id}/issues/", payload, format="json"
             )
@@ -559,7 +1052,7 @@ class CreationAPITestCase(APITestCase):
                         "analyzer": "remote-flake8",
                         "char": None,
                         "check": None,
-                        "hash": "somemd5hash",
+                        "hash": "3344ba80a6b5476ce8cb7b8f2e864cb3",
                         "id": str(issues[0].id),
                         "in_patch": True,
                         "level": "error",
@@ -579,7 +1072,7 @@ class CreationAPITestCase(APITestCase):
         The same issue can be referred multiple times (e.g. different line, new_for_revision, in_patch, char…)
         """
         base_issue = {
-            "hash": "somemd5hash",
+            "hash": "3344ba80a6b5476ce8cb7b8f2e864cb3",
             "line": 1,
             "nb_lines": 2,
             "analyzer": "remote-flake8",
@@ -600,7 +1093,9 @@ class CreationAPITestCase(APITestCase):
 
         self.assertEqual(Issue.objects.count(), 0)
         self.client.force_authenticate(user=self.user)
-        with self.assertNumQueries(6):
+        with self.assertNumQueries(
+            self.bulk_queries + self.dictionary_queries + self.cache_queries
+        ):
             response = self.client.post(
                 f"/v1/revision/{self.revision.id}/issues/", payload, format="json"
             )
@@ -635,11 +1130,11 @@ class CreationAPITestCase(APITestCase):
                 for d in response.json()["issues"]
             ],
             [
-                ("somemd5hash", 1, 2, False, False),
-                ("somemd5hash", 2, 2, False, False),
-                ("somemd5hash", 1, 3, False, False),
-                ("somemd5hash", 1, 2, True, False),
-                ("somemd5hash", 1, 2, False, True),
+                ("3344ba80a6b5476ce8cb7b8f2e864cb3", 1, 2, False, False),
+                ("3344ba80a6b5476ce8cb7b8f2e864cb3", 2, 2, False, False),
+                ("3344ba80a6b5476ce8cb7b8f2e864cb3", 1, 3, False, False),
+                ("3344ba80a6b5476ce8cb7b8f2e864cb3", 1, 2, True, False),
+                ("3344ba80a6b5476ce8cb7b8f2e864cb3", 1, 2, False, True),
             ],
         )
 
@@ -674,7 +1169,9 @@ class CreationAPITestCase(APITestCase):
             diff=another_diff,
             issue=Issue.objects.create(hash="a" * 32),
         )
-        with self.assertNumQueries(6):
+        with self.assertNumQueries(
+            self.bulk_queries + self.dictionary_queries + self.cache_queries
+        ):
             response = self.client.post(
                 f"/v1/revision/{self.revision.id}/issues/", payload, format="json"
             )
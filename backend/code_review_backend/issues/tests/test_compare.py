@@ -8,7 +8,10 @@ import random
 from django.contrib.auth.models import User
 from rest_framework.test import APITestCase
 
-from code_review_backend.issues.compare import detect_new_for_revision
+from code_review_backend.issues.compare import (
+    detect_new_for_revision,
+    detect_new_for_revision_bulk,
+)
 from code_review_backend.issues.models import Diff, Issue, Repository
 
 
@@ -91,3 +94,44 @@ class CompareAPITestCase(APITestCase):
         # But adding an issue with a different hash on second diff will be set as new
         issue = self.build_issue(2, 12345)
         self.assertTrue(detect_new_for_revision(second_diff, issue.path, issue.hash))
+
+    def test_detect_new_for_revision_bulk(self):
+        """
+        Check the detection of new issues in a revision with a single query
+        """
+        top_diff = Diff.objects.get(pk=1)
+        second_diff = Diff.objects.get(pk=2)
+        existing = self.build_issue(2, 1)
+        new = self.build_issue(2, 12345)
+        issues = [
+            (existing.path, existing.hash),
+            (new.path, new.hash),
+            # Same hash on another path is not the same issue
+            ("another/path", existing.hash),
+            # Unknown issue
+            ("path/to/file", self.build_hash(999)),
+        ]
+
+        with self.assertNumQueries(1):
+            self.assertDictEqual(
+                detect_new_for_revision_bulk(second_diff, issues),
+                {
+                    (existing.path, existing.hash): False,
+                    (new.path, new.hash): True,
+                    ("another/path", existing.hash): True,
+                    ("path/to/file", self.build_hash(999)): True,
+                },
+            )
+
+        # Both detections are the same
+        for diff in (top_diff, second_diff):
+            self.assertDictEqual(
+                detect_new_for_revision_bulk(diff, issues),
+                {
+                    (path, issue_hash): detect_new_for_revision(diff, path, issue_hash)
+                    for path, issue_hash in issues
+                },
+            )
+
+        with self.assertNumQueries(0):
+            self.assertDictEqual(detect_new_for_revision_bulk(second_diff, []), {})
@@ -61,7 +61,6 @@ class DiffAPITestCase(APITestCase):
         self.assertDictEqual(
             response.json(),
             {
-                "count": 3,
                 "next": None,
                 "previous": None,
                 "results": [
@@ -168,13 +167,13 @@ class DiffAPITestCase(APITestCase):
         """
 
         # Exact repo
-        response = self.client.get("/v1/diff/?repository=myrepo")
+        response = self.client.get("/v1/diff/?count=true&repository=myrepo")
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.json()["count"], 3)
         self.assertEqual([d["id"] for d in response.json()["results"]], [3, 2, 1])
 
         # Missing repo
-        response = self.client.get("/v1/diff/?repository=missing")
+        response = self.client.get("/v1/diff/?count=true&repository=missing")
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.json()["count"], 0)
 
@@ -184,29 +183,107 @@ class DiffAPITestCase(APITestCase):
         """
 
         # In bugzilla id
-        response = self.client.get("/v1/diff/?search=10001")
+        response = self.client.get("/v1/diff/?count=true&search=10001")
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.json()["count"], 1)
         self.assertEqual([d["id"] for d in response.json()["results"]], [2])
 
         # In title
-        response = self.client.get("/v1/diff/?search=revision 1")
+        response = self.client.get("/v1/diff/?count=true&search=revision 1")
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.json()["count"], 2)
         self.assertEqual([d["id"] for d in response.json()["results"]], [3, 1])
 
+        # Numbers are exact lookups on the diff and Phabricator IDs
+        response = self.client.get("/v1/diff/?search=2")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([d["id"] for d in response.json()["results"]], [2])
+
+        response = self.client.get("/v1/diff/?search= 1 ")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([d["id"] for d in response.json()["results"]], [3, 1])
+
+        for query in ("1000", "99999999999"):
+            response = self.client.get(f"/v1/diff/?search={query}")
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.json()["results"], [])
+
     def test_filter_issues(self):
         """
         Check we can filter by issues present or not
         """
 
         # No issues at all
-        response = self.client.get("/v1/diff/?issues=no")
+        response = self.client.get("/v1/diff/?count=true&issues=no")
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.json()["count"], 3)
         self.assertEqual([d["id"] for d in response.json()["results"]], [3, 2, 1])
 
         # Any issues
-        response = self.client.get("/v1/diff/?issues=any")
+        response = self.client.get("/v1/diff/?count=true&issues=any")
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.json()["count"], 0)
+
+        # Issues counters are read from the diffs
+        Diff.objects.filter(id=2).update(nb_issues=3, nb_warnings=3)
+        Diff.objects.filter(id=1).update(
+            nb_issues=2, nb_errors=1, nb_warnings=1, nb_issues_publishable=1
+        )
+        response = self.client.get("/v1/diff/?issues=any")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [
+                (d["id"], d["nb_issues"], d["nb_errors"], d["nb_warnings"])
+                for d in response.json()["results"]
+            ],
+            [(2, 3, 0, 3), (1, 2, 1, 1)],
+        )
+
+        response = self.client.get("/v1/diff/?issues=publishable")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([d["id"] for d in response.json()["results"]], [1])
+
+        response = self.client.get("/v1/diff/?issues=no")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([d["id"] for d in response.json()["results"]], [3])
+
+    def test_pagination(self):
+        """
+        Check diffs are paginated on their ID, with a count on request
+        """
+        response = self.client.get("/v1/diff/?limit=2")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertNotIn("count", data)
+        self.assertIsNone(data["previous"])
+        self.assertEqual([d["id"] for d in data["results"]], [3, 2])
+
+        # Filters and the count are kept in the next page
+        response = self.client.get(data["next"] + "&count=true")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual(data["count"], 3)
+        self.assertIsNone(data["next"])
+        self.assertEqual([d["id"] for d in data["results"]], [1])
+
+        response = self.client.get(data["previous"])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([d["id"] for d in response.json()["results"]], [3, 2])
+
+        response = self.client.get("/v1/diff/?cursor=invalid")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        # Links from the offset pagination are still supported
+        response = self.client.get("/v1/diff/?limit=2&offset=1")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.json(),
+            {
+                "count": 3,
+                "approximate_count": False,
+                "next": None,
+                "previous": "http://testserver/v1/diff/?limit=2",
+                "results": response.json()["results"],
+            },
+        )
+        self.assertEqual([d["id"] for d in response.json()["results"]], [2, 1])
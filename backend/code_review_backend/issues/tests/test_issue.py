@@ -2,23 +2,31 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
+import hashlib
+import uuid
 from datetime import datetime
 from unittest.mock import patch
 
-from django.test import TestCase
+from django.contrib.auth.models import User
 from django.urls import reverse
 from rest_framework import status
+from rest_framework.test import APITestCase
 
 from code_review_backend.issues.models import (
     LEVEL_ERROR,
     LEVEL_WARNING,
     Issue,
+    IssueCheck,
+    IssueMessage,
+    IssuePath,
     Repository,
+    uuid7,
 )
 
 
-class IssueTestCase(TestCase):
+class IssueTestCase(APITestCase):
     def setUp(self):
+        self.user = User.objects.create(username="crash_user")
         self.repo = Repository.objects.create(id=42, slug="repo_slug")
         with patch("django.utils.timezone.now") as mock_now:
             mock_now.return_value = datetime.fromisoformat("2010-01-01:10")
@@ -39,10 +47,12 @@ class IssueTestCase(TestCase):
             )
 
         self.err_issue = Issue.objects.create(
-            path="some/file", level=LEVEL_ERROR, hash="issue_err"
+            path="some/file", level=LEVEL_ERROR, hash="c74dabd857945a1446c34afae6855642"
         )
         self.warn_issue = Issue.objects.create(
-            path="some/other/file", level=LEVEL_WARNING, hash="issue_warn"
+            path="some/other/file",
+            level=LEVEL_WARNING,
+            hash="0b256f11b9f74d11b4a28229776dcbff",
         )
 
         self.err_link = self.revision.issue_links.create(issue=self.err_issue, line=12)
@@ -80,6 +90,68 @@ class IssueTestCase(TestCase):
         self.err_link.in_patch = True
         self.assertTrue(self.err_link.publishable)
 
+    def test_time_ordered_ids(self):
+        # Issues are identified by UUIDs of version 7
+        self.assertEqual(self.err_issue.id.version, 7)
+        self.assertEqual(self.err_issue.id.variant, uuid.RFC_4122)
+
+        # Identifiers are ordered by their creation time
+        with patch("code_review_backend.issues.models.time_ns") as mock_time:
+            mock_time.return_value = 1_700_000_000_000_000_000
+            first = uuid7()
+            mock_time.return_value += 1_000_000
+            second = uuid7()
+        self.assertLess(first, second)
+        self.assertEqual(first.int >> 80, 1_700_000_000_000)
+
+    def test_dictionary_values(self):
+        """
+        Repeated strings of the issues are stored once in dictionary tables
+        """
+        issue = Issue.objects.create(
+            path="some/file",
+            level=LEVEL_WARNING,
+            hash="84f388120bacd3a22ef422c8189b2a3a",
+            analyzer="clang-tidy",
+            message="Unused variable 'baz'",
+        )
+        self.assertEqual(issue.path_ref_id, self.err_issue.path_ref_id)
+        self.assertEqual(IssuePath.objects.count(), 2)
+        # Issues without check are stored with an empty check
+        self.assertEqual(
+            IssueCheck.objects.values_list("analyzer", "analyzer_check").get(
+                id=issue.check_ref_id
+            ),
+            ("clang-tidy", ""),
+        )
+        self.assertEqual(
+            IssueMessage.objects.get().digest,
+            uuid.UUID(hex=hashlib.md5(b"Unused variable 'baz'").hexdigest()),
+        )
+
+        # The default queries do not join the dictionary tables
+        self.assertNotIn("JOIN", str(Issue.objects.only("id", "hash").query))
+
+        # The strings are loaded along with the issues on demand, with their former names
+        with self.assertNumQueries(1):
+            issue = Issue.objects.with_values().get(id=issue.id)
+            self.assertEqual(
+                (issue.path, issue.analyzer, issue.analyzer_check, issue.message),
+                ("some/file", "clang-tidy", None, "Unused variable 'baz'"),
+            )
+        self.assertEqual(
+            Issue.objects.filter(path_ref__value="some/file").count(),
+            2,
+        )
+
+        # The IDs of committed entries are cached in the process
+        self.addCleanup(IssuePath.objects.cached_ids.clear)
+        with self.captureOnCommitCallbacks(execute=True), self.assertNumQueries(2):
+            ids = IssuePath.objects.get_ids(["some/file", "new/file"])
+        with self.assertNumQueries(0):
+            self.assertEqual(IssuePath.objects.get_ids(["some/file", "new/file"]), ids)
+        self.assertEqual(ids["some/file"], self.err_issue.path_ref_id)
+
     def test_list_repository_issues_wrong_values(self):
         """
         A HTTP error 400 is raised when fields are set incorrectly
@@ -104,7 +176,7 @@ class IssueTestCase(TestCase):
         )
 
     def test_list_repository_issues(self):
-        with self.assertNumQueries(4):
+        with self.assertNumQueries(3):
             response = self.client.get(
                 reverse("repository-issues", kwargs={"repo_slug": "repo_slug"})
             )
@@ -112,12 +184,17 @@ class IssueTestCase(TestCase):
         self.assertEqual(
             response.json(),
             {
-                "count": 2,
                 "next": None,
                 "previous": None,
                 "results": [
-                    {"id": str(self.err_issue.id), "hash": "issue_err"},
-                    {"id": str(self.warn_issue.id), "hash": "issue_warn"},
+                    {
+                        "id": str(self.err_issue.id),
+                        "hash": "c74dabd857945a1446c34afae6855642",
+                    },
+                    {
+                        "id": str(self.warn_issue.id),
+                        "hash": "0b256f11b9f74d11b4a28229776dcbff",
+                    },
                 ],
             },
         )
@@ -126,7 +203,7 @@ class IssueTestCase(TestCase):
         """
         Primarily filter issues depending on an existing revision
         """
-        with self.assertNumQueries(6):
+        with self.assertNumQueries(5):
             response = self.client.get(
                 reverse("repository-issues", kwargs={"repo_slug": "repo_slug"})
                 + "?date=1999-01-01&revision_changeset="
@@ -134,11 +211,13 @@ class IssueTestCase(TestCase):
             )
             self.assertEqual(response.status_code, status.HTTP_200_OK)
         data = response.json()
-        self.assertEqual(data["count"], 1)
         self.assertEqual(
             data["results"],
             [
-                {"id": str(self.warn_issue.id), "hash": "issue_warn"},
+                {
+                    "id": str(self.warn_issue.id),
+                    "hash": "0b256f11b9f74d11b4a28229776dcbff",
+                },
             ],
         )
 
@@ -146,7 +225,7 @@ class IssueTestCase(TestCase):
         """
         Fall back to the date when no issue match the given revision
         """
-        with self.assertNumQueries(6):
+        with self.assertNumQueries(5):
             response = self.client.get(
                 reverse("repository-issues", kwargs={"repo_slug": "repo_slug"})
                 + "?date=2000-01-02&revision_changeset="
@@ -154,16 +233,18 @@ class IssueTestCase(TestCase):
             )
             self.assertEqual(response.status_code, status.HTTP_200_OK)
         data = response.json()
-        self.assertEqual(data["count"], 1)
         self.assertEqual(
             data["results"],
             [
-                {"id": str(self.warn_issue.id), "hash": "issue_warn"},
+                {
+                    "id": str(self.warn_issue.id),
+                    "hash": "0b256f11b9f74d11b4a28229776dcbff",
+                },
             ],
         )
 
     def test_list_repository_issues_date_only(self):
-        with self.assertNumQueries(5):
+        with self.assertNumQueries(4):
             response = self.client.get(
                 reverse("repository-issues", kwargs={"repo_slug": "repo_slug"})
                 + "?date=2010-01-01"
@@ -172,12 +253,17 @@ class IssueTestCase(TestCase):
         self.assertEqual(
             response.json(),
             {
-                "count": 2,
                 "next": None,
                 "previous": None,
                 "results": [
-                    {"id": str(self.err_issue.id), "hash": "issue_err"},
-                    {"id": str(self.warn_issue.id), "hash": "issue_warn"},
+                    {
+                        "id": str(self.err_issue.id),
+                        "hash": "c74dabd857945a1446c34afae6855642",
+                    },
+                    {
+                        "id": str(self.warn_issue.id),
+                        "hash": "0b256f11b9f74d11b4a28229776dcbff",
+                    },
                 ],
             },
         )
@@ -194,7 +280,6 @@ class IssueTestCase(TestCase):
             )
             self.assertEqual(response.status_code, status.HTTP_200_OK)
         data = response.json()
-        self.assertEqual(data["count"], 0)
         self.assertEqual(data["results"], [])
 
     def test_list_repository_issues_date_no_match(self):
@@ -209,5 +294,165 @@ class IssueTestCase(TestCase):
             )
             self.assertEqual(response.status_code, status.HTTP_200_OK)
         data = response.json()
-        self.assertEqual(data["count"], 0)
         self.assertEqual(data["results"], [])
+
+    def test_lookup_repository_issues(self):
+        """
+        Known hashes are listed for many paths at once, including paths without issues
+        """
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post(
+            reverse("repository-issues", kwargs={"repo_slug": "repo_slug"}),
+            {
+                "paths": ["some/file", "some/other/file", "unknown/file"],
+                "date": "2010-01-01",
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.json(),
+            {
+                "paths": {
+                    "some/file": ["c74dabd857945a1446c34afae6855642"],
+                    "some/other/file": ["0b256f11b9f74d11b4a28229776dcbff"],
+                    "unknown/file": [],
+                }
+            },
+        )
+
+    def test_lookup_repository_issues_hashes(self):
+        """
+        Known issues can be looked up by hashes, using the revision filter
+        """
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post(
+            reverse("repository-issues", kwargs={"repo_slug": "repo_slug"}),
+            {
+                "hashes": [
+                    "c74dabd857945a1446c34afae6855642",
+                    "0b256f11b9f74d11b4a28229776dcbff",
+                    "0" * 32,
+                ],
+                "revision_changeset": "2" * 40,
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.json(),
+            {"paths": {"some/other/file": ["0b256f11b9f74d11b4a28229776dcbff"]}},
+        )
+
+    def test_lookup_repository_issues_wrong_values(self):
+        self.client.force_authenticate(user=self.user)
+        url = reverse("repository-issues", kwargs={"repo_slug": "repo_slug"})
+
+        response = self.client.post(url, {"paths": []}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            response.json(),
+            {"non_field_errors": ["At least one path or one hash is required"]},
+        )
+
+        response = self.client.post(
+            url, {"paths": ["some/file"], "date": "2010"}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            response.json(), {"date": ["invalid date - should be YYYY-MM-DD"]}
+        )
+
+        # Lookups are only allowed to authenticated users
+        self.client.logout()
+        response = self.client.post(url, {"paths": ["some/file"]}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_search_issues(self):
+        """
+        Issues can be searched by their message, in a repository
+        """
+        self.err_issue.message = "Unused variable 'foo' in the function"
+        self.err_issue.analyzer = "clang-tidy"
+        self.err_issue.analyzer_check = "unused-variable"
+        self.err_issue.save()
+        self.warn_issue.message = "The variable 'bar' is never used"
+        self.warn_issue.analyzer = "eslint"
+        self.warn_issue.save()
+        other_issue = Issue.objects.create(
+            path="another/file",
+            level=LEVEL_WARNING,
+            hash="84f388120bacd3a22ef422c8189b2a3a",
+            analyzer="clang-tidy",
+            message="Unused variable 'baz'",
+        )
+
+        def search(params):
+            response = self.client.get(reverse("issues-search"), params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return [issue["hash"] for issue in response.json()["results"]]
+
+        self.assertEqual(
+            search({"q": "unused variable"}),
+            ["84f388120bacd3a22ef422c8189b2a3a", "c74dabd857945a1446c34afae6855642"],
+        )
+        self.assertEqual(
+            search({"q": "variable"}),
+            [
+                "84f388120bacd3a22ef422c8189b2a3a",
+                "0b256f11b9f74d11b4a28229776dcbff",
+                "c74dabd857945a1446c34afae6855642",
+            ],
+        )
+        self.assertEqual(
+            search({"q": "variable", "repository": "repo_slug"}),
+            ["0b256f11b9f74d11b4a28229776dcbff", "c74dabd857945a1446c34afae6855642"],
+        )
+        self.assertEqual(
+            search({"q": "variable", "analyzer": "eslint"}),
+            ["0b256f11b9f74d11b4a28229776dcbff"],
+        )
+        self.assertEqual(
+            search(
+                {"q": "variable", "analyzer": "clang-tidy", "check": "unused-variable"}
+            ),
+            ["c74dabd857945a1446c34afae6855642"],
+        )
+        self.assertEqual(search({"q": "unknown"}), [])
+
+        response = self.client.get(
+            reverse("issues-search"), {"q": "variable", "limit": 1}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual(
+            data,
+            {
+                "next": data["next"],
+                "previous": None,
+                "results": [
+                    {
+                        "id": str(other_issue.id),
+                        "hash": "84f388120bacd3a22ef422c8189b2a3a",
+                        "analyzer": "clang-tidy",
+                        "check": None,
+                        "path": "another/file",
+                        "level": "warning",
+                        "message": "Unused variable 'baz'",
+                        "created": other_issue.created.isoformat().replace(
+                            "+00:00", "Z"
+                        ),
+                    }
+                ],
+            },
+        )
+        response = self.client.get(data["next"])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [issue["hash"] for issue in response.json()["results"]],
+            ["0b256f11b9f74d11b4a28229776dcbff"],
+        )
+
+        response = self.client.get(reverse("issues-search"), {"q": " "})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json(), {"q": ["A search query is required"]})
@@ -0,0 +1,114 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import unittest
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import connection
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from code_review_backend.issues.models import Issue, Repository
+from code_review_backend.issues.pagination import (
+    EstimatedCountPagination,
+    estimate_count,
+)
+
+
+class EstimatedCountTestCase(APITestCase):
+    def setUp(self):
+        Repository.objects.all().delete()
+        Repository.objects.bulk_create(
+            [
+                Repository(slug=f"repo-{i}", url=f"http://repo.test/repo-{i}")
+                for i in range(10)
+            ]
+        )
+        self.repositories = Repository.objects.order_by("slug")
+
+    def test_estimate_count(self):
+        """
+        Check rows are only counted exactly up to a cap
+        """
+        self.assertEqual(estimate_count(self.repositories, cap=10), (10, False))
+        self.assertEqual(
+            estimate_count(self.repositories.filter(slug="repo-1"), cap=5), (1, False)
+        )
+
+        count, approximate = estimate_count(self.repositories, cap=5)
+        self.assertTrue(approximate)
+        self.assertGreater(count, 5)
+
+        # The count always includes the requested offset
+        self.assertEqual(
+            estimate_count(self.repositories, offset=6, cap=5), (10, False)
+        )
+        count, approximate = estimate_count(self.repositories, offset=20, cap=5)
+        self.assertTrue(approximate)
+        self.assertGreater(count, 5)
+        self.assertEqual(
+            estimate_count(self.repositories, offset=20, cap=10), (10, False)
+        )
+
+    @unittest.skipUnless(
+        connection.vendor == "postgresql", "Statistics are only used on PostgreSQL"
+    )
+    def test_estimate_count_statistics(self):
+        """
+        Check the size of a whole table is read from PostgreSQL statistics
+        """
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE issues_repository")
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                estimate_count(Repository.objects.all(), cap=5), (10, True)
+            )
+
+        # Filtered rows are counted up to the cap, then estimated from the query plan
+        with self.assertNumQueries(2):
+            count, approximate = estimate_count(
+                Repository.objects.filter(slug__startswith="repo-"), cap=5
+            )
+        self.assertTrue(approximate)
+        self.assertGreater(count, 5)
+
+    def test_api(self):
+        """
+        Check the count of a list is estimated, unless requested exactly
+        """
+        with mock.patch.object(EstimatedCountPagination, "count_cap", 5):
+            response = self.client.get("/v1/repository/?limit=2&offset=2")
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            data = response.json()
+            self.assertTrue(data["approximate_count"])
+            self.assertGreater(data["count"], 5)
+            self.assertEqual(len(data["results"]), 2)
+
+            response = self.client.get("/v1/repository/?count=exact")
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            data = response.json()
+            self.assertFalse(data["approximate_count"])
+            self.assertEqual(data["count"], 10)
+
+    def test_admin(self):
+        """
+        Check the admin lists large tables with an estimated count
+        """
+        user = User.objects.create_superuser(username="admin")
+        self.client.force_login(user)
+        Issue.objects.bulk_create(
+            [
+                Issue(hash=f"{i:032x}", analyzer="analyzer", path="path/to/file")
+                for i in range(120)
+            ]
+        )
+
+        response = self.client.get("/admin/issues/issue/?p=2")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        paginator = response.context["cl"].paginator
+        self.assertEqual(paginator.offset, 100)
+        self.assertEqual(paginator.count, 120)
+        self.assertFalse(paginator.approximate_count)
+        self.assertEqual(len(response.context["cl"].result_list), 20)
@@ -22,6 +22,7 @@ class RepositoryAPITestCase(APITestCase):
             response.json(),
             {
                 "count": 5,
+                "approximate_count": False,
                 "next": None,
                 "previous": None,
                 "results": [
@@ -5,13 +5,22 @@
 import hashlib
 import random
 import uuid
+from datetime import date, timedelta
 
 from django.conf import settings
 from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APITestCase
 
-from code_review_backend.issues.models import Issue, IssueLink, Repository
+from code_review_backend.issues.models import (
+    CheckDailyStats,
+    Issue,
+    IssueLink,
+    Repository,
+    Revision,
+)
 
 
 class StatsAPITestCase(APITestCase):
@@ -92,6 +101,9 @@ class StatsAPITestCase(APITestCase):
             ]
         )
 
+        # Aggregate the issues created without the API
+        call_command("rebuild_check_stats")
+
         settings.PHABRICATOR_HOST = "http://anotherphab.test/api123/?custom"
 
     def test_stats(self):
@@ -105,6 +117,7 @@ class StatsAPITestCase(APITestCase):
             response.json(),
             {
                 "count": 15,
+                "approximate_count": False,
                 "next": None,
                 "previous": None,
                 "results": [
@@ -217,12 +230,389 @@ class StatsAPITestCase(APITestCase):
             },
         )
 
+    def test_stats_dates(self):
+        """
+        Check stats can be filtered on any date range
+        """
+        today = date.today()
+        response = self.client.get(
+            f"/v1/check/stats/?since={today - timedelta(days=365)}&until={today}"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["count"], 15)
+
+        response = self.client.get(
+            f"/v1/check/stats/?until={today - timedelta(days=1)}"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["count"], 0)
+
+        response = self.client.get("/v1/check/stats/?since=yesterday")
+        self.assertEqual(response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
+        self.assertEqual(
+            response.json(), {"detail": "invalid since date - should be YYYY-MM-DD"}
+        )
+
+    def test_history(self):
+        """
+        Check the history of new issues per day
+        """
+        today = date.today()
+        response = self.client.get("/v1/check/history/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), [{"date": str(today), "total": 500}])
+
+        response = self.client.get(
+            "/v1/check/history/?repository=myrepo-try&analyzer=analyzer-X&check=check-1"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), [{"date": str(today), "total": 34}])
+
+        response = self.client.get("/v1/check/history/?repository=myrepo")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), [])
+
+        response = self.client.get(
+            f"/v1/check/history/?since={today - timedelta(days=7)}"
+            f"&until={today - timedelta(days=1)}"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), [])
+
+    def test_history_repositories(self):
+        """
+        Check new issues are counted once on each repository they are found on
+        """
+        today = date.today()
+        known = Issue.objects.with_values().filter(analyzer="analyzer-Y").first()
+        revision = self.repo.head_revisions.create(
+            phabricator_id=11,
+            phabricator_phid="PHID-DREV-brev",
+            title="Revision B",
+            base_repository=self.repo,
+        )
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post(
+            f"/v1/revision/{revision.id}/issues/",
+            {
+                "issues": [
+                    {
+                        "hash": known.hash.hex,
+                        "analyzer": known.analyzer,
+                        "check": known.analyzer_check,
+                        "level": known.level,
+                        "path": known.path,
+                    }
+                ],
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        response = self.client.get("/v1/check/history/")
+        self.assertEqual(response.json(), [{"date": str(today), "total": 501}])
+        response = self.client.get("/v1/check/history/?repository=myrepo")
+        self.assertEqual(response.json(), [{"date": str(today), "total": 1}])
+        response = self.client.get("/v1/check/history/?repository=myrepo-try")
+        self.assertEqual(response.json(), [{"date": str(today), "total": 500}])
+
+    def test_stats_deletion(self):
+        """
+        Check the issues removed through the API are not counted anymore
+        """
+        today = date.today()
+        issue = (
+            Issue.objects.with_values()
+            .filter(
+                analyzer="analyzer-X",
+                analyzer_check="check-1",
+                issue_links__isnull=False,
+            )
+            .first()
+        )
+        link = issue.issue_links.get()
+        stats = CheckDailyStats.objects.get(
+            analyzer="analyzer-X", analyzer_check="check-1"
+        )
+        self.assertEqual((stats.total, stats.distinct_issues), (34, 34))
+
+        self.client.force_authenticate(user=self.user)
+        response = self.client.delete(f"/v1/diff/{link.diff_id}/issues/{issue.id}/")
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+        stats.refresh_from_db()
+        self.assertEqual((stats.total, stats.distinct_issues), (33, 33))
+        response = self.client.get("/v1/check/history/")
+        self.assertEqual(response.json(), [{"date": str(today), "total": 499}])
+
+    def test_cache(self):
+        """
+        Check the statistics are cached until new issues are ingested
+        """
+        today = date.today()
+        response = self.client.get("/v1/check/history/")
+        self.assertEqual(response.json(), [{"date": str(today), "total": 500}])
+        # Clients do not keep the responses as long as the server
+        self.assertEqual(response["Cache-Control"], "max-age=60")
+
+        # Changes outside of the ingestion are not visible, as the response
+        # is only read from the cache, along with the version of the issues
+        CheckDailyStats.objects.all().delete()
+        with self.assertNumQueries(3):
+            response = self.client.get("/v1/check/history/")
+        self.assertEqual(response.json(), [{"date": str(today), "total": 500}])
+        self.assertEqual(response["Cache-Control"], "max-age=60")
+
+        revision = self.repo_try.head_revisions.get()
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post(
+            f"/v1/revision/{revision.id}/issues/",
+            {
+                "issues": [
+                    {
+                        "hash": "958a32aaa2082687e9609f09a6bb1bfd",
+                        "analyzer": "analyzer-X",
+                        "level": "error",
+                        "path": "path/to/file",
+                    }
+                ],
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        response = self.client.get("/v1/check/history/")
+        self.assertEqual(response.json(), [{"date": str(today), "total": 1}])
+
+        # Cleaning up old issues invalidates the responses too
+        CheckDailyStats.objects.all().delete()
+        Revision.objects.update(created=timezone.now() - timedelta(days=60))
+        with self.assertLogs():
+            call_command("cleanup_issues")
+        response = self.client.get("/v1/check/history/")
+        self.assertEqual(response.json(), [])
+
+    def test_ingestion(self):
+        """
+        Check the statistics updated on ingestion are the same as the rebuilt ones
+        """
+        revision = self.repo_try.head_revisions.create(
+            phabricator_id=11,
+            phabricator_phid="PHID-DREV-brev",
+            title="Revision B",
+            base_repository=self.repo,
+        )
+        revision.diffs.create(
+            id=11,
+            phid="PHID-DIFF-11",
+            review_task_id="task-11",
+            mercurial_hash=hashlib.sha1(b"hg 11").hexdigest(),
+            repository=self.repo_try,
+        )
+        known = (
+            Issue.objects.with_values()
+            .filter(
+                analyzer="analyzer-Z",
+                analyzer_check="check-42",
+                issue_links__isnull=False,
+            )
+            .first()
+        )
+        issue = {
+            "analyzer": "analyzer-X",
+            "check": "check-1",
+            "level": "error",
+            "path": "path/to/file",
+            "line": 1,
+            "nb_lines": 1,
+            "char": 1,
+        }
+        self.client.force_authenticate(user=self.user)
+        for diff_id, issues in (
+            (None, [{**issue, "hash": "958a32aaa2082687e9609f09a6bb1bfd"}]),
+            (
+                11,
+                [
+                    # Issue already found on the repository
+                    {
+                        **issue,
+                        "hash": known.hash.hex,
+                        "analyzer": known.analyzer,
+                        "check": known.analyzer_check,
+                        "level": known.level,
+                    },
+                    # Same issue found twice in the same chunk
+                    {
+                        **issue,
+                        "hash": "958a32aaa2082687e9609f09a6bb1bfd",
+                        "in_patch": True,
+                    },
+                    {
+                        **issue,
+                        "hash": "958a32aaa2082687e9609f09a6bb1bfd",
+                        "line": 2,
+                        "in_patch": False,
+                    },
+                    {
+                        **issue,
+                        "hash": "2579477254e08af7c9080370a347cb2d",
+                        "check": None,
+                    },
+                ],
+            ),
+            # Links already created are not counted twice
+            (
+                11,
+                [{**issue, "hash": "2579477254e08af7c9080370a347cb2d", "check": None}],
+            ),
+        ):
+            response = self.client.post(
+                f"/v1/revision/{revision.id}/issues/",
+                {
+                    "diff_id": diff_id,
+                    "issues": [
+                        {key: value for key, value in i.items() if value is not None}
+                        for i in issues
+                    ],
+                },
+                format="json",
+            )
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        def list_stats():
+            return list(
+                CheckDailyStats.objects.order_by(
+                    "date", "repository", "analyzer", "analyzer_check"
+                ).values_list(
+                    "date",
+                    "repository__slug",
+                    "analyzer",
+                    "analyzer_check",
+                    "total",
+                    "publishable",
+                    "distinct_issues",
+                )
+            )
+
+        stats = list_stats()
+        for expected in (
+            ("analyzer-X", "", 34, 1, 34),
+            ("analyzer-X", "check-1", 37, 3, 35),
+            ("analyzer-Z", "check-42", 35, 0, 34),
+        ):
+            self.assertIn((date.today(), "myrepo-try", *expected), stats)
+        call_command("rebuild_check_stats")
+        self.assertListEqual(list_stats(), stats)
+
+    def test_stats_last_found(self):
+        """
+        Check issues found since a day are counted once, even when they were first
+        found before, consistently between the ingestion and the rebuilt statistics
+        """
+        today = date.today()
+        self.client.force_authenticate(user=self.user)
+        for phabricator_id, days_ago, hashes in (
+            (20, 10, ["958a32aaa2082687e9609f09a6bb1bfd"]),
+            (
+                21,
+                0,
+                [
+                    "958a32aaa2082687e9609f09a6bb1bfd",
+                    "2579477254e08af7c9080370a347cb2d",
+                ],
+            ),
+            # Revisions ingested late do not change the day issues were last found
+            (22, 20, ["2579477254e08af7c9080370a347cb2d"]),
+        ):
+            revision = self.repo_try.head_revisions.create(
+                phabricator_id=phabricator_id,
+                phabricator_phid=f"PHID-DREV-{phabricator_id}",
+                title=f"Revision {phabricator_id}",
+                base_repository=self.repo,
+            )
+            Revision.objects.filter(id=revision.id).update(
+                created=timezone.now() - timedelta(days=days_ago)
+            )
+            response = self.client.post(
+                f"/v1/revision/{revision.id}/issues/",
+                {
+                    "issues": [
+                        {
+                            "hash": issue_hash,
+                            "analyzer": "analyzer-W",
+                            "level": "error",
+                            "path": "path/to/file",
+                        }
+                        for issue_hash in hashes
+                    ]
+                },
+                format="json",
+            )
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        def list_totals(params):
+            response = self.client.get(f"/v1/check/stats/?{params}")
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return [
+                (stats["total"], stats["publishable"])
+                for stats in response.json()["results"]
+                if stats["analyzer"] == "analyzer-W"
+            ]
+
+        # Both issues were found today, and all their links are publishable
+        self.assertEqual(list_totals(f"since={today}"), [(2, 2)])
+        self.assertEqual(list_totals(f"since={today - timedelta(days=30)}"), [(2, 4)])
+
+        # Issues are only counted on the last day they were found
+        self.assertEqual(
+            list_totals(
+                f"since={today - timedelta(days=30)}&until={today - timedelta(days=1)}"
+            ),
+            [(0, 2)],
+        )
+
+        # New issues are counted on the day they were first found
+        response = self.client.get("/v1/check/history/?analyzer=analyzer-W")
+        self.assertEqual(
+            response.json(),
+            [
+                {"date": str(today - timedelta(days=20)), "total": 1},
+                {"date": str(today - timedelta(days=10)), "total": 1},
+                {"date": str(today), "total": 0},
+            ],
+        )
+
+        def list_stats():
+            return list(
+                CheckDailyStats.objects.filter(analyzer="analyzer-W")
+                .order_by("date")
+                .values_list(
+                    "date",
+                    "total",
+                    "publishable",
+                    "distinct_issues",
+                    "last_found_issues",
+                )
+            )
+
+        stats = list_stats()
+        self.assertListEqual(
+            stats,
+            [
+                (today - timedelta(days=20), 1, 1, 1, 0),
+                (today - timedelta(days=10), 1, 1, 1, 0),
+                (today, 2, 2, 0, 2),
+            ],
+        )
+        call_command("rebuild_check_stats")
+        self.assertListEqual(list_stats(), stats)
+
     def test_details(self):
         """
         Check API endpoint to list issues in a check
         """
         response = self.client.get(
-            "/v1/check/myrepo-try/analyzer-X/check-1/?publishable=all"
+            "/v1/check/myrepo-try/analyzer-X/check-1/?publishable=all&count=true"
         )
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         data = response.json()
@@ -0,0 +1,120 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import uuid
+
+from django.test import TestCase
+from rest_framework.exceptions import ValidationError
+
+from code_review_backend.issues.models import Repository
+from code_review_backend.issues.serializers import IssueBulkSerializer
+from code_review_backend.issues.validation import validate_issues_bulk
+
+VALID_ISSUE = {
+    "hash": "3344ba80a6b5476ce8cb7b8f2e864cb3",
+    "analyzer": "remote-flake8",
+    "path": "path/to/file.py",
+    "level": "error",
+}
+
+
+class IssueBulkValidationTestCase(TestCase):
+    def setUp(self):
+        repo = Repository.objects.create(slug="myrepo", url="http://repo.test/myrepo")
+        self.revision = repo.head_revisions.create(
+            phabricator_id=456, base_repository=repo, title="Bug XXX"
+        )
+        self.diff = self.revision.diffs.create(
+            id=1234,
+            phid="PHID-DIFF-xxx",
+            review_task_id="deadbeef123",
+            mercurial_hash="coffee12345",
+            repository=repo,
+        )
+
+    def validate(self, data):
+        """
+        Validate a payload with both the lightweight engine and DRF
+        Returns the validated data, or the errors as serialized by the API
+        """
+        serializer = IssueBulkSerializer(data=data, context={"revision": self.revision})
+        if serializer.is_valid():
+            expected = {
+                **serializer.validated_data,
+                "issues": [dict(i) for i in serializer.validated_data["issues"]],
+            }
+        else:
+            expected = serializer.errors
+
+        try:
+            result = validate_issues_bulk(
+                IssueBulkSerializer(context={"revision": self.revision}), data
+            )
+        except ValidationError as e:
+            result = e.detail
+        self.assertEqual(result, expected)
+        return result
+
+    def test_valid(self):
+        result = self.validate(
+            {
+                "diff_id": self.diff.id,
+                "issues": [
+                    VALID_ISSUE,
+                    {
+                        **VALID_ISSUE,
+                        "id": str(uuid.uuid4()),
+                        "path": "  another/file.py ",
+                        "level": "warning",
+                        "check": "E501",
+                        "message": "Some message with unicode “quotes”",
+                        "in_patch": "true",
+                        "new_for_revision": None,
+                        "line": "12",
+                        "nb_lines": 3,
+                        "char": None,
+                        # Read-only and unknown fields are ignored
+                        "publishable": True,
+                        "column": 12,
+                    },
+                ],
+            }
+        )
+        self.assertEqual(result["diff_id"], self.diff)
+        self.assertEqual(result["issues"][1]["issue_links__in_patch"], True)
+        self.assertEqual(result["issues"][1]["path"], "another/file.py")
+        self.assertEqual(result["issues"][1]["issue_links__line"], 12)
+
+        self.validate({"issues": []})
+        self.validate({"diff_id": None, "issues": [VALID_ISSUE]})
+
+    def test_invalid_issues(self):
+        self.validate(
+            {
+                "issues": [
+                    VALID_ISSUE,
+                    {},
+                    {**VALID_ISSUE, "hash": "x" * 33, "level": "critical"},
+                    {**VALID_ISSUE, "hash": "x" * 32},
+                    {**VALID_ISSUE, "hash": VALID_ISSUE["hash"].upper()},
+                    {**VALID_ISSUE, "hash": None, "analyzer": "  ", "path": ["a"]},
+                    {**VALID_ISSUE, "check": None, "message": "", "path": "a\x00"},
+                    {**VALID_ISSUE, "message": "\ud800", "level": 1},
+                    {**VALID_ISSUE, "in_patch": "maybe", "new_for_revision": 2},
+                    {**VALID_ISSUE, "line": "twelve", "nb_lines": True, "char": 1.5},
+                    {**VALID_ISSUE, "id": "not-a-uuid"},
+                    "not an issue",
+                    None,
+                ]
+            }
+        )
+
+    def test_invalid_payload(self):
+        self.validate(None)
+        self.validate([VALID_ISSUE])
+        self.validate({})
+        self.validate({"issues": None})
+        self.validate({"issues": {"hash": "3344ba80a6b5476ce8cb7b8f2e864cb3"}})
+        self.validate({"diff_id": 9999, "issues": [VALID_ISSUE]})
+        self.validate({"diff_id": "abc", "issues": [{}]})
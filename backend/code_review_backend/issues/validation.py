@@ -0,0 +1,196 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import uuid
+from functools import cache
+
+from rest_framework import serializers
+from rest_framework.exceptions import ErrorDetail, ValidationError
+from rest_framework.fields import empty
+from rest_framework.settings import api_settings
+
+from code_review_backend.issues.serializers import (
+    IssueHashField,
+    SingleIssueBulkSerializer,
+)
+
+
+def compile_char(field):
+    assert field.trim_whitespace, "Only trimmed strings are supported"
+    max_length = field.max_length
+
+    def check(value):
+        if type(value) is not str:
+            return field.run_validation(value)
+        value = value.strip()
+        if not value:
+            if not field.allow_blank:
+                field.fail("blank")
+            return ""
+        # Only run the validators when the value may not be valid
+        if (
+            (max_length is not None and len(value) > max_length)
+            or "\x00" in value
+            or not value.isascii()
+        ):
+            field.run_validators(value)
+        return value
+
+    return check
+
+
+def compile_choice(field):
+    choices = field.choice_strings_to_values
+
+    def check(value):
+        if type(value) is str and value in choices:
+            return choices[value]
+        return field.run_validation(value)
+
+    return check
+
+
+def compile_boolean(field):
+    def check(value):
+        if value is True or value is False:
+            return value
+        return field.run_validation(value)
+
+    return check
+
+
+def compile_integer(field):
+    def check(value):
+        if type(value) is int:
+            if field.validators:
+                field.run_validators(value)
+            return value
+        return field.run_validation(value)
+
+    return check
+
+
+def compile_hash(field):
+    regex = field.regex
+
+    def check(value):
+        if type(value) is str and regex.match(value):
+            return uuid.UUID(hex=value)
+        return field.run_validation(value)
+
+    return check
+
+
+# Checks of the most common fields types, on a plain value that is neither missing nor null
+COMPILERS = {
+    serializers.CharField: compile_char,
+    serializers.ChoiceField: compile_choice,
+    serializers.BooleanField: compile_boolean,
+    serializers.IntegerField: compile_integer,
+    IssueHashField: compile_hash,
+}
+
+
+@cache
+def compile_issue_schema():
+    """
+    Build the checks of an issue payload from the fields of the DRF serializer,
+    so that both always accept the same values and return the same errors
+    Other fields types are validated through DRF
+    """
+    serializer = SingleIssueBulkSerializer()
+    schema = []
+    for field in serializer._writable_fields:
+        assert len(field.source_attrs) == 1, "Nested sources are not supported"
+        assert field.default is empty, "Default values are not supported"
+        compiler = COMPILERS.get(type(field))
+        check = compiler(field) if compiler is not None else field.run_validation
+        schema.append(
+            (
+                field.field_name,
+                field.source,
+                field.required,
+                field.allow_null,
+                check,
+                field.error_messages,
+            )
+        )
+    return serializer, schema
+
+
+def validate_issue(data):
+    """
+    Validate a single issue payload, returning its values by source
+    Raises a ValidationError with all the fields errors
+    """
+    serializer, schema = compile_issue_schema()
+    if data is None:
+        raise ValidationError(
+            [ErrorDetail(serializer.error_messages["null"], code="null")]
+        )
+    if not isinstance(data, dict):
+        message = serializer.error_messages["invalid"].format(
+            datatype=type(data).__name__
+        )
+        raise ValidationError(
+            {api_settings.NON_FIELD_ERRORS_KEY: [message]}, code="invalid"
+        )
+
+    values, errors = {}, {}
+    for name, source, required, allow_null, check, messages in schema:
+        value = data.get(name, empty)
+        if value is empty:
+            if required:
+                errors[name] = [ErrorDetail(messages["required"], code="required")]
+            continue
+        if value is None:
+            if allow_null:
+                values[source] = None
+            else:
+                errors[name] = [ErrorDetail(messages["null"], code="null")]
+            continue
+        try:
+            values[source] = check(value)
+        except ValidationError as e:
+            errors[name] = e.detail
+
+    if errors:
+        raise ValidationError(errors)
+    return values
+
+
+def validate_issues_bulk(serializer, data):
+    """
+    Validate the payload of a bulk creation of issues, without going through
+    the DRF machinery for each issue. The serializer is only used for the diff
+    and for unexpected payloads structures, so errors have the same format
+    """
+    if type(data) is not dict or type(data.get("issues")) is not list:
+        serializer = type(serializer)(data=data, context=serializer.context)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data
+
+    validated_data, errors = {}, {}
+    if "diff_id" in data:
+        try:
+            validated_data["diff_id"] = serializer.fields["diff_id"].run_validation(
+                data["diff_id"]
+            )
+        except ValidationError as e:
+            errors["diff_id"] = e.detail
+
+    issues, issues_errors = [], []
+    for issue in data["issues"]:
+        try:
+            issues.append(validate_issue(issue))
+            issues_errors.append({})
+        except ValidationError as e:
+            issues_errors.append(e.detail)
+    if any(issues_errors):
+        errors["issues"] = issues_errors
+    validated_data["issues"] = issues
+
+    if errors:
+        raise ValidationError(errors)
+    return validated_data
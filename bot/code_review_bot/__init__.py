@@ -4,17 +4,15 @@
 
 import abc
 import enum
-import hashlib
 import json
 import os
 from functools import cached_property
 
-import requests
 import structlog
 from libmozdata.phabricator import LintResult, UnitResult, UnitResultState
 from taskcluster.helper import TaskclusterConfig
 
-from code_review_bot.config import settings
+from code_review_bot.hashing import build_hash
 from code_review_bot.stats import InfluxDb
 from code_review_bot.tasks.base import AnalysisTask
 
@@ -164,8 +162,12 @@ class Issue(abc.ABC):
         # Fallback to in_patch detection
         return self.in_patch
 
-    @property
+    @cached_property
     def in_patch(self):
+        """
+        Check if the issue is in the patch of its revision and cache the resulting value
+        Values are set in batch by compute_in_patch before publishing the issues
+        """
         return self.revision.contains(self)
 
     @cached_property
@@ -182,73 +184,39 @@ class Issue(abc.ABC):
         # Build the hash only if the file is not autogenerated.
         # An autogenerated file resides in the build directory that it has the
         #  format `obj-x86_64-pc-linux-gnu`
-        file_content = None
-        if "/obj-" not in self.path:
-            if settings.mercurial_cache_checkout:
-                logger.debug("Using the local repository to build issue's hash")
-                try:
-                    with (settings.mercurial_cache_checkout / self.path).open() as f:
-                        file_content = f.read()
-                except (FileNotFoundError, IsADirectoryError):
-                    logger.warning(
-                        "Failed to find issue's related file", path=self.path
-                    )
-                    file_content = None
-            else:
-                try:
-                    # Load all the lines affected by the issue
-                    file_content = self.revision.load_file(self.path)
-                except ValueError:
-                    # Build the hash with an empty content in case the path is erroneous
-                    file_content = None
-                except requests.exceptions.HTTPError as e:
-                    if e.response.status_code == 404:
-                        logger.warning(
-                            "Failed to download a file with an issue", path=self.path
-                        )
-
-                        # We still build the hash with empty content
-                        file_content = None
-                    else:
-                        # When encountering another HTTP error, raise the issue
-                        raise
-
-        if file_content is None:
-            self._hash = None
-            return self._hash
-
-        # Build raw content:
-        # 1. lines affected by patch
-        # 2. without any spaces around each line
-        file_lines = file_content.splitlines()
+        if "/obj-" in self.path:
+            return None
+
+        start, count, fields, message = self.hash_job()
+        lines = self.revision.file_store.lines(self.path, start, count)
+        if lines is None:
+            return None
 
+        return build_hash(lines, fields, message)
+
+    def hash_job(self):
+        """
+        Describe the data used to build the hash, excluding the file content:
+        * the range of affected lines, using a 0-based start (None for the full file)
+        * the identifying fields of the issue, excluding file position information (lines & char)
+        * the message
+        """
         if self.line is None or self.nb_lines is None:
             # Use full file when line is not specified
-            lines = file_lines
-
+            start, count = None, None
         else:
-            # Use a range of lines
-            start = self.line - 1  # file_lines start at 0, not 1
-            lines = file_lines[start : start + self.nb_lines]
-        raw_content = "\n".join([line.strip() for line in lines])
+            # Use a range of lines (file lines start at 0, not 1)
+            start, count = self.line - 1, self.nb_lines
 
-        # Build hash payload using issue data
-        # excluding file position information (lines & char)
         extras = json.dumps(self.build_extra_identifiers(), sort_keys=True)
-        payload = ":".join(
-            [
-                self.analyzer.name,
-                self.path,
-                self.level.value,
-                self.check,
-                extras,
-                raw_content,
-                self.message,
-            ]
-        ).encode("utf-8")
-
-        # Finally build the MD5 hash
-        return hashlib.md5(payload).hexdigest()
+        fields = [
+            self.analyzer.name,
+            self.path,
+            self.level.value,
+            self.check,
+            extras,
+        ]
+        return start, count, fields, self.message
 
     @abc.abstractmethod
     def validates(self):
@@ -4,11 +4,12 @@
 
 import urllib.parse
 
-import requests
 import structlog
 
-from code_review_bot import taskcluster
-from code_review_bot.config import GetAppUserAgent, settings
+from code_review_bot import stats, taskcluster
+from code_review_bot.config import settings
+from code_review_bot.hashing import compute_hashes
+from code_review_bot.http_client import http
 from code_review_bot.tasks.lint import MozLintIssue
 
 logger = structlog.get_logger(__name__)
@@ -76,8 +77,8 @@ class BackendAPI:
         revision_url = "/v1/revision/"
         auth = (self.username, self.password)
         url_post = urllib.parse.urljoin(self.url, revision_url)
-        response = requests.post(
-            url_post, headers=GetAppUserAgent(), json=data, auth=auth
+        response = http.post(
+            url_post, endpoint="backend.revision", json=data, auth=auth
         )
         if not response.ok:
             logger.warn(f"Backend rejected the payload: {response.content}")
@@ -99,7 +100,9 @@ class BackendAPI:
             "mercurial_hash": revision.head_changeset,
             "repository": revision.head_repository,
         }
-        backend_diff = self.create(backend_revision["diffs_url"], data)
+        backend_diff = self.create(
+            backend_revision["diffs_url"], data, endpoint="backend.diff"
+        )
 
         # If we are dealing with a None `backend_revision` bail out
         if backend_diff is None:
@@ -120,6 +123,10 @@ class BackendAPI:
             revision.issues_url is not None
         ), "Missing issues_url on the revision to publish issues in bulk."
 
+        # Build all the hashes at once, instead of lazily for each issue
+        with stats.timer("runtime.hashes"):
+            compute_hashes(issues)
+
         logger.info(f"Publishing issues in bulk of {settings.bulk_issue_chunks} items.")
         chunks = (
             issues[i : i + settings.bulk_issue_chunks]
@@ -158,6 +165,10 @@ class BackendAPI:
             response = self.create(
                 revision.issues_url,
                 {"issues": [json_data for _, json_data in valid_data]},
+                endpoint="backend.issues",
+                compress=True,
+                # Only the hash and publication status are used from the output
+                params={"fields": "hash,publishable"},
             )
             if response is None:
                 # Backend rejected the payload, nothing more to do.
@@ -185,9 +196,11 @@ class BackendAPI:
         """
         List issues for a given diff
         """
-        return list(self.paginate(f"/v1/diff/{diff_id}/issues/"))
+        return list(
+            self.paginate(f"/v1/diff/{diff_id}/issues/", endpoint="backend.diff.issues")
+        )
 
-    def paginate(self, url_path):
+    def paginate(self, url_path, endpoint="backend"):
         """
         Yield results from a paginated API one by one
         """
@@ -196,16 +209,17 @@ class BackendAPI:
 
         # Iterate until there is no page left or a status error happen
         while next_url:
-            resp = requests.get(next_url, auth=auth, headers=GetAppUserAgent())
+            resp = http.get(next_url, endpoint=endpoint, auth=auth)
             resp.raise_for_status()
             data = resp.json()
             yield from data.get("results", [])
             next_url = data.get("next")
 
-    def create(self, url_path, data):
+    def create(self, url_path, data, endpoint="backend", compress=False, params=None):
         """
         Make an authenticated POST request on the backend
         Check that the requested item does not already exists on the backend
+        The payload is sent as a gzip body when compress is set
         """
         assert self.enabled is True, "Backend API is not enabled"
         assert url_path.endswith("/")
@@ -214,15 +228,20 @@ class BackendAPI:
         if "id" in data:
             # Check that the item does not already exists
             url_get = urllib.parse.urljoin(self.url, f"{url_path}{data['id']}/")
-            response = requests.get(url_get, auth=auth, headers=GetAppUserAgent())
+            response = http.get(url_get, endpoint=endpoint, auth=auth)
             if response.ok:
                 logger.info("Found existing item on backend", url=url_get)
                 return response.json()
 
         # Create the requested item
         url_post = urllib.parse.urljoin(self.url, url_path)
-        response = requests.post(
-            url_post, headers=GetAppUserAgent(), json=data, auth=auth
+        response = http.post(
+            url_post,
+            endpoint=endpoint,
+            compress=compress,
+            params=params,
+            json=data,
+            auth=auth,
         )
         if not response.ok:
             logger.warn(f"Backend rejected the payload: {response.content}")
@@ -249,5 +268,41 @@ class BackendAPI:
             if value is not None
         }
         return list(
-            self.paginate(f"/v1/issues/{repo_slug}/?{urllib.parse.urlencode(params)}")
+            self.paginate(
+                f"/v1/issues/{repo_slug}/?{urllib.parse.urlencode(params)}",
+                endpoint="backend.repo.issues",
+            )
         )
+
+    def list_known_issues(self, repo_slug, paths, date=None, revision_changeset=None):
+        """
+        List the hashes of known issues for many paths of a repository,
+        using as few requests as possible.
+        Optional `date` and `revision_changeset` parameters are used as in `list_repo_issues`.
+        Returns a dict mapping each path to its set of known hashes.
+        """
+        assert self.enabled is True, "Backend API is not enabled"
+        auth = (self.username, self.password)
+        url_post = urllib.parse.urljoin(self.url, f"/v1/issues/{repo_slug}/")
+        filters = {
+            key: value
+            for key, value in (
+                ("date", date),
+                ("revision_changeset", revision_changeset),
+            )
+            if value is not None
+        }
+
+        paths = sorted(set(paths))
+        known = {path: set() for path in paths}
+        for i in range(0, len(paths), settings.known_issues_chunks):
+            data = {"paths": paths[i : i + settings.known_issues_chunks], **filters}
+            response = http.post(
+                url_post, endpoint="backend.repo.issues", json=data, auth=auth
+            )
+            response.raise_for_status()
+            for path, hashes in response.json()["paths"].items():
+                known.setdefault(path, set()).update(hashes)
+
+        logger.info("Listed known issues on backend", paths=len(paths))
+        return known
@@ -0,0 +1,207 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import array
+import collections
+import gzip
+import hashlib
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+import structlog
+
+logger = structlog.get_logger(__name__)
+
+# Default maximum size of the artifacts cache on disk, in bytes
+DEFAULT_CACHE_SIZE = 2 * 1024**3
+
+# Default maximum size of the files kept in memory to build issues hashes, in characters
+DEFAULT_FILE_STORE_SIZE = 256 * 1024**2
+
+
+class ArtifactCache:
+    """
+    Local cache of Taskcluster artifacts, compressed on disk
+    Artifacts of finished tasks are immutable, so entries are never invalidated:
+    the least recently used ones are removed once the cache exceeds its maximum size
+    The size of the cache is tracked as entries are stored, and only computed
+    again from the disk when evicting entries
+    """
+
+    def __init__(self, root, max_size=DEFAULT_CACHE_SIZE):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        assert max_size > 0, "Artifacts cache size must be positive"
+        self.max_size = max_size
+        self.size = sum(size for _, size, _ in self.entries())
+        logger.info(
+            "Using artifacts cache", path=self.root, max_size=max_size, size=self.size
+        )
+
+    def path(self, task_id, run_id, artifact_name):
+        """
+        Build the path of an artifact in the cache, from a hash of its identifiers
+        """
+        key = hashlib.sha256(f"{task_id}/{run_id}/{artifact_name}".encode()).hexdigest()
+        return self.root / key[:2] / f"{key}.gz"
+
+    def open(self, task_id, run_id, artifact_name):
+        """
+        Open a cached artifact as a binary file object, or return None when missing
+        """
+        path = self.path(task_id, run_id, artifact_name)
+        try:
+            # The modification time is used to track the last access
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+
+        logger.info(
+            "Using cached artifact",
+            task_id=task_id,
+            run_id=run_id,
+            artifact=artifact_name,
+        )
+        return gzip.open(path, "rb")
+
+    def store(self, task_id, run_id, artifact_name, fileobj):
+        """
+        Store an artifact from a binary file object, then evict old entries
+        Returns the stored artifact as a binary file object: it is opened before
+        any eviction, so it stays readable even when the entry is removed afterwards
+        """
+        path = self.path(task_id, run_id, artifact_name)
+        path.parent.mkdir(exist_ok=True)
+
+        # Write in a temporary file first, so concurrent readers never see a partial artifact
+        with tempfile.NamedTemporaryFile(dir=path.parent, delete=False) as tmp:
+            try:
+                with gzip.open(tmp, "wb") as output:
+                    shutil.copyfileobj(fileobj, output)
+            except Exception:
+                os.unlink(tmp.name)
+                raise
+        stored = gzip.open(tmp.name, "rb")
+        self.size += os.path.getsize(tmp.name)
+        try:
+            self.size -= path.stat().st_size
+        except FileNotFoundError:
+            pass
+        os.replace(tmp.name, path)
+
+        # The new entry is kept even when it exceeds the maximum size on its own
+        if self.size > self.max_size:
+            self.evict(keep=path)
+        return stored
+
+    def entries(self):
+        """
+        List the cached artifacts with their last access time and size on disk
+        """
+        entries = []
+        for path in self.root.glob("*/*.gz"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def evict(self, keep=None):
+        """
+        Remove the least recently used artifacts until the cache fits in its maximum size
+        The entry at the `keep` path is never removed
+        """
+        # Entries may also be stored or removed by other processes sharing the cache
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_size:
+                break
+            if path == keep:
+                continue
+            logger.debug("Evicting cached artifact", path=path)
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            total -= size
+        self.size = total
+
+
+class FileStore:
+    """
+    Bounded in-memory cache of files content, used to build the issues hashes
+    Each file is loaded once, along with the offsets of its lines, so
+    any range of lines can be served without splitting the whole content again
+    Least recently used files are dropped once the cache exceeds its maximum size
+    """
+
+    def __init__(self, loader, max_size=DEFAULT_FILE_STORE_SIZE):
+        # The loader returns the content of a file from its path, or None
+        self.loader = loader
+        self.max_size = max_size
+        self.size = 0
+        self.files = collections.OrderedDict()
+
+    def load(self, path):
+        """
+        Load a file content and its lines offsets, using the cache first
+        """
+        if path in self.files:
+            self.files.move_to_end(path)
+            return self.files[path]
+
+        content = self.loader(path)
+        if content is None:
+            entry = (None, None)
+        else:
+            # Offsets of the lines starts, plus the end of the content
+            offsets = array.array("Q", [0])
+            position = 0
+            for line in content.splitlines(keepends=True):
+                position += len(line)
+                offsets.append(position)
+            entry = (content, offsets)
+
+        self.files[path] = entry
+        self.size += self.entry_size(entry)
+        while self.size > self.max_size and self.files:
+            _, evicted = self.files.popitem(last=False)
+            self.size -= self.entry_size(evicted)
+
+        return entry
+
+    @staticmethod
+    def entry_size(entry):
+        content, offsets = entry
+        if content is None:
+            return 0
+        return len(content) + offsets.itemsize * len(offsets)
+
+    @staticmethod
+    def slice_lines(content, offsets, start=None, count=None):
+        """
+        List the lines of a file content using its lines offsets, starting at a 0-based index
+        Returns all the lines when no start is specified
+        """
+        if start is None:
+            return content.splitlines()
+
+        nb_lines = len(offsets) - 1
+        end = nb_lines if count is None else min(start + count, nb_lines)
+        start = min(start, nb_lines)
+        return content[offsets[start] : offsets[max(start, end)]].splitlines()
+
+    def lines(self, path, start=None, count=None):
+        """
+        List the lines of a file, starting at a 0-based index
+        Returns all the lines when no start is specified, or None when the file is not available
+        """
+        content, offsets = self.load(path)
+        if content is None:
+            return None
+        return self.slice_lines(content, offsets, start, count)
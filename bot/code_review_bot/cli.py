@@ -58,6 +58,12 @@ def parse_cli():
         type=Path,
         default=None,
     )
+    parser.add_argument(
+        "--artifacts-cache",
+        help="Optional path to a persistent directory caching Taskcluster artifacts between runs.",
+        type=Path,
+        default=None,
+    )
     parser.add_argument("--taskcluster-client-id", help="Taskcluster Client ID")
     parser.add_argument("--taskcluster-access-token", help="Taskcluster Access token")
     return parser.parse_args()
@@ -110,6 +116,7 @@ def main():
         taskcluster.secrets["repositories"],
         taskcluster.secrets["ssh_key"],
         args.mercurial_repository,
+        args.artifacts_cache,
     )
 
     # Setup statistics
@@ -14,6 +14,12 @@ from pathlib import Path
 import pkg_resources
 import structlog
 
+from code_review_bot.cache import (
+    DEFAULT_CACHE_SIZE,
+    DEFAULT_FILE_STORE_SIZE,
+    ArtifactCache,
+)
+
 REPO_MOZILLA_CENTRAL = "https://hg.mozilla.org/mozilla-central"
 REPO_AUTOLAND = "https://hg.mozilla.org/integration/autoland"
 
@@ -54,12 +60,39 @@ class Settings:
         # Max number of issues published to the backend at a time during the ingestion of a revision
         self.bulk_issue_chunks = 100
 
+        # Max number of paths sent to the backend at a time when looking for known issues
+        self.known_issues_chunks = 500
+
+        # Max number of Taskcluster tasks whose artifacts are loaded & parsed in parallel
+        self.analysis_workers = 8
+
+        # Parse supported JSON artifacts as a stream of issues, to reduce memory usage
+        self.stream_artifacts = False
+
+        # Max number of retries of idempotent HTTP requests on transient errors
+        self.http_retries = 3
+
+        # Max number of connections kept alive for each remote host
+        self.http_pool_size = 10
+
         # Cache to store file-by-file from HGMO Rest API
         self.hgmo_cache = tempfile.mkdtemp(suffix="hgmo")
 
+        # Max number of files downloaded in parallel from HGMO
+        self.hgmo_workers = 8
+
         # Cache to store whole repositories
         self.mercurial_cache = None
 
+        # Cache to store Taskcluster artifacts across runs
+        self.artifacts_cache = None
+
+        # Max size of the files content kept in memory to build issues hashes
+        self.file_store_size = DEFAULT_FILE_STORE_SIZE
+
+        # Number of processes used to build issues hashes in batch
+        self.hash_workers = os.cpu_count() or 1
+
         # SSH Key used to push on try
         self.ssh_key = None
 
@@ -79,6 +112,7 @@ class Settings:
         repositories,
         ssh_key=None,
         mercurial_cache=None,
+        artifacts_cache=None,
     ):
         # Detect source from env
         if "TRY_TASK_ID" in os.environ and "TRY_TASK_GROUP_ID" in os.environ:
@@ -114,6 +148,27 @@ class Settings:
         if "BULK_ISSUE_CHUNKS" in os.environ:
             self.bulk_issue_chunks = int(os.environ["BULK_ISSUE_CHUNKS"])
 
+        if "KNOWN_ISSUES_CHUNKS" in os.environ:
+            self.known_issues_chunks = int(os.environ["KNOWN_ISSUES_CHUNKS"])
+
+        if "ANALYSIS_WORKERS" in os.environ:
+            self.analysis_workers = int(os.environ["ANALYSIS_WORKERS"])
+
+        if "FILE_STORE_SIZE" in os.environ:
+            self.file_store_size = int(os.environ["FILE_STORE_SIZE"])
+
+        if "HGMO_WORKERS" in os.environ:
+            self.hgmo_workers = int(os.environ["HGMO_WORKERS"])
+
+        if "HTTP_RETRIES" in os.environ:
+            self.http_retries = int(os.environ["HTTP_RETRIES"])
+
+        if "HASH_WORKERS" in os.environ:
+            self.hash_workers = int(os.environ["HASH_WORKERS"])
+
+        if "STREAM_ARTIFACTS" in os.environ:
+            self.stream_artifacts = os.environ["STREAM_ARTIFACTS"] == "1"
+
         # Save allowed paths
         assert isinstance(allowed_paths, list)
         assert all(map(lambda p: isinstance(p, str), allowed_paths))
@@ -151,6 +206,15 @@ class Settings:
             # Save ssh key when mercurial cache is enabled
             self.ssh_key = ssh_key
 
+        # Setup artifacts cache
+        if artifacts_cache is not None:
+            self.artifacts_cache = ArtifactCache(
+                artifacts_cache,
+                max_size=int(
+                    os.environ.get("ARTIFACTS_CACHE_SIZE", DEFAULT_CACHE_SIZE)
+                ),
+            )
+
     def load_user_blacklist(self, usernames, phabricator_api):
         """
         Load all black listed users from Phabricator API
@@ -0,0 +1,149 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import hashlib
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import structlog
+
+from code_review_bot.cache import FileStore
+from code_review_bot.config import settings
+
+logger = structlog.get_logger(__name__)
+
+# Below that number of issues, hashes are computed in the current process
+HASH_BATCH_MIN = 500
+
+# Number of files submitted to each worker ahead of the hashes they return
+HASH_PENDING_FILES = 4
+
+
+def build_hash(lines, fields, message):
+    """
+    Build the MD5 hash of an issue from the lines it affects, its identifying fields and message
+    Lines are stripped, so that indentation does not change the hash
+    """
+    raw_content = "\n".join([line.strip() for line in lines])
+    payload = ":".join([*fields, raw_content, message]).encode("utf-8")
+    return hashlib.md5(payload).hexdigest()
+
+
+def hash_file_issues(content, offsets, jobs):
+    """
+    Build the hashes of all the issues of a single file
+    Each job is a tuple (start, count, fields, message), as used by FileStore.slice_lines
+    """
+    return [
+        build_hash(
+            FileStore.slice_lines(content, offsets, start, count), fields, message
+        )
+        for start, count, fields, message in jobs
+    ]
+
+
+def read_local_file(path):
+    """
+    Read a file from the local disk, or None when it is missing
+    """
+    try:
+        with open(path) as f:
+            return f.read()
+    except (FileNotFoundError, IsADirectoryError):
+        return None
+
+
+def hash_local_file_issues(path, jobs):
+    """
+    Build the hashes of all the issues of a file read from the local disk,
+    in a worker process. Its content is dropped once the hashes are built
+    Returns None when the file is not available
+    """
+    content, offsets = FileStore(read_local_file, max_size=0).load(path)
+    if content is None:
+        return None
+    return hash_file_issues(content, offsets, jobs)
+
+
+def set_hashes(issues, hashes):
+    """
+    Store the hashes built for issues, or None when their file is not available
+    """
+    for i, issue in enumerate(issues):
+        issue.hash = hashes[i] if hashes is not None else None
+
+
+def compute_hashes(issues):
+    """
+    Build the hashes of a list of issues in batch, grouped by path,
+    using a process pool for large batches.
+    Results are stored on the issues, as if their hash property was used.
+    """
+    # Check while avoiding circular dependencies
+    from code_review_bot import Issue
+
+    # Group issues without a cached hash by revision and path
+    groups = defaultdict(list)
+    for issue in issues:
+        if not isinstance(issue, Issue) or "hash" in issue.__dict__:
+            continue
+        groups[(issue.revision, issue.path)].append(issue)
+    if not groups:
+        return
+
+    # Download all the remote files at once
+    revisions = defaultdict(set)
+    for revision, path in groups:
+        revisions[revision].add(path)
+    for revision, paths in revisions.items():
+        revision.prefetch_files(paths)
+
+    nb_issues = sum(len(path_issues) for path_issues in groups.values())
+    if nb_issues < HASH_BATCH_MIN or settings.hash_workers <= 1:
+        # Files are loaded one at a time through the revision caches
+        for (revision, path), path_issues in groups.items():
+            content, offsets = (
+                revision.file_store.load(path) if "/obj-" not in path else (None, None)
+            )
+            set_hashes(
+                path_issues,
+                hash_file_issues(
+                    content, offsets, [issue.hash_job() for issue in path_issues]
+                )
+                if content is not None
+                else None,
+            )
+        return
+
+    logger.info(
+        "Building issues hashes in parallel",
+        nb=nb_issues,
+        files=len(groups),
+        workers=settings.hash_workers,
+    )
+    # Workers read the prefetched files from the disk, and only a few files
+    # are submitted ahead, so that no file content is sent between processes
+    max_pending = settings.hash_workers * HASH_PENDING_FILES
+    with ProcessPoolExecutor(max_workers=settings.hash_workers) as executor:
+        pending = {}
+        for (revision, path), path_issues in groups.items():
+            local_path = revision.local_file_path(path) if "/obj-" not in path else None
+            if local_path is None:
+                set_hashes(path_issues, None)
+                continue
+
+            if len(pending) >= max_pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    set_hashes(pending.pop(future), future.result())
+
+            future = executor.submit(
+                hash_local_file_issues,
+                local_path,
+                [issue.hash_job() for issue in path_issues],
+            )
+            pending[future] = path_issues
+
+        for future in wait(pending).done:
+            set_hashes(pending[future], future.result())
@@ -0,0 +1,139 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import atexit
+import collections
+import gzip
+import json
+import threading
+import time
+import urllib.parse
+
+import requests
+from urllib3.util.retry import Retry
+
+from code_review_bot import stats
+from code_review_bot.config import GetAppUserAgent, settings
+
+# Transient HTTP errors that are worth retrying
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class HTTPClient:
+    """
+    Shared HTTP client used by the bot to reach remote services
+    A session is kept for each host, so connections are reused across calls.
+    Idempotent requests are retried with a jittered backoff on transient errors,
+    and the time & bytes transferred are counted for each endpoint
+    """
+
+    def __init__(self):
+        self.sessions = {}
+        self.lock = threading.Lock()
+
+        # Counters per endpoint: number of requests, time spent, bytes sent & received
+        self.counters = collections.defaultdict(lambda: [0, 0.0, 0, 0])
+
+        # Exit handlers run in reverse order: the counters are reported
+        # before the stats module flushes its metrics
+        atexit.register(self.report)
+
+    def session(self, url):
+        """
+        Get or create the session used for the host of an url
+        """
+        parsed = urllib.parse.urlparse(url)
+        key = (parsed.scheme, parsed.netloc)
+        with self.lock:
+            if key in self.sessions:
+                return self.sessions[key]
+
+            retries = Retry(
+                total=settings.http_retries,
+                backoff_factor=0.5,
+                backoff_jitter=0.5,
+                status_forcelist=RETRY_STATUSES,
+                # Only idempotent methods are retried (urllib3 default)
+                allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+                raise_on_status=False,
+            )
+            adapter = requests.adapters.HTTPAdapter(
+                pool_connections=1,
+                pool_maxsize=settings.http_pool_size,
+                max_retries=retries,
+            )
+            session = requests.Session()
+            session.mount(f"{parsed.scheme}://", adapter)
+            session.headers["Accept-Encoding"] = "gzip"
+            self.sessions[key] = session
+            return session
+
+    def request(self, method, url, endpoint=None, compress=False, **kwargs):
+        """
+        Make an HTTP request through the session of the url's host
+        The endpoint is used to aggregate metrics, and defaults to the host
+        When compress is set, the JSON payload is sent as a gzip body
+        """
+        if endpoint is None:
+            endpoint = urllib.parse.urlparse(url).netloc
+
+        kwargs["headers"] = {**GetAppUserAgent(), **kwargs.get("headers", {})}
+        if compress and "json" in kwargs:
+            kwargs["data"] = gzip.compress(json.dumps(kwargs.pop("json")).encode())
+            kwargs["headers"].update(
+                {"Content-Type": "application/json", "Content-Encoding": "gzip"}
+            )
+
+        start = time.perf_counter()
+        response = self.session(url).request(method, url, **kwargs)
+        elapsed = time.perf_counter() - start
+
+        # Bytes received on the wire, before decompression. Streamed bodies
+        # are only read later by the caller, and are not counted
+        received = 0
+        if not kwargs.get("stream"):
+            length = response.headers.get("Content-Length")
+            received = int(length) if length else response.raw.tell()
+
+        body = response.request.body
+        with self.lock:
+            counters = self.counters[endpoint]
+            counters[0] += 1
+            counters[1] += elapsed
+            counters[2] += len(body) if body else 0
+            counters[3] += received
+
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def report(self):
+        """
+        Store the counters of every endpoint as metrics
+        """
+        with self.lock:
+            counters = dict(self.counters)
+            self.counters.clear()
+
+        for endpoint, (nb, elapsed, sent, received) in counters.items():
+            stats.add_metric("http.requests", nb, {"endpoint": endpoint})
+            stats.add_metric("http.time", elapsed, {"endpoint": endpoint})
+            stats.add_metric("http.bytes.sent", sent, {"endpoint": endpoint})
+            stats.add_metric("http.bytes.received", received, {"endpoint": endpoint})
+
+    def close(self):
+        """
+        Close all the sessions and their connections
+        """
+        with self.lock:
+            for session in self.sessions.values():
+                session.close()
+            self.sessions = {}
+
+
+http = HTTPClient()
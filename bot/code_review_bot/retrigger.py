@@ -2,17 +2,15 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
-import requests
-
 from code_review_bot import taskcluster
-from code_review_bot.config import GetAppUserAgent
+from code_review_bot.http_client import http
 
 TC_INDEX_URL = "https://firefox-ci-tc.services.mozilla.com/api/index/v1/tasks/project.relman.{}.code-review.phabricator"
 
 
 def list_tasks(env):
     url = TC_INDEX_URL.format(env)
-    resp = requests.get(url, headers=GetAppUserAgent())
+    resp = http.get(url, endpoint="taskcluster.index")
     resp.raise_for_status()
     return list(map(lambda t: t["data"], resp.json()["tasks"]))
 
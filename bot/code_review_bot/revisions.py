@@ -2,9 +2,13 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
+import bisect
+import collections
 import os
 import random
+import tempfile
 import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta
 from pathlib import Path
 
@@ -14,17 +18,36 @@ import structlog
 from libmozdata.phabricator import PhabricatorAPI
 
 from code_review_bot import Issue, stats, taskcluster
+from code_review_bot.cache import FileStore
 from code_review_bot.config import (
     REPO_AUTOLAND,
     REPO_MOZILLA_CENTRAL,
-    GetAppUserAgent,
     settings,
 )
+from code_review_bot.http_client import http
 from code_review_bot.tasks.base import AnalysisTask
 
 logger = structlog.get_logger(__name__)
 
 
+def compute_in_patch(issues):
+    """
+    Check which issues are in the patch of their revision, in batch by revision.
+    Results are stored on the issues, as if their in_patch property was used.
+    """
+    groups = collections.defaultdict(list)
+    for issue in issues:
+        if not isinstance(issue, Issue) or "in_patch" in issue.__dict__:
+            continue
+        groups[issue.revision].append(issue)
+
+    for revision, revision_issues in groups.items():
+        for issue, in_patch in zip(
+            revision_issues, revision.contains_issues(revision_issues)
+        ):
+            issue.in_patch = in_patch
+
+
 class ImprovementPatch:
     """
     An improvement patch built by the bot
@@ -130,6 +153,11 @@ class Revision:
         self.patch = patch
         self.files = []
         self.lines = {}
+        self.lines_index = {}
+
+        # Files content used to build issues hashes
+        self.file_store = FileStore(self.read_file, settings.file_store_size)
+        self.missing_files = set()
 
     @property
     def namespaces(self):
@@ -381,6 +409,10 @@ class Revision:
 
         self.lines = {stat["filename"]: stat["added_lines"] for stat in patch_stats}
 
+        # Index the modified lines of each file, to lookup issues with a binary search
+        for path in self.lines:
+            self.modified_lines(path)
+
         # Shortcut to files modified
         self.files = self.lines.keys()
 
@@ -390,6 +422,70 @@ class Revision:
             "analysis.lines", sum(len(line) for line in self.lines.values())
         )
 
+    def read_file(self, path):
+        """
+        Read a file content at current revision, from the local clone when available
+        or from remote HGMO. None is returned when the file cannot be found
+        """
+        if settings.mercurial_cache_checkout:
+            logger.debug("Using the local repository to read the file", path=path)
+            try:
+                with (settings.mercurial_cache_checkout / path).open() as f:
+                    return f.read()
+            except (FileNotFoundError, IsADirectoryError):
+                logger.warning("Failed to find issue's related file", path=path)
+                return None
+
+        if path in self.missing_files:
+            return None
+
+        try:
+            return self.load_file(path)
+        except ValueError:
+            # Build the hash with an empty content in case the path is erroneous
+            return None
+        except requests.exceptions.HTTPError as e:
+            if e.response.status_code == 404:
+                logger.warning("Failed to download a file with an issue", path=path)
+                self.missing_files.add(path)
+
+                # We still build the hash with empty content
+                return None
+
+            # When encountering another HTTP error, raise the issue
+            raise
+
+    def prefetch_files(self, paths):
+        """
+        Download concurrently files from remote HGMO into the local cache
+        """
+        if settings.mercurial_cache_checkout:
+            logger.debug("Local clone available, no need to prefetch files")
+            return
+
+        # Skip autogenerated files, as they are never read
+        paths = sorted(
+            {
+                path
+                for path in paths
+                if "/obj-" not in path
+                and path not in self.missing_files
+                and not os.path.exists(os.path.join(settings.hgmo_cache, path))
+            }
+        )
+        if not paths:
+            return
+        logger.info("Prefetching HGMO files", nb=len(paths))
+
+        def prefetch(path):
+            # Only the cached file is needed, its content is dropped
+            self.read_file(path)
+
+        with ThreadPoolExecutor(max_workers=settings.hgmo_workers) as executor:
+            # Consume the results to raise any unexpected error
+            for _ in executor.map(prefetch, paths):
+                pass
+
     def load_file(self, path):
         """
         Load a file content at current revision from remote HGMO
@@ -411,17 +507,35 @@ class Revision:
         )
         logger.info("Downloading HGMO file", url=url)
 
-        response = requests.get(url, headers=GetAppUserAgent())
+        response = http.get(url, endpoint="hgmo.raw-file")
         response.raise_for_status()
 
-        # Store in cache
+        # Store in cache, through a temporary file as other threads may read it
         content = response.content.decode("utf-8")
         os.makedirs(os.path.dirname(cache_path), exist_ok=True)
-        with open(cache_path, "w") as f:
+        with tempfile.NamedTemporaryFile(
+            "w", dir=os.path.dirname(cache_path), delete=False
+        ) as f:
             f.write(content)
+        os.replace(f.name, cache_path)
 
         return content
 
+    def local_file_path(self, path):
+        """
+        Path of a file on the local disk, in the local clone or in the HGMO cache
+        once prefetched. None is returned when the file is not available locally
+        """
+        if settings.mercurial_cache_checkout:
+            local_path = settings.mercurial_cache_checkout / path
+        else:
+            if path in self.missing_files:
+                return None
+            local_path = Path(settings.hgmo_cache) / path
+            if Path(settings.hgmo_cache) not in local_path.resolve().parents:
+                return None
+        return local_path if local_path.is_file() else None
+
     def has_file(self, path):
         """
         Check if the path is in this patch
@@ -429,6 +543,21 @@ class Revision:
         assert isinstance(path, str)
         return path in self.files
 
+    def modified_lines(self, path):
+        """
+        List the sorted modified lines of a file in this patch, or None when the file is not modified
+        The sorted lines are cached, as long as the lines of that path are not replaced
+        """
+        modified_lines = self.lines.get(path)
+        if modified_lines is None:
+            return None
+
+        cached = self.lines_index.get(path)
+        if cached is None or cached[0] is not modified_lines:
+            cached = (modified_lines, tuple(sorted(set(modified_lines))))
+            self.lines_index[path] = cached
+        return cached[1]
+
     def contains(self, issue):
         """
         Check if the issue (path+lines) is in this patch
@@ -436,7 +565,7 @@ class Revision:
         assert isinstance(issue, Issue)
 
         # Get modified lines for this issue
-        modified_lines = self.lines.get(issue.path)
+        modified_lines = self.modified_lines(issue.path)
         if modified_lines is None:
             return False
 
@@ -444,9 +573,52 @@ class Revision:
         if issue.line is None:
             return True
 
-        # Detect if this issue is in the patch
-        lines = set(range(issue.line, issue.line + issue.nb_lines))
-        return not lines.isdisjoint(modified_lines)
+        # Detect if the first modified line after the issue start is in the issue range
+        position = bisect.bisect_left(modified_lines, issue.line)
+        return (
+            position < len(modified_lines)
+            and modified_lines[position] < issue.line + issue.nb_lines
+        )
+
+    def contains_issues(self, issues):
+        """
+        Check which issues are in this patch, walking once through the modified lines of each file
+        Returns a list of booleans, following the issues order
+        """
+        output = [False] * len(issues)
+
+        # Group issues by path, sorted by their starting line
+        groups = collections.defaultdict(list)
+        for position, issue in enumerate(issues):
+            assert isinstance(issue, Issue)
+            groups[issue.path].append((position, issue))
+
+        for path, path_issues in groups.items():
+            modified_lines = self.modified_lines(path)
+            if modified_lines is None:
+                continue
+
+            current = 0
+            for position, issue in sorted(
+                path_issues, key=lambda item: item[1].line or 0
+            ):
+                # Empty line means full file
+                if issue.line is None:
+                    output[position] = True
+                    continue
+
+                # Skip modified lines before the issue start
+                while (
+                    current < len(modified_lines)
+                    and modified_lines[current] < issue.line
+                ):
+                    current += 1
+                output[position] = (
+                    current < len(modified_lines)
+                    and modified_lines[current] < issue.line + issue.nb_lines
+                )
+
+        return output
 
     @property
     def has_clang_files(self):
@@ -2,16 +2,117 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
+import io
+import json
 from abc import ABC, abstractmethod
+from collections.abc import Iterator
 
+import ijson
 import structlog
 import yaml
 
+from code_review_bot.config import settings
+
 logger = structlog.get_logger(__name__)
 
+# Name used to store the list of a task's artifacts in the local cache
+ARTIFACTS_LIST_KEY = "<artifacts>"
+
+
+def walk_records(data, pattern, key=None):
+    """
+    Yield (key, record) couples from a parsed JSON structure
+    The pattern lists the map keys and array items ("item") leading to each record,
+    "*" matches any map key and captures it as the record's key
+    A structure not following the pattern raises a ValueError, or a KeyError
+    when a map key of the pattern is missing
+    """
+    if not pattern:
+        yield key, data
+        return
+
+    step, *pattern = pattern
+    if step == "item":
+        if not isinstance(data, list):
+            raise ValueError(f"Expected an array of records, got {type(data).__name__}")
+        for item in data:
+            yield from walk_records(item, pattern, key)
+    elif not isinstance(data, dict):
+        raise ValueError(f"Expected a map of records, got {type(data).__name__}")
+    elif step == "*":
+        for item_key, item in data.items():
+            yield from walk_records(item, pattern, item_key)
+    else:
+        yield from walk_records(data[step], pattern, key)
+
+
+def stream_records(fileobj, pattern):
+    """
+    Yield (key, record) couples from a JSON stream, using the same pattern as walk_records
+    Only the record being built is held in memory
+    """
+    # Steps leading to the current value, and for each map on the pattern
+    # the key it must contain, until that key is found
+    location, required = [], []
+    builder, depth, key = None, 0, None
+    for event, value in ijson.basic_parse(fileobj, use_float=True):
+        if builder is not None:
+            # Build the current record until its container is closed
+            builder.event(event, value)
+            if event in ("start_map", "start_array"):
+                depth += 1
+            elif event in ("end_map", "end_array"):
+                depth -= 1
+            if depth == 0:
+                yield key, builder.value
+                builder = None
+            continue
+
+        if event in ("end_map", "end_array"):
+            location.pop()
+            missing = required.pop()
+            if missing is not None:
+                raise KeyError(missing)
+            continue
+        if event == "map_key":
+            location[-1] = value
+            if required[-1] == value:
+                required[-1] = None
+            continue
+
+        # A new value starts at the current location
+        on_pattern = len(location) <= len(pattern) and all(
+            step in ("*", position) for step, position in zip(pattern, location)
+        )
+        if on_pattern and len(location) == len(pattern):
+            key = location[pattern.index("*")] if "*" in pattern else None
+            if event in ("start_map", "start_array"):
+                builder = ijson.ObjectBuilder()
+                builder.event(event, value)
+                depth = 1
+            else:
+                yield key, value
+            continue
+
+        step = pattern[len(location)] if on_pattern else None
+        if step == "item" and event != "start_array":
+            raise ValueError(f"Expected an array of records, got {event}")
+        if step is not None and step != "item" and event != "start_map":
+            raise ValueError(f"Expected a map of records, got {event}")
+
+        if event == "start_map":
+            location.append(None)
+            required.append(step if step not in (None, "*") else None)
+        elif event == "start_array":
+            location.append("item")
+            required.append(None)
+
 
 class BaseTask:
     artifacts = []
+    # Location of the issues records in JSON artifacts, when streaming is supported
+    # See walk_records for the pattern format
+    records_pattern = None
     route = None
     valid_states = ("completed", "failed")
     skipped_states = ()
@@ -73,6 +174,13 @@ class BaseTask:
         return cls(task_id, task_status)
 
     def load_artifact(self, queue_service, artifact_name):
+        # Use the local cache when available, as artifacts of finished tasks never change
+        cache = settings.artifacts_cache
+        if cache is not None:
+            fileobj = cache.open(self.id, self.run_id, artifact_name)
+            if fileobj is not None:
+                return self.read_artifact(artifact_name, fileobj), False
+
         url = queue_service.buildUrl("getArtifact", self.id, self.run_id, artifact_name)
         # Allows HTTP_30x redirections retrieving the artifact
         response = queue_service.session.get(url, stream=True, allow_redirects=True)
@@ -89,15 +197,55 @@ class BaseTask:
             )
             return None, True
 
-        # Load artifact's data, either as JSON or YAML
-        if artifact_name.endswith(".json"):
-            content = response.json()
-        elif artifact_name.endswith(".yml") or artifact_name.endswith(".yaml"):
-            content = yaml.load_stream(response.text)
-        else:
-            # Json responses are automatically parsed into Python structures
-            content = response.content or None
-        return content, False
+        # Read the artifact as it is received, decompressing it when needed
+        response.raw.decode_content = True
+        if cache is None:
+            return self.read_artifact(artifact_name, response.raw), False
+
+        # The stored artifact is read back even if it has already been evicted
+        fileobj = cache.store(self.id, self.run_id, artifact_name, response.raw)
+        return self.read_artifact(artifact_name, fileobj), False
+
+    def list_artifacts(self, queue_service):
+        """
+        List the artifacts of the task's run, using the local cache when available
+        """
+        cache = settings.artifacts_cache
+        if cache is not None:
+            fileobj = cache.open(self.id, self.run_id, ARTIFACTS_LIST_KEY)
+            if fileobj is not None:
+                with fileobj:
+                    return json.load(fileobj)
+
+        artifacts = queue_service.listArtifacts(self.id, self.run_id)
+        if cache is not None:
+            cache.store(
+                self.id,
+                self.run_id,
+                ARTIFACTS_LIST_KEY,
+                io.BytesIO(json.dumps(artifacts).encode()),
+            ).close()
+        return artifacts
+
+    def read_artifact(self, artifact_name, fileobj):
+        """
+        Load artifact's data from a binary file object, either as JSON or YAML
+        """
+        if (
+            settings.stream_artifacts
+            and self.records_pattern is not None
+            and artifact_name.endswith(".json")
+        ):
+            # Yield issues records as they are read, without loading the full JSON
+            return stream_records(fileobj, self.records_pattern)
+
+        with fileobj:
+            if artifact_name.endswith(".json"):
+                return json.load(fileobj)
+            elif artifact_name.endswith(".yml") or artifact_name.endswith(".yaml"):
+                return yaml.load_stream(fileobj.read().decode("utf-8"))
+            else:
+                return fileobj.read() or None
 
     def load_artifacts(self, queue_service):
         # Process only the supported final states
@@ -144,6 +292,25 @@ class AnalysisTask(BaseTask, ABC):
         """
         return []
 
+    def iter_records(self, artifacts):
+        """
+        Yield (key, record) couples for every issue record in the artifacts
+        Supports both streamed and fully loaded artifacts
+        """
+        assert self.records_pattern is not None, f"No records pattern on {self}"
+        for artifact in artifacts.values():
+            if isinstance(artifact, Iterator):
+                yield from artifact
+            else:
+                yield from walk_records(artifact, self.records_pattern)
+
+    def parse_records(self, records, revision):
+        """
+        Tasks supporting artifacts streaming build their issues
+        from an iterator of (key, record) couples
+        """
+        raise NotImplementedError
+
     @abstractmethod
     def parse_issues(self, artifacts, revision):
         """
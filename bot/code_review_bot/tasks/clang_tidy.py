@@ -148,7 +148,7 @@ class ClangTidyIssue(Issue):
             location=f"{self.path}:{self.line}:{self.column}",
             reason=self.reason,
             check=self.check,
-            in_patch="yes" if self.revision.contains(self) else "no",
+            in_patch="yes" if self.in_patch else "no",
             publishable_check="yes" if self.has_publishable_check() else "no",
             publishable="yes" if self.is_publishable() else "no",
             expanded_macro="yes" if self.is_expanded_macro() else "no",
@@ -172,6 +172,7 @@ class ClangTidyTask(AnalysisTask):
     """
 
     artifacts = ["public/code-review/clang-tidy.json"]
+    records_pattern = ("files", "*", "warnings", "item")
 
     @property
     def display_name(self):
@@ -181,6 +182,9 @@ class ClangTidyTask(AnalysisTask):
         return "`./mach static-analysis check --outgoing` (C/C++)"
 
     def parse_issues(self, artifacts, revision):
+        return self.parse_records(self.iter_records(artifacts), revision)
+
+    def parse_records(self, records, revision):
         return [
             ClangTidyIssue(
                 analyzer=self,
@@ -197,7 +201,5 @@ class ClangTidyTask(AnalysisTask):
                 reason=warning.get("reason"),
                 publish=warning.get("publish"),
             )
-            for artifact in artifacts.values()
-            for path, items in artifact["files"].items()
-            for warning in items["warnings"]
+            for path, warning in records
         ]
@@ -83,7 +83,7 @@ class ExternalTidyIssue(ClangTidyIssue):
 
     def as_markdown_for_phab(self):
         # skip not in patch or not publishable
-        if not self.revision.contains(self) or not self.is_publishable():
+        if not self.in_patch or not self.is_publishable():
             return ""
 
         return ISSUE_MARKDOWN.format(
@@ -111,7 +111,7 @@ class ExternalTidyIssue(ClangTidyIssue):
             location=f"{self.path}:{self.line}:{self.column}",
             reason=self.reason,
             check=self.check,
-            in_patch="yes" if self.revision.contains(self) else "no",
+            in_patch="yes" if self.in_patch else "no",
             publishable_check="yes" if self.has_publishable_check() else "no",
             publishable="yes" if self.is_publishable() else "no",
             expanded_macro="yes" if self.is_expanded_macro() else "no",
@@ -146,7 +146,7 @@ class ExternalTidyTask(ClangTidyTask):
     def build_help_message(self, files):
         return BUILD_HELP_MSG
 
-    def parse_issues(self, artifacts, revision):
+    def parse_records(self, records, revision):
         issues = [
             ExternalTidyIssue(
                 analyzer=self,
@@ -164,8 +164,6 @@ class ExternalTidyTask(ClangTidyTask):
                 publish=warning.get("publish")
                 and warning["flag"].startswith("mozilla-civet-"),
             )
-            for artifact in artifacts.values()
-            for path, items in artifact["files"].items()
-            for warning in items["warnings"]
+            for path, warning in records
         ]
         return issues
@@ -55,12 +55,19 @@ class DefaultTask(AnalysisTask):
     """
 
     artifacts = ["public/code-review/issues.json"]
+    records_pattern = ("*", "item")
 
     def parse_issues(self, artifacts, revision):
         """
         Parse issues from a log file content
         """
         assert isinstance(artifacts, dict)
+        return self.parse_records(self.iter_records(artifacts), revision)
+
+    def parse_records(self, records, revision):
+        """
+        Parse issues from (path, issue) records
+        """
 
         def default_check(issue):
             # Use analyzer name when check is not provided
@@ -84,9 +91,7 @@ class DefaultTask(AnalysisTask):
                 check=default_check(issue),
                 message=issue["message"],
             )
-            for artifact in artifacts.values()
-            for _, path_issues in artifact.items()
-            for issue in path_issues
+            for _, issue in records
         ]
 
     @staticmethod
@@ -103,6 +103,7 @@ class MozLintTask(AnalysisTask):
     """
 
     artifacts = ["public/code-review/mozlint.json"]
+    records_pattern = ("*", "item")
 
     @property
     def linter(self):
@@ -127,6 +128,12 @@ class MozLintTask(AnalysisTask):
         Parse issues from a log file content
         """
         assert isinstance(artifacts, dict)
+        return self.parse_records(self.iter_records(artifacts), revision)
+
+    def parse_records(self, records, revision):
+        """
+        Parse issues from (path, issue) records
+        """
         return [
             MozLintIssue(
                 analyzer=self,
@@ -139,7 +146,5 @@ class MozLintTask(AnalysisTask):
                 message=issue["message"],
                 check=issue["rule"],
             )
-            for artifact in artifacts.values()
-            for _, path_issues in artifact.items()
-            for issue in path_issues
+            for _, issue in records
         ]
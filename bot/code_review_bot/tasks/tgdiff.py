@@ -2,6 +2,7 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
+import copy
 import os
 from urllib.parse import unquote
 
@@ -47,12 +48,17 @@ class TaskGraphDiffTask(NoticeTask):
             return
 
         logger.info("List artifacts", task_id=self.id)
-        orig_root_url = queue_service.options["rootUrl"]
+        # Make sure we avoid using the proxy URL.
+        # A shallow copy of the queue client is used, as other tasks may
+        # load their artifacts in parallel through the shared instance
+        queue_service = copy.copy(queue_service)
+        queue_service.options = {
+            **queue_service.options,
+            "rootUrl": tc_config.default_url,
+        }
         summary = None
         try:
-            # Make sure we avoid using the proxy URL.
-            queue_service.options["rootUrl"] = tc_config.default_url
-            for a in queue_service.listArtifacts(self.id, self.run_id)["artifacts"]:
+            for a in self.list_artifacts(queue_service)["artifacts"]:
                 if a["name"] == SUMMARY_ARTIFACT_PATH:
                     summary, _ = self.load_artifact(
                         queue_service, SUMMARY_ARTIFACT_PATH
@@ -73,8 +79,6 @@ class TaskGraphDiffTask(NoticeTask):
                 error=e,
             )
             return
-        finally:
-            queue_service.options["rootUrl"] = orig_root_url
 
         logger.info("Parsing the summary.json artifact if it exists", task_id=self.id)
         if summary is None:
@@ -4,8 +4,8 @@
 
 import asyncio
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from itertools import groupby
 
 import structlog
 from libmozdata.phabricator import BuildState, PhabricatorAPI
@@ -21,9 +21,10 @@ from code_review_bot.analysis import (
 )
 from code_review_bot.backend import BackendAPI
 from code_review_bot.config import REPO_AUTOLAND, REPO_MOZILLA_CENTRAL, settings
+from code_review_bot.hashing import compute_hashes
 from code_review_bot.mercurial import robust_checkout
 from code_review_bot.report.debug import DebugReporter
-from code_review_bot.revisions import Revision
+from code_review_bot.revisions import Revision, compute_in_patch
 from code_review_bot.tasks.base import AnalysisTask, BaseTask, NoticeTask
 from code_review_bot.tasks.clang_format import ClangFormatTask
 from code_review_bot.tasks.clang_tidy import ClangTidyTask
@@ -197,12 +198,20 @@ class Workflow:
             nb=len(supported_tasks),
         )
 
-        # Load all the artifacts and potential issues
-        issues = []
-        for task in supported_tasks:
+        def _load_issues(task):
             artifacts = task.load_artifacts(self.queue_service)
-            if artifacts is not None:
-                task_issues = task.parse_issues(artifacts, revision)
+            if artifacts is None:
+                return None
+            return task.parse_issues(artifacts, revision)
+
+        # Load all the artifacts and potential issues, in parallel
+        issues = []
+        with ThreadPoolExecutor(max_workers=settings.analysis_workers) as executor:
+            for task, task_issues in zip(
+                supported_tasks, executor.map(_load_issues, supported_tasks)
+            ):
+                if task_issues is None:
+                    continue
                 logger.info(
                     f"Found {len(task_issues)} issues",
                     task=task.name,
@@ -372,6 +381,9 @@ class Workflow:
             else:
                 patch.publish()
 
+        # Detect the issues in the patch at once, instead of lazily for each issue
+        compute_in_patch(issues)
+
         # Publish issues on backend to retrieve their comparison state
         publishable_issues = [i for i in issues if i.is_publishable()]
 
@@ -479,26 +491,26 @@ class Workflow:
 
         current_date = datetime.now().strftime("%Y-%m-%d")
 
-        # Group issues by path, so we only list know issues for the affected files
-        issues_groups = groupby(
-            sorted(issues, key=lambda i: i.path),
-            lambda i: i.path,
-        )
+        # Build all the hashes at once, instead of lazily for each issue
+        with stats.timer("runtime.hashes"):
+            compute_hashes(issues)
+
         logger.info(
             "Checking for existing issues in the backend",
             base_revision_changeset=base_rev_changeset,
         )
 
-        for path, group_issues in issues_groups:
-            known_issues = self.backend_api.list_repo_issues(
-                "mozilla-central",
-                date=current_date,
-                revision_changeset=base_rev_changeset,
-                path=path,
+        # Only list known issues for the affected files, in a few requests
+        known_issues = self.backend_api.list_known_issues(
+            "mozilla-central",
+            {issue.path for issue in issues},
+            date=current_date,
+            revision_changeset=base_rev_changeset,
+        )
+        for issue in issues:
+            issue.new_issue = bool(
+                issue.hash and issue.hash not in known_issues.get(issue.path, ())
             )
-            hashes = [issue["hash"] for issue in known_issues]
-            for issue in group_issues:
-                issue.new_issue = bool(issue.hash and issue.hash not in hashes)
 
     def find_issues(self, revision, group_id):
         """
@@ -549,67 +561,90 @@ class Workflow:
         if self.zero_coverage_enabled:
             dependencies.append(ZeroCoverageTask)
 
+        def _analyze(dep):
+            """
+            Build the task for a dependency, then load and parse its artifacts
+            This runs in a worker thread, so the revision and the shared outputs
+            are only updated afterwards, following the dependencies order
+            """
+            if isinstance(dep, type) and issubclass(dep, AnalysisTask):
+                # Build a class instance from its definition and route
+                task = dep.build_from_route(self.index_service, self.queue_service)
+            else:
+                # Use a task from its id & description
+                task = self.build_task(tasks[dep])
+            if task is None:
+                return None, None, [], [], None
+
+            task_issues, task_patches, notice = [], [], None
+            artifacts = task.load_artifacts(self.queue_service)
+            if artifacts is not None:
+                if isinstance(task, AnalysisTask):
+                    task_issues = task.parse_issues(artifacts, revision)
+                    task_patches = task.build_patches(artifacts)
+                elif isinstance(task, NoticeTask):
+                    notice = task.build_notice(artifacts, revision)
+
+            return task, artifacts, task_issues, task_patches, notice
+
         # Find issues and patches in dependencies
+        # Artifacts are downloaded and parsed in parallel, but results are
+        # processed in the dependencies order to keep a deterministic output
         issues = []
         task_failures = []
         notices = []
-        for dep in dependencies:
-            try:
-                if isinstance(dep, type) and issubclass(dep, AnalysisTask):
-                    # Build a class instance from its definition and route
-                    task = dep.build_from_route(self.index_service, self.queue_service)
-                else:
-                    # Use a task from its id & description
-                    task = self.build_task(tasks[dep])
-                if task is None:
+        task = None
+        with ThreadPoolExecutor(max_workers=settings.analysis_workers) as executor:
+            futures = [executor.submit(_analyze, dep) for dep in dependencies]
+            for future in futures:
+                try:
+                    task, artifacts, task_issues, task_patches, notice = future.result()
+                except Exception as e:
+                    logger.warn(
+                        "Failure during task analysis",
+                        task=settings.taskcluster.task_id,
+                        error=e,
+                    )
+                    # Do not start the analysis of remaining dependencies
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    raise
+
+                if task is None or artifacts is None:
                     continue
-                artifacts = task.load_artifacts(self.queue_service)
-                if artifacts is not None:
-                    task_issues, task_patches = [], []
-                    if isinstance(task, AnalysisTask):
-                        task_issues = task.parse_issues(artifacts, revision)
-                        logger.info(
-                            f"Found {len(task_issues)} issues",
-                            task=task.name,
-                            id=task.id,
-                        )
-                        stats.report_task(task, task_issues)
-                        issues += task_issues
-
-                        task_patches = task.build_patches(artifacts)
-                        for patch in task_patches:
-                            revision.add_improvement_patch(task, patch)
-
-                    elif isinstance(task, NoticeTask):
-                        notice = task.build_notice(artifacts, revision)
-                        if notice:
-                            notices.append(notice)
-
-                    # Report a problem when tasks in erroneous state are found
-                    # but no issue or patch has been processed by the bot
-                    if task.state == "failed" and not task_issues and not task_patches:
-                        # Skip task that are listed as ignorable (we try to avoid unnecessary spam)
-                        if task.name in self.task_failures_ignored:
-                            logger.warning(
-                                "Ignoring task failure as configured",
-                                task=task.name,
-                                id=task.id,
-                            )
-                            continue
 
+                if isinstance(task, AnalysisTask):
+                    logger.info(
+                        f"Found {len(task_issues)} issues",
+                        task=task.name,
+                        id=task.id,
+                    )
+                    stats.report_task(task, task_issues)
+                    issues += task_issues
+
+                    for patch in task_patches:
+                        revision.add_improvement_patch(task, patch)
+
+                elif notice:
+                    notices.append(notice)
+
+                # Report a problem when tasks in erroneous state are found
+                # but no issue or patch has been processed by the bot
+                if task.state == "failed" and not task_issues and not task_patches:
+                    # Skip task that are listed as ignorable (we try to avoid unnecessary spam)
+                    if task.name in self.task_failures_ignored:
                         logger.warning(
-                            "An erroneous task processed some artifacts and found no issues or patches",
+                            "Ignoring task failure as configured",
                             task=task.name,
                             id=task.id,
                         )
-                        task_failures.append(task)
-            except Exception as e:
-                logger.warn(
-                    "Failure during task analysis",
-                    task=settings.taskcluster.task_id,
-                    error=e,
-                )
-                raise
+                        continue
+
+                    logger.warning(
+                        "An erroneous task processed some artifacts and found no issues or patches",
+                        task=task.name,
+                        id=task.id,
+                    )
+                    task_failures.append(task)
 
         reviewers = (
             task.extra_reviewers_groups if task and isinstance(task, BaseTask) else []
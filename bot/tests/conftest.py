@@ -3,6 +3,8 @@
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
 import collections
+import gzip
+import io
 import json
 import os.path
 import re
@@ -360,6 +362,12 @@ class Response:
     def content(self):
         return self.body.encode()
 
+    @property
+    def raw(self):
+        if isinstance(self.body, str):
+            return io.BytesIO(self.content)
+        return io.BytesIO(json.dumps(self.body).encode())
+
     def json(self):
         return self.body
 
@@ -730,19 +738,32 @@ def mock_backend(mock_backend_secret):
 
     def post_issues_bulk(request):
         """Create issues in bulk on a revision"""
-        payload = json.loads(request.body)
+        # The bulk payload is always compressed
+        assert request.headers["Content-Encoding"] == "gzip"
+        payload = json.loads(gzip.decompress(request.body))
 
         assert GetAppUserAgent()["user-agent"] == request.headers["user-agent"]
 
         # Add a constant UUIDs for issues
+        url = urllib.parse.urlparse(request.url)
+        url_path = url._replace(query="").geturl()
         for index, issue in enumerate(payload["issues"]):
             issue["id"] = str(
                 uuid.uuid5(
-                    uuid.NAMESPACE_URL, request.url + str(index) + str(issue["hash"])
+                    uuid.NAMESPACE_URL, url_path + str(index) + str(issue["hash"])
                 )
             )
 
         issues.update({issue["id"]: issue for issue in payload["issues"]})
+
+        # Only output the requested fields
+        fields = urllib.parse.parse_qs(url.query).get("fields")
+        if fields:
+            fields = fields[0].split(",")
+            payload["issues"] = [
+                {field: issue.get(field) for field in fields}
+                for issue in payload["issues"]
+            ]
         return (201, {}, json.dumps(payload))
 
     # Revision
@@ -777,7 +798,7 @@ def mock_backend(mock_backend_secret):
     )
     responses.add_callback(
         responses.POST,
-        re.compile(rf"^http://{host}/v1/revision/(\d+)/issues/$"),
+        re.compile(rf"^http://{host}/v1/revision/(\d+)/issues/(\?.*)?$"),
         callback=post_issues_bulk,
     )
 
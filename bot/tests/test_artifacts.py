@@ -2,9 +2,18 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
+import io
+import json
+import os
+from collections.abc import Iterator
+
+import pytest
 from conftest import MockQueue
 
-from code_review_bot.tasks.base import AnalysisTask
+from code_review_bot import Reliability
+from code_review_bot.cache import ArtifactCache
+from code_review_bot.tasks.base import AnalysisTask, stream_records, walk_records
+from code_review_bot.tasks.clang_tidy import ClangTidyTask
 
 
 class TestTask(AnalysisTask):
@@ -61,3 +70,233 @@ def test_loading_artifacts(log):
     assert task.load_artifacts(queue) is None
     assert task.state == "completed"
     assert log.has("Skipping task", id="testTask", name="test-task", level="info")
+
+
+def test_streaming_artifacts(mock_config, mock_revision):
+    """
+    Test issues are parsed from a stream of records when enabled
+    """
+    task = ClangTidyTask(
+        "clangTidyTask",
+        {
+            "task": {"metadata": {"name": "source-test-clang-tidy"}},
+            "status": {"state": "completed", "runs": [{"runId": 0}]},
+        },
+    )
+    artifact = {
+        "files": {
+            f"dom/test-{i}.cpp": {
+                "hash": "deadbeef",
+                "warnings": [
+                    {
+                        "line": i,
+                        "column": 12,
+                        "flag": "checker.XXX",
+                        "message": f"Warning {i}.{j}",
+                        "reliability": "high",
+                        "publish": True,
+                    }
+                    for j in range(3)
+                ],
+            }
+            for i in range(1, 6)
+        },
+        "extra": [1, 2.5, {"files": {}}],
+    }
+    queue = MockQueue()
+    queue.configure(
+        {
+            "clangTidyTask": {
+                "artifacts": {"public/code-review/clang-tidy.json": artifact}
+            }
+        }
+    )
+
+    # Fully loaded artifact
+    mock_config.stream_artifacts = False
+    artifacts = task.load_artifacts(queue)
+    assert artifacts == {"public/code-review/clang-tidy.json": artifact}
+    expected = [
+        (issue.path, issue.line, issue.message)
+        for issue in task.parse_issues(artifacts, mock_revision)
+    ]
+    assert len(expected) == 15
+    assert expected[:2] == [
+        ("dom/test-1.cpp", 1, "Warning 1.0"),
+        ("dom/test-1.cpp", 1, "Warning 1.1"),
+    ]
+
+    # Streamed artifact
+    mock_config.stream_artifacts = True
+    try:
+        artifacts = task.load_artifacts(queue)
+    finally:
+        mock_config.stream_artifacts = False
+    assert isinstance(artifacts["public/code-review/clang-tidy.json"], Iterator)
+    issues = task.parse_issues(artifacts, mock_revision)
+    assert [(issue.path, issue.line, issue.message) for issue in issues] == expected
+    assert all(issue.reliability == Reliability.High for issue in issues)
+
+
+@pytest.mark.parametrize(
+    "pattern, records",
+    [
+        (
+            ("*", "item"),
+            [("a.py", {"line": 1}), ("a.py", {"line": 2}), ("b.py", {"line": 3})],
+        ),
+        (("*", "item", "line"), [("a.py", 1), ("a.py", 2), ("b.py", 3)]),
+        (("a.py", "item", "line"), [(None, 1), (None, 2)]),
+        (("b.py", "item"), [(None, {"line": 3})]),
+    ],
+)
+def test_records(pattern, records):
+    """
+    Test records are extracted the same way from parsed and streamed JSON
+    """
+    data = {"a.py": [{"line": 1}, {"line": 2}], "b.py": [{"line": 3}]}
+    assert list(walk_records(data, pattern)) == records
+    stream = io.BytesIO(json.dumps(data).encode())
+    assert list(stream_records(stream, pattern)) == records
+
+
+@pytest.mark.parametrize(
+    "pattern, error",
+    [
+        (("c.py", "item"), KeyError),
+        (("a.py", "item", "column"), KeyError),
+        (("*", "item", "line"), ValueError),
+        (("item",), ValueError),
+        (("b.py", "*"), ValueError),
+    ],
+)
+def test_records_malformed(pattern, error):
+    """
+    Test records not following the pattern raise an error, from parsed and streamed JSON
+    """
+    data = {"a.py": [{"line": 1}, 2], "b.py": [[3, 4]]}
+    with pytest.raises(error):
+        list(walk_records(data, pattern))
+    stream = io.BytesIO(json.dumps(data).encode())
+    with pytest.raises(error):
+        list(stream_records(stream, pattern))
+
+
+def test_artifacts_cache(mock_config, tmp_path):
+    """
+    Test artifacts are only downloaded once when the local cache is enabled
+    """
+    task = TestTask(
+        "testTask",
+        {
+            "task": {"metadata": {"name": "test-task"}},
+            "status": {"state": "completed", "runs": [{"runId": 0}]},
+        },
+    )
+    task.artifacts = ["test.txt", "test.json", "missing.txt"]
+    queue = MockQueue()
+    queue.configure(
+        {
+            "testTask": {
+                "artifacts": {"test.txt": "Hello World", "test.json": {"a": [1, 2]}}
+            }
+        }
+    )
+
+    mock_config.artifacts_cache = ArtifactCache(tmp_path)
+    try:
+        expected = {"test.txt": b"Hello World", "test.json": {"a": [1, 2]}}
+        assert task.load_artifacts(queue) == expected
+
+        # Remote artifacts are not used anymore
+        queue.session.reset()
+        assert task.load_artifacts(queue) == expected
+        assert len(list(tmp_path.glob("*/*.gz"))) == 2
+
+        # Another run is not cached
+        task.status["runs"].append({"runId": 1})
+        assert task.load_artifacts(queue) == {}
+    finally:
+        mock_config.artifacts_cache = None
+
+
+def test_artifacts_cache_eviction(tmp_path):
+    """
+    Test the least recently used artifacts are removed from the cache
+    """
+    cache = ArtifactCache(tmp_path)
+    for i in range(3):
+        cache.store("task", 0, f"artifact-{i}", io.BytesIO(os.urandom(60))).close()
+        path = cache.path("task", 0, f"artifact-{i}")
+        os.utime(path, (i, i))
+
+    # Only keep room for 2 artifacts
+    cache.max_size = 2 * path.stat().st_size
+
+    # Storing a new artifact removes the least recently used ones
+    cache.open("task", 0, "artifact-0").close()
+    cache.store("task", 0, "artifact-3", io.BytesIO(os.urandom(60))).close()
+    assert cache.open("task", 0, "artifact-1") is None
+    assert cache.open("task", 0, "artifact-2") is None
+    with cache.open("task", 0, "artifact-0") as f:
+        assert len(f.read()) == 60
+    with cache.open("task", 0, "artifact-3") as f:
+        assert len(f.read()) == 60
+
+
+def test_artifacts_cache_size(tmp_path):
+    """
+    Test the cache size is tracked without listing the cache on every store
+    """
+    ArtifactCache(tmp_path).store("task", 0, "artifact-0", io.BytesIO(b"a")).close()
+    cache = ArtifactCache(tmp_path)
+    assert cache.size == cache.path("task", 0, "artifact-0").stat().st_size
+
+    listed = []
+    entries = cache.entries
+    cache.entries = lambda: listed.append(True) or entries()
+    for i in range(3):
+        cache.store("task", 0, f"artifact-{i}", io.BytesIO(os.urandom(60))).close()
+    assert not listed
+    assert cache.size == sum(path.stat().st_size for path in tmp_path.glob("*/*.gz"))
+
+    # The cache is only listed once it exceeds its maximum size
+    cache.max_size = cache.size
+    cache.store("task", 0, "artifact-3", io.BytesIO(os.urandom(60))).close()
+    assert listed == [True]
+    assert cache.size == sum(path.stat().st_size for path in tmp_path.glob("*/*.gz"))
+    assert cache.size <= cache.max_size
+
+
+def test_artifacts_cache_too_small(mock_config, tmp_path):
+    """
+    Test artifacts larger than the whole cache are still loaded
+    """
+    task = TestTask(
+        "testTask",
+        {
+            "task": {"metadata": {"name": "test-task"}},
+            "status": {"state": "completed", "runs": [{"runId": 0}]},
+        },
+    )
+    task.artifacts = ["test.txt", "test.json"]
+    queue = MockQueue()
+    queue.configure(
+        {
+            "testTask": {
+                "artifacts": {"test.txt": "Hello World", "test.json": {"a": [1, 2]}}
+            }
+        }
+    )
+
+    mock_config.artifacts_cache = ArtifactCache(tmp_path, max_size=10)
+    try:
+        expected = {"test.txt": b"Hello World", "test.json": {"a": [1, 2]}}
+        assert task.load_artifacts(queue) == expected
+
+        # Only the last stored artifact is kept
+        assert len(list(tmp_path.glob("*/*.gz"))) == 1
+        with mock_config.artifacts_cache.open("testTask", 0, "test.json") as f:
+            assert json.load(f) == {"a": [1, 2]}
+    finally:
+        mock_config.artifacts_cache = None
@@ -5,6 +5,8 @@
 from unittest.mock import call, patch
 
 import pytest
+import responses
+from responses import matchers
 
 from code_review_bot.backend import BackendAPI
 from code_review_bot.tasks.clang_tidy import ClangTidyIssue
@@ -312,6 +314,13 @@ def test_publish_issues(
         },
     }
 
+    # Only the used fields are returned by the backend
+    assert issues[0].on_backend is None
+    assert [issue.on_backend for issue in issues[1:]] == [
+        {"hash": "18ff7d47ce8c3a11ea19a4e2b055fd06", "publishable": False},
+        {"hash": "ddf7ae1da14e80c488f99e4245e9ef79", "publishable": True},
+    ]
+
 
 @patch("code_review_bot.backend.logger")
 def test_publication_skips_rustfmt_dot_path(
@@ -384,3 +393,40 @@ def test_publication_skips_rustfmt_dot_path(
             issue="mock-clang-tidy issue clanck.checker@warning . line 57",
         ),
     ]
+
+
+def test_list_known_issues(mock_backend_secret, mock_config, monkeypatch):
+    """
+    Known issues are listed for many paths in chunks of POST requests
+    """
+    monkeypatch.setattr(mock_config, "known_issues_chunks", 2)
+    url = "http://code-review-backend.test/v1/issues/mozilla-central/"
+    responses.add(
+        responses.POST,
+        url,
+        match=[
+            matchers.json_params_matcher(
+                {"paths": ["a.cpp", "b.cpp"], "revision_changeset": "1" * 40}
+            )
+        ],
+        json={"paths": {"a.cpp": ["aaaa", "xxxx"], "b.cpp": []}},
+    )
+    responses.add(
+        responses.POST,
+        url,
+        match=[
+            matchers.json_params_matcher(
+                {"paths": ["c.cpp"], "revision_changeset": "1" * 40}
+            )
+        ],
+        json={"paths": {"c.cpp": ["cccc"]}},
+    )
+
+    r = BackendAPI()
+    known = r.list_known_issues(
+        "mozilla-central",
+        ["c.cpp", "a.cpp", "b.cpp", "a.cpp"],
+        revision_changeset="1" * 40,
+    )
+    assert known == {"a.cpp": {"aaaa", "xxxx"}, "b.cpp": set(), "c.cpp": {"cccc"}}
+    assert len(responses.calls) == 2
@@ -6,6 +6,8 @@ import hashlib
 
 import pytest
 
+from code_review_bot.cache import FileStore
+from code_review_bot.hashing import compute_hashes
 from code_review_bot.tasks.lint import MozLintIssue, MozLintTask
 
 
@@ -150,3 +152,88 @@ def test_incorrect_file_path_no_raise(mock_revision, path):
     a file with a path pointing outside the repository
     """
     assert mock_revision.load_file(path) is None
+
+
+def test_file_store():
+    """
+    Test files are loaded once and lines ranges match a full split of their content
+    """
+    files = {
+        "a.cpp": "first\r\n  second\nthird\rfourth\n\nsixth",
+        "b.cpp": "x" * 100,
+        "empty.cpp": "",
+    }
+    loaded = []
+
+    def _loader(path):
+        loaded.append(path)
+        return files.get(path)
+
+    store = FileStore(_loader, max_size=150)
+
+    lines = files["a.cpp"].splitlines()
+    for start in range(8):
+        for count in range(8):
+            assert store.lines("a.cpp", start, count) == lines[start : start + count]
+    assert store.lines("a.cpp") == lines
+    assert store.lines("empty.cpp", 0, 1) == []
+    assert store.lines("missing.cpp") is None
+    assert store.lines("missing.cpp", 0, 1) is None
+    assert loaded == ["a.cpp", "empty.cpp", "missing.cpp"]
+
+    # Loading a large file evicts the least recently used ones
+    assert store.lines("b.cpp", 0, 1) == ["x" * 100]
+    assert store.size <= 150
+    assert list(store.files.keys()) == ["empty.cpp", "missing.cpp", "b.cpp"]
+    assert store.lines("a.cpp", 1, 1) == ["  second"]
+    assert loaded == ["a.cpp", "empty.cpp", "missing.cpp", "b.cpp", "a.cpp"]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_compute_hashes(
+    mock_revision, mock_hgmo, mock_task, mock_config, monkeypatch, workers
+):
+    """
+    Test hashes built in batch are identical to the ones built by each issue
+    """
+    mock_revision.head_repository = "test-try"
+    mock_revision.head_changeset = "deadbeef1234"
+    task = mock_task(MozLintTask, "mock-analyzer-eslint")
+
+    def _build_issues():
+        return [
+            MozLintIssue(
+                task,
+                path,
+                42,
+                "error",
+                line,
+                "eslint",
+                f"Issue {i}",
+                "EXXX",
+                mock_revision,
+            )
+            for i, (path, line) in enumerate(
+                [
+                    ("path/to/file.cpp", 123),
+                    ("hello1", 2),
+                    ("path/to/file.cpp", 0),
+                    ("obj-x86_64/file.cpp", 2),
+                    ("dom/obj-x86_64/file.cpp", 2),
+                    ("hello1", 5000),
+                ]
+            )
+        ]
+
+    expected = [issue.hash for issue in _build_issues()]
+    assert expected[4] is None
+    assert all(expected[:4])
+
+    issues = _build_issues()
+    monkeypatch.setattr(mock_config, "hash_workers", workers)
+    monkeypatch.setattr("code_review_bot.hashing.HASH_BATCH_MIN", 0)
+    # Files are submitted to the workers as the previous ones are hashed
+    monkeypatch.setattr("code_review_bot.hashing.HASH_PENDING_FILES", 1)
+    compute_hashes(issues)
+    assert all("hash" in issue.__dict__ for issue in issues)
+    assert [issue.hash for issue in issues] == expected
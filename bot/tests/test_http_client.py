@@ -0,0 +1,124 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import gzip
+import json
+
+import responses
+from urllib3.util.retry import Retry
+
+from code_review_bot import stats
+from code_review_bot.config import GetAppUserAgent
+from code_review_bot.http_client import HTTPClient
+
+
+def test_session_per_host():
+    """
+    A single session is used for each host
+    """
+    client = HTTPClient()
+    session = client.session("https://hg.mozilla.org/mozilla-central/")
+    assert client.session("https://hg.mozilla.org/try/") is session
+    assert client.session("https://backend.test/v1/") is not session
+    assert session.headers["Accept-Encoding"] == "gzip"
+
+    client.close()
+    assert client.sessions == {}
+
+
+def test_retries(monkeypatch):
+    """
+    Idempotent requests are retried on transient errors, not the other ones
+    """
+    monkeypatch.setattr(Retry, "sleep", lambda *args, **kwargs: None)
+    responses.add(responses.GET, "https://backend.test/retry", status=503)
+    responses.add(responses.GET, "https://backend.test/retry", json={"ok": True})
+    responses.add(responses.POST, "https://backend.test/retry", status=503)
+
+    client = HTTPClient()
+    response = client.get("https://backend.test/retry")
+    assert response.ok
+    assert response.json() == {"ok": True}
+    assert response.request.headers["user-agent"] == GetAppUserAgent()["user-agent"]
+    assert len(responses.calls) == 2
+
+    response = client.post("https://backend.test/retry", json={})
+    assert response.status_code == 503
+    assert len(responses.calls) == 3
+
+
+def test_compress():
+    """
+    JSON payloads can be sent as gzip bodies
+    """
+    responses.add(responses.POST, "https://backend.test/issues/", json={})
+
+    client = HTTPClient()
+    client.post("https://backend.test/issues/", json={"issues": []}, compress=True)
+
+    request = responses.calls[0].request
+    assert request.headers["Content-Encoding"] == "gzip"
+    assert request.headers["Content-Type"] == "application/json"
+    assert json.loads(gzip.decompress(request.body)) == {"issues": []}
+
+
+def test_report():
+    """
+    Requests time and size are reported for each endpoint
+    """
+    responses.add(responses.GET, "https://backend.test/a", body="a" * 10)
+    responses.add(responses.POST, "https://backend.test/b", body="b" * 5)
+
+    stats.metrics = []
+    client = HTTPClient()
+    client.get("https://backend.test/a", endpoint="backend.a")
+    client.get("https://backend.test/a", endpoint="backend.a")
+    client.post("https://backend.test/b", data="payload")
+    client.report()
+
+    metrics = {
+        (metric["measurement"], metric["tags"]["endpoint"]): metric["fields"]["value"]
+        for metric in stats.metrics
+    }
+    assert metrics.pop(("code-review.http.time", "backend.a")) >= 0
+    assert metrics.pop(("code-review.http.time", "backend.test")) >= 0
+    assert metrics == {
+        ("code-review.http.requests", "backend.a"): 2,
+        ("code-review.http.bytes.sent", "backend.a"): 0,
+        ("code-review.http.bytes.received", "backend.a"): 20,
+        ("code-review.http.requests", "backend.test"): 1,
+        ("code-review.http.bytes.sent", "backend.test"): 7,
+        ("code-review.http.bytes.received", "backend.test"): 5,
+    }
+
+    # Counters are reset once reported
+    assert client.counters == {}
+
+
+def test_report_received_bytes():
+    """
+    Compressed bodies are counted as received, and streamed ones are not read
+    """
+    body = gzip.compress(b"a" * 100)
+    responses.add(
+        responses.GET,
+        "https://backend.test/compressed",
+        body=body,
+        headers={"Content-Encoding": "gzip"},
+    )
+    responses.add(responses.GET, "https://backend.test/stream", body="b" * 10)
+
+    stats.metrics = []
+    client = HTTPClient()
+    response = client.get("https://backend.test/compressed")
+    assert response.text == "a" * 100
+    response = client.get("https://backend.test/stream", stream=True)
+    assert not response._content_consumed
+    client.report()
+
+    metrics = {
+        metric["measurement"]: metric["fields"]["value"] for metric in stats.metrics
+    }
+    assert metrics["code-review.http.requests"] == 2
+    assert metrics["code-review.http.bytes.received"] == len(body)
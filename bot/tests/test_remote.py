@@ -686,3 +686,68 @@ def test_external_tidy_task(
     )
 
     assert mock_revision._state == BuildState.Pass
+
+
+def test_parallel_analysis_order(
+    mock_config, mock_revision, mock_workflow, mock_backend, bypass_publication_check
+):
+    """
+    Test that issues are returned in the dependencies order
+    even when artifacts are loaded in parallel
+    """
+    names = [f"analyzer-{i}" for i in range(20)]
+
+    def _task(name):
+        return {
+            "name": f"source-test-mozlint-{name}",
+            "artifacts": {
+                "public/code-review/mozlint.json": {
+                    "test.cpp": [
+                        {
+                            "path": "test.cpp",
+                            "lineno": 12,
+                            "column": 1,
+                            "level": "error",
+                            "linter": name,
+                            "rule": "XXX",
+                            "message": f"issue from {name}",
+                        }
+                    ]
+                }
+            },
+        }
+
+    mock_workflow.setup_mock_tasks(
+        {
+            "remoteTryTask": {"dependencies": list(reversed(names))},
+            **{name: _task(name) for name in names},
+        }
+    )
+    mock_config.analysis_workers = 4
+    issues = mock_workflow.run(mock_revision)
+    assert [issue.linter for issue in issues] == list(reversed(names))
+
+
+def test_parallel_analysis_failure(
+    mock_config, mock_revision, mock_workflow, mock_backend, bypass_publication_check
+):
+    """
+    Test that a failure in a single task analysis fails the whole workflow
+    """
+    mock_workflow.setup_mock_tasks(
+        {
+            "remoteTryTask": {"dependencies": ["analyzer-A", "analyzer-B"]},
+            "analyzer-A": {},
+            "analyzer-B": {
+                "name": "source-test-mozlint-flake8",
+                "artifacts": {
+                    "public/code-review/mozlint.json": {
+                        "test.cpp": [{"path": "test.cpp", "message": "missing data"}]
+                    }
+                },
+            },
+        }
+    )
+    with pytest.raises(KeyError) as e:
+        mock_workflow.run(mock_revision)
+    assert str(e.value) == "'column'"
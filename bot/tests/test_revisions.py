@@ -1,8 +1,15 @@
 # This Source Code Form is subject to the terms of the Mozilla Public
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
+import re
+
+import responses
 import rs_parsepatch
 
+from code_review_bot.config import GetAppUserAgent
+from code_review_bot.revisions import compute_in_patch
+from code_review_bot.tasks.default import DefaultIssue, DefaultTask
+
 
 def test_phabricator(mock_config, mock_revision):
     """
@@ -229,3 +236,76 @@ def test_revision_before_after(mock_config, mock_revision, mock_taskcluster_conf
     assert mock_revision.before_after_feature is True
     mock_revision.id = 42
     assert mock_revision.before_after_feature is False
+
+
+def test_prefetch_files(mock_config, mock_revision):
+    """
+    Test files are downloaded once from HGMO, missing ones being skipped
+    """
+    mock_revision.head_repository = "test-try"
+    mock_revision.head_changeset = "deadbeef1234"
+    requested = []
+
+    def fake_raw_file(request):
+        path = request.path_url.split("/", 4)[-1]
+        requested.append(path)
+        assert request.headers["user-agent"] == GetAppUserAgent()["user-agent"]
+        if path == "missing.cpp":
+            return (404, {}, "")
+        return (200, {}, f"Content of {path}")
+
+    responses.add_callback(
+        responses.GET,
+        re.compile(r"^https://hg\.mozilla\.org/test-try/raw-file/.*"),
+        callback=fake_raw_file,
+    )
+
+    paths = ["dom/a.cpp", "dom/b.cpp", "missing.cpp", "dom/obj-x86_64/c.cpp"]
+    mock_revision.prefetch_files(paths)
+    assert sorted(requested) == ["dom/a.cpp", "dom/b.cpp", "missing.cpp"]
+    assert mock_revision.missing_files == {"missing.cpp"}
+
+    # Files are now read from the cache
+    mock_revision.prefetch_files(paths)
+    assert mock_revision.read_file("dom/a.cpp") == "Content of dom/a.cpp"
+    assert mock_revision.read_file("missing.cpp") is None
+    assert len(requested) == 3
+
+
+def test_contains(mock_revision, mock_task):
+    """
+    Test issues lookup in the modified lines, one by one or in batch
+    """
+    mock_revision.lines = {
+        "dom/a.cpp": [12, 3, 8, 9, 40],
+        "dom/b.cpp": [],
+    }
+    task = mock_task(DefaultTask, "mock-analyzer")
+    issues = [
+        DefaultIssue(task, mock_revision, path, line, nb_lines, "check")
+        for path in ("dom/a.cpp", "dom/b.cpp", "dom/c.cpp")
+        for line in range(0, 45)
+        for nb_lines in (0, 1, 3)
+    ]
+
+    expected = [
+        issue.path in mock_revision.lines
+        and (
+            issue.line is None
+            or any(
+                line in mock_revision.lines[issue.path]
+                for line in range(issue.line, issue.line + issue.nb_lines)
+            )
+        )
+        for issue in issues
+    ]
+    assert sum(expected) == 24
+    assert [mock_revision.contains(issue) for issue in issues] == expected
+    assert mock_revision.contains_issues(issues) == expected
+    assert mock_revision.contains_issues(list(reversed(issues))) == list(
+        reversed(expected)
+    )
+
+    # Results are stored on the issues
+    compute_in_patch(issues)
+    assert [issue.__dict__["in_patch"] for issue in issues] == expected
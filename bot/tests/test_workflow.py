@@ -8,6 +8,7 @@ from unittest import mock
 
 import pytest
 import responses
+from responses import matchers
 
 from code_review_bot.config import Settings
 from code_review_bot.revisions import Revision
@@ -196,17 +197,14 @@ def test_before_after(mock_taskcluster_config, mock_workflow, mock_task, mock_re
 
     current_date = datetime.now().strftime("%Y-%m-%d")
     responses.add(
-        responses.GET,
-        f"https://backend.test/v1/issues/mozilla-central/?path=outside%2Fof%2Fthe%2Fpatch.cpp&date={current_date}",
-        json={
-            "count": 2,
-            "previous": None,
-            "next": None,
-            "results": [
-                {"id": "issue 1", "hash": "bbbb"},
-                {"id": "issue 42", "hash": "xxxx"},
-            ],
-        },
+        responses.POST,
+        "https://backend.test/v1/issues/mozilla-central/",
+        match=[
+            matchers.json_params_matcher(
+                {"paths": ["outside/of/the/patch.cpp"], "date": current_date}
+            )
+        ],
+        json={"paths": {"outside/of/the/patch.cpp": ["bbbb", "xxxx"]}},
     )
 
     # Set backend ID as the publication is disabled for tests
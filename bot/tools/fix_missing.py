@@ -7,10 +7,9 @@ import re
 import time
 from datetime import datetime, timedelta
 
-import requests
 from taskcluster.helper import TaskclusterConfig
 
-from code_review_bot.config import GetAppUserAgent
+from code_review_bot.http_client import http
 
 TREEHERDER_PUSH_URL = "https://treeherder.mozilla.org/api/project/try/push/"
 TREEHERDER_JOBS_URL = "https://treeherder.mozilla.org/api/jobs/"
@@ -30,7 +29,7 @@ def phab_state(revision_id):
         "constraints[ids][0]": revision_id,
         "api.token": taskcluster.secrets["PHABRICATOR"]["api_key"],
     }
-    resp = requests.post(PHABRICATOR_REVISION_URL, data)
+    resp = http.post(PHABRICATOR_REVISION_URL, endpoint="phabricator", data=data)
     resp.raise_for_status()
     data = resp.json()
     return data["result"]["data"][0]["fields"]["status"]
@@ -43,7 +42,7 @@ def list_diffs(min_date, max_date):
     updates = {}
 
     while True:
-        resp = requests.get(url, headers=GetAppUserAgent())
+        resp = http.get(url, endpoint="backend.diff")
         resp.raise_for_status()
         data = resp.json()
 
@@ -80,7 +79,7 @@ def list_pushes(known_revisions, updates, min_date, max_date):
     }
 
     while True:
-        resp = requests.get(TREEHERDER_PUSH_URL, params, headers=GetAppUserAgent())
+        resp = http.get(TREEHERDER_PUSH_URL, endpoint="treeherder.push", params=params)
         resp.raise_for_status()
         data = resp.json()
 
@@ -124,8 +123,8 @@ def list_pushes(known_revisions, updates, min_date, max_date):
 
 def find_task(push_id):
     # Find the task ids from Treeherder
-    resp = requests.get(
-        TREEHERDER_JOBS_URL, {"push_id": push_id}, headers=GetAppUserAgent()
+    resp = http.get(
+        TREEHERDER_JOBS_URL, endpoint="treeherder.jobs", params={"push_id": push_id}
     )
     resp.raise_for_status()
     data = resp.json()
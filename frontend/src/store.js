@@ -91,7 +91,10 @@ export default new Vuex.Store({
     load_diffs(state, payload) {
       const url = payload.url || BACKEND_URL + "/v1/diff/";
 
-      const params = payload.query || {};
+      // The total count is requested on the first page, next links keep it
+      const params = payload.url
+        ? {}
+        : Object.assign({ count: true }, payload.query);
       return axios.get(url, { params }).then((resp) => {
         state.commit("use_diffs", resp.data);
       });
@@ -169,7 +172,7 @@ export default new Vuex.Store({
         payload.url ||
         BACKEND_URL +
           `/v1/check/${payload.repository}/${payload.analyzer}/${payload.check}/`;
-      const params = {};
+      const params = payload.url ? {} : { count: true };
       if (payload.publishable !== undefined) {
         params.publishable = payload.publishable;
       }